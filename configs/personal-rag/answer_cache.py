@@ -0,0 +1,141 @@
+"""
+Answer cache for /query and /classify.
+
+Lookups match the normalized request text exactly first, then fall back to
+the nearest cached request by embedding cosine similarity above a cutoff.
+Entries expire after a TTL, the oldest are dropped past `max_entries`, and an
+entry is invalidated as soon as any chunk it used as a source changes.
+
+Entries are partitioned by `kind` ("query", "classify") and a `scope` string
+covering every request parameter that changes the answer (system prompt,
+top_k, ...), so only truly equivalent requests share an answer.
+"""
+
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a request."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _SPACE_RE.sub(" ", text).strip().rstrip("?!.").strip()
+
+
+@dataclass
+class CacheEntry:
+    value: dict
+    embedding: Optional[np.ndarray]
+    sources: set[str] = field(default_factory=set)
+    expires: float = 0.0
+
+
+class AnswerCache:
+    def __init__(self, ttl: float, max_entries: int, min_similarity: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._entries: OrderedDict[tuple[str, str, str], CacheEntry] = OrderedDict()
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, kind: str, scope: str, text: str) -> Optional[dict]:
+        """Exact (normalized) match. Does not count a miss: call get_similar next."""
+        if not self.enabled:
+            return None
+        key = (kind, scope, normalize(text))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self.hits_exact += 1
+        return entry.value
+
+    def get_similar(self, kind: str, scope: str, embedding: list[float]) -> Optional[dict]:
+        """Nearest cached request of the same kind/scope above the similarity cutoff."""
+        if not self.enabled:
+            self.misses += 1
+            return None
+        self._expire()
+        candidates = [
+            e for (k, s, _), e in self._entries.items() if k == kind and s == scope and e.embedding is not None
+        ]
+        if candidates:
+            query = _unit(embedding)
+            scores = np.stack([e.embedding for e in candidates]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.min_similarity:
+                self.hits_semantic += 1
+                return candidates[best].value
+        self.misses += 1
+        return None
+
+    def put(self, kind: str, scope: str, text: str, embedding: Optional[list[float]], value: dict, sources=()):
+        if not self.enabled:
+            return
+        key = (kind, scope, normalize(text))
+        self._entries.pop(key, None)
+        self._entries[key] = CacheEntry(
+            value=value,
+            embedding=_unit(embedding) if embedding is not None else None,
+            sources=set(sources),
+            expires=time.monotonic() + self.ttl,
+        )
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, chunk_ids) -> int:
+        """Drop every entry that used any of `chunk_ids` as a source."""
+        changed = set(chunk_ids)
+        if not changed or not self._entries:
+            return 0
+        stale = [key for key, e in self._entries.items() if e.sources & changed]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> int:
+        """Drop every entry, e.g. after the store was replaced wholesale."""
+        dropped = len(self._entries)
+        self._entries.clear()
+        self.invalidations += dropped
+        return dropped
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e.expires < now]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits_exact + self.hits_semantic + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits_exact": self.hits_exact,
+            "hits_semantic": self.hits_semantic,
+            "misses": self.misses,
+            "hit_rate": round((self.hits_exact + self.hits_semantic) / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+def _unit(vector) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm > 0 else arr
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Vector backends compared: Chroma HNSW vs the numpy brute-force store.
+
+Fills each backend with the same clustered synthetic chunks (no Ollama),
+then measures every backend in a fresh subprocess, the way the service
+starts:
+
+    disk MB      size of the store on disk
+    start ms     import the backend and open the store
+    first ms     first query (HNSW load, page faults)
+    p50 / p95    steady-state query latency, top --k
+    rss MB       peak resident memory of the probe process
+    recall       recall@k against exact float32 search
+
+Backends: chroma, numpy float16, numpy int8, and int8 with float32
+rescoring (RAG_VECTOR_BACKEND / RAG_VECTOR_DTYPE / RAG_VECTOR_RESCORE).
+
+Usage:
+    python bench_backends.py
+    python bench_backends.py --chunks 20000 50000 --queries 200
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench_filters import make_chunks
+from bench_util import latency_summary
+
+BACKENDS = {
+    "chroma": {},
+    "float16": {"dtype": "float16"},
+    "int8": {"dtype": "int8"},
+    "int8+rescore": {"dtype": "int8", "rescore": True},
+}
+BATCH = 2000
+
+
+def open_store(backend: str, path: Path):
+    if backend == "chroma":
+        import chromadb
+
+        from collection_manager import CollectionManager
+
+        client = chromadb.PersistentClient(path=str(path))
+        return CollectionManager(lambda: client, "bench", {"hnsw:space": "cosine"})
+    from numpy_store import NumpyStore
+
+    return NumpyStore(path / "bench", **BACKENDS[backend])
+
+
+def probe(backend: str, path: Path, queries_path: Path, k: int):
+    """Run in a fresh process: time opening the store and querying it, print JSON."""
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    store.count()
+    opened = time.perf_counter() - start
+    queries = np.load(queries_path)
+    ids, latencies = [], []
+    for query in queries:
+        t = time.perf_counter()
+        ids.append(store.query(query.tolist(), k, [])["ids"])
+        latencies.append(time.perf_counter() - t)
+    # VmHWM, not ru_maxrss: the latter keeps the parent's peak across fork/exec
+    rss = int(re.search(r"VmHWM:\s+(\d+) kB", Path("/proc/self/status").read_text()).group(1)) / 1024
+    print(json.dumps({"start_ms": opened * 1000, "first_ms": latencies[0] * 1000,
+                      "latency": latency_summary(latencies[1:]), "rss_mb": rss, "ids": ids}))
+
+
+def disk_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs numpy vector backends")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[20000, 50000], help="Store sizes")
+    parser.add_argument("--topics", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--probe", nargs=3, metavar=("BACKEND", "PATH", "QUERIES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sys.path.insert(0, str(Path(__file__).parent))
+    if args.probe:
+        probe(args.probe[0], Path(args.probe[1]), Path(args.probe[2]), args.k)
+        return
+
+    rng = np.random.default_rng(args.seed)
+    centres = rng.normal(size=(args.topics, args.dim)) / np.sqrt(args.dim)
+    root = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    print(f"{'chunks':>7} {'backend':<13} {'disk MB':>8} {'start ms':>9} {'first ms':>9} {'p50 ms':>7} "
+          f"{'p95 ms':>7} {'rss MB':>7} {'recall':>7}")
+    for size in args.chunks:
+        ids, documents, vectors, metadatas = make_chunks(rng, centres, size, 0, time.time())
+        picked = rng.integers(args.topics, size=args.queries)
+        queries = centres[picked] + rng.normal(scale=0.6 / np.sqrt(args.dim), size=(args.queries, args.dim))
+        queries_path = root / f"queries_{size}.npy"
+        np.save(queries_path, queries.astype(np.float32))
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        truth = np.argsort(-(unit @ (queries / np.linalg.norm(queries, axis=1, keepdims=True)).T), axis=0)[: args.k].T
+
+        for backend in BACKENDS:
+            path = root / f"{backend}_{size}"
+            store = open_store(backend, path)
+            for start in range(0, size, BATCH):
+                end = start + BATCH
+                store.upsert(ids[start:end], documents[start:end], vectors[start:end].tolist(), metadatas[start:end])
+            del store
+            out = subprocess.run(
+                [sys.executable, __file__, "--probe", backend, str(path), str(queries_path), "--k", str(args.k)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            recall = np.mean([
+                len({ids[i] for i in expected} & set(found)) / args.k for expected, found in zip(truth, result["ids"])
+            ])
+            print(f"{size:>7} {backend:<13} {disk_mb(path):>8.1f} {result['start_ms']:>9.0f} "
+                  f"{result['first_ms']:>9.1f} {result['latency']['p50_ms']:>7} {result['latency']['p95_ms']:>7} "
+                  f"{result['rss_mb']:>7.0f} {recall:>7.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Chunker throughput and chunk-shape benchmark.
+
+Runs the structure-aware chunker and the previous fixed-window splitter
+(## sections sliced into 1600-char windows with a 1200-char stride) over the
+synthetic memory notes from bench_rag, and reports chunks/sec, MB/sec and
+chunk shape: token sizes, chunks over budget, and chunks that begin or end
+in the middle of a word or inside a fenced code block.
+
+For the effect on retrieval quality, run bench_rag.py: it compares recall
+and MRR against the stored baseline.
+
+Usage:
+    python bench_chunker.py
+    python bench_chunker.py --facts 3000 --max-tokens 256
+"""
+
+import argparse
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from bench_rag import build_corpus
+from chunker import chunk_markdown, count_tokens
+
+CODE_NOTE = """
+## Snippets {n}
+
+The backup script that runs every night:
+
+```bash
+#!/bin/bash
+set -euo pipefail
+rsync -a --delete ~/.openclaw/ /mnt/backup/openclaw/
+find /mnt/backup -name '*.tmp' -delete
+echo "backup done at $(date)"
+```
+
+- check the log in the morning
+- rotate the disk every three months
+"""
+
+
+def legacy_chunks(text: str) -> list[str]:
+    """The splitter /sync used before chunker.py."""
+    chunks = []
+    for section in re.split(r"\n(?=## )", text):
+        section = section.strip()
+        if len(section) < 50:
+            continue
+        if len(section) > 1600:
+            chunks += [section[i : i + 1600] for i in range(0, len(section), 1200)]
+        else:
+            chunks.append(section)
+    return chunks
+
+
+def structured_chunks(text: str, max_tokens: int) -> list[str]:
+    return [chunk.text for chunk in chunk_markdown(text, max_tokens)]
+
+
+def shape(chunks: list[str], max_tokens: int) -> dict:
+    tokens = [count_tokens(c) for c in chunks]
+    return {
+        "chunks": len(chunks),
+        "tokens_mean": round(statistics.mean(tokens), 1) if tokens else 0,
+        "tokens_max": max(tokens, default=0),
+        "over_budget": sum(1 for t in tokens if t > max_tokens),
+        "split_code_fence": sum(1 for c in chunks if c.count("```") % 2),
+        "starts_mid_word": sum(1 for c in chunks if c[:1].isalnum() and c[:1].islower()),
+    }
+
+
+def run(name: str, fn, texts: list[str], rounds: int) -> tuple[list[str], dict]:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        chunks = [c for text in texts for c in fn(text)]
+    elapsed = (time.perf_counter() - start) / rounds
+    size = sum(len(t.encode()) for t in texts)
+    return chunks, {"chunks_per_sec": round(len(chunks) / elapsed), "mb_per_sec": round(size / elapsed / 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory chunker")
+    parser.add_argument("--facts", type=int, default=2000, help="Planted facts in the synthetic corpus")
+    parser.add_argument("--memory-files", type=int, default=60)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    home = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    build_corpus(home, args.facts, args.memory_files, 1, args.seed)
+    paths = sorted((home / ".openclaw" / "workspace" / "memory").glob("*.md"))
+    texts = [p.read_text() + "".join(CODE_NOTE.format(n=n) for n in range(3)) for p in paths]
+
+    print(f"{len(texts)} memory files, {sum(len(t) for t in texts) / 1e6:.2f} MB\n")
+    print(f"{'chunker':<12} {'chunks/s':>10} {'MB/s':>7} {'chunks':>7} {'tok mean':>9} {'tok max':>8} "
+          f"{'>budget':>8} {'cut code':>9} {'mid-word':>9}")
+    for name, fn in (("legacy", legacy_chunks), ("structured", lambda t: structured_chunks(t, args.max_tokens))):
+        chunks, speed = run(name, fn, texts, args.rounds)
+        s = shape(chunks, args.max_tokens)
+        print(f"{name:<12} {speed['chunks_per_sec']:>10} {speed['mb_per_sec']:>7} {s['chunks']:>7} "
+              f"{s['tokens_mean']:>9} {s['tokens_max']:>8} {s['over_budget']:>8} {s['split_code_fence']:>9} "
+              f"{s['starts_mid_word']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput benchmark.
+
+Starts a stub Ollama server in-process and measures how many texts/sec
+`ollama_embed` pushes through at different batch sizes. The stub charges a
+fixed cost per HTTP request plus a cost per text, which is the shape of a
+CPU-bound Ollama serving nomic-embed-text.
+
+Usage:
+    python bench_embed.py
+    python bench_embed.py --texts 2000 --batch-sizes 1 16 64 --concurrency 2
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from stub_ollama import start_stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched embedding throughput")
+    parser.add_argument("--texts", type=int, default=1000, help="Number of texts to embed")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--concurrency", type=int, default=2, help="Embed batches in flight")
+    parser.add_argument("--request-ms", type=float, default=10.0, help="Stub cost per request")
+    parser.add_argument("--per-text-ms", type=float, default=0.5, help="Stub cost per text")
+    parser.add_argument("--parallel", type=int, default=2, help="Stub requests served at once")
+    args = parser.parse_args()
+
+    stub = start_stub(request_ms=args.request_ms, per_text_ms=args.per_text_ms, parallel=args.parallel)
+    # rag_service reads its config and opens Chroma at import time
+    os.environ["OLLAMA_HOST"] = stub.url
+    os.environ["RAG_EMBED_CONCURRENCY"] = str(args.concurrency)
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="rag-bench-")
+    sys.path.insert(0, str(Path(__file__).parent))
+    import rag_service
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    texts = [f"User: message number {i} about topic {i % 37}\nAssistant: reply {i}" for i in range(args.texts)]
+    rag_service.embed_cache.max_entries = 0  # measure Ollama round trips, not cache hits
+
+    async def run():
+        async with rag_service.lifespan(rag_service.app):
+            await rag_service.ollama_embed(texts[:4])  # warm the connection pool
+            print(f"{'batch':>6} {'seconds':>9} {'texts/sec':>10}")
+            for batch_size in args.batch_sizes:
+                rag_service.EMBED_BATCH_SIZE = batch_size
+                start = time.perf_counter()
+                embeddings = await rag_service.ollama_embed(texts)
+                elapsed = time.perf_counter() - start
+                assert len(embeddings) == len(texts)
+                print(f"{batch_size:>6} {elapsed:>9.2f} {len(texts) / elapsed:>10.1f}")
+
+    asyncio.run(run())
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Filtered vs unfiltered retrieval latency as the collection grows.
+
+Fills the hot tier directly (no Ollama) with clustered synthetic chunks:
+memory notes without a timestamp and conversations spread over the last
+year, each with a `source` like /sync writes. At every --sizes step,
+hybrid retrieve() is timed with no filter and with each of:
+
+    type     type == "memory" (about a fifth of the chunks)
+    source   one session log (a few hundred chunks)
+    recent   conversations from the last 30 days (since)
+    range    conversations from one quarter (since + until)
+    client   the type filter done the way clients had to before: no
+             filter, 10x over-fetch, then filtered in Python; "full" is the
+             share of queries that still got top_k memory notes back
+
+Usage:
+    python bench_filters.py
+    python bench_filters.py --sizes 10000 50000 100000 --queries 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench_util import latency_summary
+
+WORDS = "alpha bravo cedar delta ember fjord glade harbor iris juniper kelp lumen maple nectar onyx pine quartz".split()
+DAY = 86400.0
+
+
+def make_chunks(rng: np.random.Generator, centres: np.ndarray, n: int, start: int, now: float):
+    """`n` chunks near random topic centres; a fifth are memory notes, the rest conversations."""
+    dim = centres.shape[1]
+    topic_of = rng.integers(len(centres), size=n)
+    vectors = centres[topic_of] + rng.normal(scale=0.6 / np.sqrt(dim), size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk_{start + i}" for i in range(n)]
+    documents = [f"topic{t} " + " ".join(rng.choice(WORDS, size=12)) for t in topic_of]
+    metadatas = []
+    for i in range(start, start + n):
+        if i % 5 == 0:
+            metadatas.append({"type": "memory", "source": f"memory/note{i // 250}.md"})
+        else:
+            ts = now - rng.uniform(0, 365) * DAY
+            metadatas.append({"type": "conversation", "source": f"session/s{i // 400}.jsonl", "timestamp": ts})
+    return ids, documents, vectors.astype(np.float32), metadatas
+
+
+def fill(tier, ids, documents, vectors, metadatas, batch: int = 2000):
+    for start in range(0, len(ids), batch):
+        end = start + batch
+        tier.store.upsert(ids[start:end], documents[start:end], vectors[start:end].tolist(), metadatas[start:end])
+        tier.lexical.upsert(ids[start:end], documents[start:end])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filtered vs unfiltered retrieval latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000], help="Collection sizes")
+    parser.add_argument("--topics", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=100, help="Queries per filter and size")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # rag_service reads its config and opens Chroma at import time
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="rag-bench-")
+    os.environ["RAG_COMPACT_INTERVAL"] = "0"
+    sys.path.insert(0, str(Path(__file__).parent))
+    import rag_service
+    from tiers import HOT
+
+    logging.getLogger("personal-rag").setLevel(logging.WARNING)
+    rng = np.random.default_rng(args.seed)
+    centres = rng.normal(size=(args.topics, args.dim)) / np.sqrt(args.dim)
+    now = time.time()
+    hot = rag_service.tiers[HOT]
+
+    filters = {
+        "none": rag_service.Filters(),
+        "type": rag_service.Filters(type="memory"),
+        "source": rag_service.Filters(source="session/s3.jsonl"),
+        "recent": rag_service.Filters(since=now - 30 * DAY),
+        "range": rag_service.Filters(since=now - 180 * DAY, until=now - 90 * DAY),
+    }
+
+    async def timed(batch: list, where) -> dict:
+        latencies = []
+        for text, embedding in batch:
+            start = time.perf_counter()
+            await rag_service.retrieve(text, embedding, args.top_k, where=where)
+            latencies.append(time.perf_counter() - start)
+        return latency_summary(latencies)
+
+    async def client_side(batch: list) -> tuple[dict, float]:
+        latencies, full = [], 0
+        for text, embedding in batch:
+            start = time.perf_counter()
+            hits = await rag_service.retrieve(text, embedding, args.top_k * 10)
+            kept = [hit for hit in hits if hit["metadata"].get("type") == "memory"][: args.top_k]
+            latencies.append(time.perf_counter() - start)
+            full += len(kept) == args.top_k
+        return latency_summary(latencies), full / len(batch)
+
+    picked = random.Random(args.seed).choices(range(args.topics), k=args.queries)
+    batch = [(f"topic{t} {WORDS[t % len(WORDS)]}", centres[t].tolist()) for t in picked]
+
+    print(f"{'chunks':>7} {'filter':<7} {'p50 ms':>8} {'p95 ms':>8} {'full':>6}")
+    filled = 0
+    for size in sorted(args.sizes):
+        fill(hot, *make_chunks(rng, centres, size - filled, filled, now))
+        filled = size
+        for name, request in filters.items():
+            summary = asyncio.run(timed(batch, rag_service._where(request)))
+            print(f"{size:>7} {name:<7} {summary['p50_ms']:>8} {summary['p95_ms']:>8} {'':>6}")
+        summary, full = asyncio.run(client_side(batch))
+        print(f"{size:>7} {'client':<7} {summary['p50_ms']:>8} {summary['p95_ms']:>8} {full:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
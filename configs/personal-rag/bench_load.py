@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+/search latency under /query and /sync load.
+
+Runs rag_service in a subprocess against a stub Ollama whose chat model is
+slow (seconds per answer, like qwen3:4b on CPU) and measures /search latency
+three times: on an idle service, while several /query generations are in
+flight, and while a background sync job embeds a synthetic history. With
+async handlers, separate embed/chat limits and sync embedding one batch at a
+time, p99 should stay close to idle in every phase.
+
+Usage:
+    python bench_load.py
+    python bench_load.py --queries 6 --chat-ms 5000 --searches 200 --sync-facts 6000
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from bench_rag import build_corpus
+from bench_util import latency_summary, run_service
+from stub_ollama import start_stub
+
+
+async def run_searches(client: httpx.AsyncClient, url: str, n: int, concurrency: int, tag: str) -> list[float]:
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with slots:
+            start = time.perf_counter()
+            resp = await client.post(f"{url}/search", json={"query": f"{tag} coffee routine {i}", "top_k": 5})
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies
+
+
+async def bench(url: str, args) -> dict:
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        docs = [f"Note {i}: Arnaldo drinks coffee at {i % 12 + 6}am and reviews topic {i % 17}." for i in range(200)]
+        (await client.post(f"{url}/ingest", json={"documents": docs})).raise_for_status()
+
+        idle = await run_searches(client, url, args.searches, args.search_concurrency, "idle")
+
+        async def one_query(i: int) -> float:
+            start = time.perf_counter()
+            resp = await client.post(f"{url}/query", json={"query": f"when do I drink coffee {i}?"})
+            resp.raise_for_status()
+            return time.perf_counter() - start
+
+        queries = [asyncio.create_task(one_query(i)) for i in range(args.queries)]
+        await asyncio.sleep(0.2)  # let the generations start
+        loaded = await run_searches(client, url, args.searches, args.search_concurrency, "loaded")
+        overlapped = not all(q.done() for q in queries)
+        query_latencies = await asyncio.gather(*queries)
+
+        job = (await client.post(f"{url}/sync")).json()
+        syncing = await run_searches(client, url, args.searches, args.search_concurrency, "sync")
+        status = (await client.get(f"{url}/sync/{job['id']}")).json()
+        sync_overlapped = status["status"] in ("queued", "running")
+        while status["status"] in ("queued", "running"):
+            await asyncio.sleep(0.2)
+            status = (await client.get(f"{url}/sync/{job['id']}")).json()
+
+    return {
+        "search_idle": latency_summary(idle),
+        "search_under_query_load": latency_summary(loaded),
+        "search_during_sync": latency_summary(syncing),
+        "query": latency_summary(query_latencies),
+        "searches_overlapped_queries": overlapped,
+        "searches_overlapped_sync": sync_overlapped,
+        "sync": {k: status[k] for k in ("status", "elapsed_s", "result", "error")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /search latency while /query calls are in flight")
+    parser.add_argument("--queries", type=int, default=4, help="Concurrent /query calls")
+    parser.add_argument("--searches", type=int, default=100, help="/search calls per phase")
+    parser.add_argument("--search-concurrency", type=int, default=4)
+    parser.add_argument("--chat-ms", type=float, default=3000.0, help="Stub generation time per answer")
+    parser.add_argument("--sync-facts", type=int, default=3000, help="Facts in the history synced in phase 3")
+    args = parser.parse_args()
+
+    home = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    build_corpus(home, args.sync_facts, 60, 30, seed=7)
+    stub = start_stub(request_ms=2.0, per_text_ms=0.5, chat_ms=args.chat_ms, parallel=1)
+    try:
+        with run_service(stub.url, home=str(home)) as url:
+            result = asyncio.run(bench(url, args))
+    finally:
+        stub.shutdown()
+
+    print(f"{'phase':<26} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for phase in ("search_idle", "search_under_query_load", "search_during_sync", "query"):
+        r = result[phase]
+        print(f"{phase:<26} {r['n']:>5} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['max_ms']:>9}")
+    sync = result["sync"]
+    print(f"\nsync job {sync['status']} in {sync['elapsed_s']}s: {sync['result'] or sync['error']}")
+    if not result["searches_overlapped_queries"]:
+        print("WARNING: all /query calls finished before the searches; raise --chat-ms")
+    if not result["searches_overlapped_sync"]:
+        print("WARNING: the sync job finished before the searches; raise --sync-facts")
+
+
+if __name__ == "__main__":
+    main()
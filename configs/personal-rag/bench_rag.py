@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Retrieval quality and latency benchmark.
+
+Builds a deterministic synthetic corpus (memory markdown plus session JSONL)
+with planted facts, runs rag_service against the stub Ollama, and reports:
+
+    - ingest throughput of a full /sync, and the cost of a no-op /sync
+    - recall@k and MRR of /search, for hybrid, vector-only and lexical-only
+      retrieval, overall and per source type
+    - context recall of /query: how often a relevant chunk makes it into
+      the prompt, and the mean prompt size sent to the chat model
+    - p50/p95/p99 latency per endpoint
+
+Every fact has a unique value (a code, a date, a name) that the question
+does not mention, so a retrieved chunk counts as relevant if it contains
+the value. Each entity carries several facts with different relations, so
+retrieval has to tell them apart, and some facts sit deep inside long
+memory sections or long assistant replies, where chunking can lose them.
+Sections and replies vary in length, as real notes and answers do, so the
+size of /query prompts is realistic too.
+
+Results are written as JSON and compared against a stored baseline. Quality
+numbers are reproducible for a given seed, up to a flip or two from Chroma's
+multithreaded HNSW build. Latencies depend on the machine, so refresh the
+baseline (--save-baseline) when moving to another one. Only p50/p95 gate
+--check; p99 and max are too noisy at these sample sizes.
+
+Usage:
+    python bench_rag.py
+    python bench_rag.py --facts 600 --out results.json --check
+    python bench_rag.py --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from bench_util import latency_summary, run_service
+from stub_ollama import start_stub
+
+BASELINE_PATH = Path(__file__).parent / "bench_baseline.json"
+RECALL_KS = (1, 3, 5, 10)
+MODES = {"hybrid": (1.0, 1.0), "vector": (1.0, 0.0), "lexical": (0.0, 1.0)}
+
+# (statement, question); {e} is the entity, {v} the value the answer must contain
+RELATIONS = [
+    ("The wifi password at {e} is {v}.", "What is the wifi password at {e}?", "code"),
+    ("{e}'s birthday is on {v}, don't forget the cake.", "When is {e}'s birthday?", "date"),
+    ("I parked the car near {e} in spot {v}.", "Which parking spot did I use near {e}?", "code"),
+    ("The dentist appointment for {e} was moved to {v}.", "When is the dentist appointment for {e}?", "date"),
+    ("{e} recommended the book written by {v}.", "Which author did {e} recommend?", "name"),
+    ("The invoice number for the {e} renovation is {v}.", "What is the invoice number for the {e} renovation?", "code"),
+    ("My favorite dish at {e} is the {v} special.", "What is my favorite dish at {e}?", "name"),
+    ("The server for project {e} migrated to {v} last week.", "Where did the project {e} server migrate to?", "name"),
+]
+
+SYLLABLES = "ka lo mi ra ven tor sa lu bri dan el fo gar hal ix jun kor lem nar os pel qui ros tam ur vix wen yar zel".split()
+FILLER = [
+    "Had coffee and went through the inbox before the standup.",
+    "The weather was grey all morning, so I stayed in and read.",
+    "Spent an hour cleaning up the home server backups.",
+    "Went to the gym after work and did the usual routine.",
+    "Talked about weekend plans and the new bakery downtown.",
+    "Reviewed the budget spreadsheet and moved some money to savings.",
+    "The train was late again, which pushed every meeting back.",
+    "Tried a new playlist while cooking dinner, it was decent.",
+    "Fixed a small bug in the home automation scripts.",
+    "Called the family in the evening and caught up on news.",
+    "Made a list of groceries for the week and ordered online.",
+    "Read a long article about sleep habits and productivity.",
+]
+
+
+def _word(rng: random.Random, syllables: int) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+
+def _value(rng: random.Random, kind: str) -> str:
+    if kind == "code":
+        return f"{rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ')}{rng.randint(10, 99)}-{rng.randint(1000, 9999)}"
+    if kind == "date":
+        return f"{rng.randint(2024, 2026)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    return f"{_word(rng, 2)} {_word(rng, 3)}"
+
+
+def _filler(rng: random.Random, sentences: int) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(sentences))
+
+
+def build_corpus(home: Path, facts: int, memory_files: int, session_files: int, seed: int) -> dict:
+    """Write the synthetic corpus under `home`; return the planted facts and sizes."""
+    rng = random.Random(seed)
+    memory_dir = home / ".openclaw" / "workspace" / "memory"
+    session_dir = home / ".openclaw" / "agents" / "main" / "sessions"
+    memory_dir.mkdir(parents=True, exist_ok=True)
+    session_dir.mkdir(parents=True, exist_ok=True)
+
+    entities, values = set(), set()
+    planted = []
+    while len(planted) < facts:
+        entity = _word(rng, 3)
+        if entity in entities:
+            continue
+        entities.add(entity)
+        for statement, question, kind in rng.sample(RELATIONS, 3):
+            value = _value(rng, kind)
+            if value in values:
+                continue
+            values.add(value)
+            planted.append({
+                "statement": statement.format(e=entity, v=value),
+                "question": question.format(e=entity),
+                "value": value,
+                "type": "memory" if rng.random() < 0.5 else "conversation",
+                "deep": rng.random() < 0.25,  # buried behind filler
+            })
+    planted = planted[:facts]
+
+    # Memory notes: dated files with ## sections, some of them long
+    memory_facts = [f for f in planted if f["type"] == "memory"]
+    for n in range(memory_files):
+        path = memory_dir / f"2025-{n // 28 + 1:02d}-{n % 28 + 1:02d}.md"
+        lines = [f"# Notes {path.stem}\n"]
+        for s, fact in enumerate(memory_facts[n::memory_files]):
+            lines.append(f"## {_word(rng, 2)} {s}\n")
+            if fact["deep"]:
+                lines.append(_filler(rng, 30) + "\n")
+            lines.append(f"{_filler(rng, 1)} {fact['statement']} {_filler(rng, 1)}\n")
+            lines.append(_filler(rng, rng.randint(0, 12)) + "\n")
+        path.write_text("\n".join(lines))
+
+    # Session logs: user/assistant pairs, sometimes with the Telegram envelope
+    conversation_facts = [f for f in planted if f["type"] == "conversation"]
+    for n in range(session_files):
+        path = session_dir / f"session-{n:03d}.jsonl"
+        with open(path, "w") as f:
+            for i, fact in enumerate(conversation_facts[n::session_files]):
+                ts = f"2025-02-{i % 28 + 1:02d}T{8 + i % 12:02d}:00:00Z"
+                user = f"Can you note this down? {fact['statement']}"
+                if i % 3 == 0:
+                    user = f"[Telegram Arnaldo id:42 2025-02-{i % 28 + 1:02d} 09:{i % 60:02d} GMT+0] {user}"
+                reply = f"{_filler(rng, 12)} Noted: {fact['statement']}" if fact["deep"] else (
+                    f"Noted: {fact['statement']} {_filler(rng, rng.randint(2, 20))}"
+                )
+                for role, text in (("user", user), ("assistant", reply)):
+                    message = {"role": role, "content": [{"type": "text", "text": text}]}
+                    f.write(json.dumps({"type": "message", "timestamp": ts, "message": message}) + "\n")
+
+    size = sum(p.stat().st_size for d in (memory_dir, session_dir) for p in d.iterdir())
+    return {
+        "facts": planted,
+        "memory_files": memory_files,
+        "session_files": session_files,
+        "bytes": size,
+    }
+
+
+def _rank(results: list[dict], value: str) -> int:
+    """1-based rank of the first result containing `value`, 0 if none."""
+    for rank, hit in enumerate(results, 1):
+        if value in hit["text"]:
+            return rank
+    return 0
+
+
+def _quality(ranks: list[int]) -> dict:
+    n = len(ranks) or 1
+    report = {f"recall@{k}": round(sum(1 for r in ranks if 0 < r <= k) / n, 4) for k in RECALL_KS}
+    report[f"mrr@{max(RECALL_KS)}"] = round(sum(1 / r for r in ranks if r) / n, 4)
+    return report
+
+
+async def bench(url: str, corpus: dict, args, stub) -> dict:
+    facts = corpus["facts"]
+    async with httpx.AsyncClient(timeout=600.0) as client:
+        start = time.perf_counter()
+        resp = await client.post(f"{url}/sync", params={"wait": "true"})
+        resp.raise_for_status()
+        sync_seconds = time.perf_counter() - start
+        synced = resp.json()
+
+        noop = []
+        for _ in range(args.noop_syncs):
+            start = time.perf_counter()
+            (await client.post(f"{url}/sync", params={"wait": "true"})).raise_for_status()
+            noop.append(time.perf_counter() - start)
+
+        retrieval, search_latency = {}, {}
+        relevant_ids: dict[int, set[str]] = {}
+        for mode, (vector_weight, lexical_weight) in MODES.items():
+            ranks, by_type, latencies = [], {}, []
+            for i, fact in enumerate(facts):
+                start = time.perf_counter()
+                resp = await client.post(f"{url}/search", json={
+                    "query": fact["question"],
+                    "top_k": max(RECALL_KS),
+                    "vector_weight": vector_weight,
+                    "lexical_weight": lexical_weight,
+                })
+                resp.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                results = resp.json()["results"]
+                rank = _rank(results, fact["value"])
+                ranks.append(rank)
+                by_type.setdefault(fact["type"], []).append(rank)
+                if mode == "hybrid":
+                    relevant_ids[i] = {hit["id"] for hit in results if fact["value"] in hit["text"]}
+            retrieval[mode] = {**_quality(ranks), **{t: _quality(r) for t, r in sorted(by_type.items())}}
+            search_latency[mode] = latency_summary(latencies)
+
+        # /query: does a relevant chunk reach the prompt?
+        sample = random.Random(args.seed).sample(range(len(facts)), min(args.queries, len(facts)))
+        hits, query_latency = 0, []
+        stub.state.prompt_tokens.clear()
+        for i in sample:
+            start = time.perf_counter()
+            resp = await client.post(f"{url}/query", json={"query": facts[i]["question"]})
+            resp.raise_for_status()
+            query_latency.append(time.perf_counter() - start)
+            if relevant_ids[i] & {s.get("id") for s in resp.json()["sources"]}:
+                hits += 1
+
+    return {
+        "ingest": {
+            "chunks": synced["synced"],
+            "seconds": round(sync_seconds, 3),
+            "chunks_per_sec": round(synced["synced"] / sync_seconds, 1),
+            "mb_per_sec": round(corpus["bytes"] / sync_seconds / 1e6, 3),
+        },
+        "retrieval": retrieval,
+        "query": {
+            "context_recall": round(hits / len(sample), 4) if sample else None,
+            "prompt_tokens_mean": round(statistics.mean(stub.state.prompt_tokens), 1) if sample else None,
+        },
+        "latency": {
+            "sync_noop": latency_summary(noop),
+            **{f"search_{mode}": summary for mode, summary in search_latency.items()},
+            "query": latency_summary(query_latency),
+        },
+    }
+
+
+def _flatten(obj, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in obj.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and not name.endswith(".n"):
+            flat[name] = value
+    return flat
+
+
+def compare(result: dict, baseline: dict, tolerance: float, max_slowdown: float) -> list[str]:
+    """Print metric deltas against the baseline; return the regressed metric names."""
+    current, base = _flatten(result["metrics"]), _flatten(baseline["metrics"])
+    if result["config"] != baseline.get("config"):
+        print("NOTE: baseline was recorded with a different config; deltas are indicative only")
+    regressions = []
+    print(f"\n{'metric':<44} {'baseline':>10} {'current':>10} {'delta':>9}")
+    for name in sorted(current.keys() & base.keys()):
+        old, new = base[name], current[name]
+        lower_is_better = name.endswith(("_ms", "seconds", "prompt_tokens_mean"))
+        if name == "ingest.chunks" or name.endswith(("p99_ms", "max_ms")):
+            regressed = False  # chunk count follows the chunker; tails are reported, not gated
+        elif lower_is_better:
+            regressed = old > 0 and new > old * (1 + max_slowdown)
+        elif name.endswith("per_sec"):
+            regressed = new < old * (1 - max_slowdown)
+        else:
+            # context_recall moves in steps of 1/queries: one flipped query is noise
+            step = 1 / result["config"]["queries"] if name.startswith("query.") else 0
+            regressed = new < old - max(tolerance, step) - 1e-9
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<44} {old:>10} {new:>10} {new - old:>+9.4g}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and endpoint latency")
+    parser.add_argument("--facts", type=int, default=300, help="Planted facts (one /search each per mode)")
+    parser.add_argument("--memory-files", type=int, default=20)
+    parser.add_argument("--session-files", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=40, help="/query calls")
+    parser.add_argument("--noop-syncs", type=int, default=5, help="/sync calls with nothing changed")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--chat-ms", type=float, default=20.0, help="Stub cost per chat request")
+    parser.add_argument("--prefill-ms", type=float, default=1.0, help="Stub prompt cost per token")
+    parser.add_argument("--chunk-tokens", type=int, help="RAG_CHUNK_TOKENS for the service (default: its own)")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="Extra service setting")
+    parser.add_argument("--out", type=Path, help="Write the results JSON here")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Allowed absolute drop in recall/MRR")
+    parser.add_argument("--max-slowdown", type=float, default=0.35, help="Allowed relative latency increase")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if any metric regressed")
+    args = parser.parse_args()
+
+    config = {
+        k: getattr(args, k)
+        for k in ("facts", "memory_files", "session_files", "queries", "seed", "chat_ms", "prefill_ms")
+    }
+    env = {"RAG_ANSWER_CACHE_MAX": "0"}  # answer caching would turn repeated /query calls into lookups
+    if args.chunk_tokens:
+        config["chunk_tokens"] = args.chunk_tokens
+        env["RAG_CHUNK_TOKENS"] = str(args.chunk_tokens)
+    for item in args.env:
+        name, _, value = item.partition("=")
+        config[name] = env[name] = value
+    home = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    corpus = build_corpus(home, args.facts, args.memory_files, args.session_files, args.seed)
+
+    stub = start_stub(
+        request_ms=2.0,
+        per_text_ms=0.2,
+        chat_ms=args.chat_ms,
+        prefill_ms_per_token=args.prefill_ms,
+        decode_ms_per_token=0.5,
+        parallel=2,
+    )
+    try:
+        with run_service(stub.url, home=str(home), env=env) as url:
+            metrics = asyncio.run(bench(url, corpus, args, stub))
+    finally:
+        stub.shutdown()
+
+    result = {"config": config, "corpus": {k: v for k, v in corpus.items() if k != "facts"}, "metrics": metrics}
+    print(json.dumps(result, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+    if args.baseline.exists():
+        regressions = compare(result, json.loads(args.baseline.read_text()), args.tolerance, args.max_slowdown)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+            if args.check:
+                sys.exit(1)
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+
+
+if __name__ == "__main__":
+    main()
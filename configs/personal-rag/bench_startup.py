@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Restart-to-first-answer time, with and without startup warm-up.
+
+Syncs a synthetic corpus once, then restarts the service against a fresh
+stub Ollama whose models are cold (--load-ms per model, like Ollama after
+a reboot or an idle unload), for each mode:
+
+    cold      RAG_WARM_UP=0: the first /query loads both models itself
+    warm-up   the default: the store opens and both models load in the
+              background, and early requests wait for them
+
+and reports, from process start:
+
+    port ms     the port answers GET /health
+    answer ms   the first /query, sent as soon as the port answers, returns
+    load ms     model load time that /query itself paid (X-Timing llm_load
+                plus the embed stage, which includes the embed model load)
+
+then, in a second restart per mode, the latency of a first /query sent
+--idle seconds after the port opened, when warm-up has had time to finish.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --load-ms 5000 --runs 3
+"""
+
+import argparse
+import itertools
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from bench_rag import build_corpus
+from bench_util import run_service
+from stub_ollama import start_stub
+
+MODES = {"cold": {"RAG_WARM_UP": "0"}, "warm-up": {}}
+QUESTION = "What is the wifi password at the cabin, take {}?"  # new text per restart: no embed cache hit
+
+
+def timings(resp: httpx.Response) -> dict:
+    pairs = (item.partition("=") for item in resp.headers.get("X-Timing", "").split(", "))
+    return {name: float(ms) for name, _, ms in pairs if ms}
+
+
+def restart(home: Path, env: dict, args, take: int, idle: float = 0.0) -> dict:
+    """Start the service against cold models and time its first /query."""
+    stub = start_stub(request_ms=2.0, per_text_ms=0.2, chat_ms=args.chat_ms, load_ms=args.load_ms)
+    try:
+        start = time.perf_counter()
+        with run_service(stub.url, home=str(home), env=env, timeout=120.0, ready=False) as url:
+            port = time.perf_counter() - start
+            time.sleep(idle)
+            sent = time.perf_counter()
+            resp = httpx.post(f"{url}/query", json={"query": QUESTION.format(take)}, timeout=600.0)
+            resp.raise_for_status()
+            done = time.perf_counter()
+    finally:
+        stub.shutdown()
+    stages = timings(resp)
+    return {
+        "port_ms": port * 1000,
+        "answer_ms": (done - start) * 1000,
+        "query_ms": (done - sent) * 1000,
+        "load_ms": stages.get("llm_load", 0.0) + stages.get("embed", 0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark restart-to-first-answer time")
+    parser.add_argument("--facts", type=int, default=300)
+    parser.add_argument("--load-ms", type=float, default=3000.0, help="Stub cold load per model")
+    parser.add_argument("--chat-ms", type=float, default=200.0, help="Stub cost per chat request")
+    parser.add_argument("--idle", type=float, default=10.0, help="Seconds before the late first /query")
+    parser.add_argument("--runs", type=int, default=3, help="Restarts per mode")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    home = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    build_corpus(home, args.facts, 20, 10, args.seed)
+    stub = start_stub(request_ms=2.0, per_text_ms=0.2)
+    try:
+        with run_service(stub.url, home=str(home)) as url:
+            httpx.post(f"{url}/sync?wait=true", timeout=600.0).raise_for_status()
+    finally:
+        stub.shutdown()
+
+    print(f"{'mode':<8} {'port ms':>8} {'answer ms':>10} {'load ms':>8} {'late query ms':>14}")
+    takes = itertools.count()
+    for mode, env in MODES.items():
+        runs = [restart(home, env, args, next(takes)) for _ in range(args.runs)]
+        late = restart(home, env, args, next(takes), idle=args.idle)
+
+        def median(key: str) -> float:
+            return statistics.median(run[key] for run in runs)
+
+        print(f"{mode:<8} {median('port_ms'):>8.0f} {median('answer_ms'):>10.0f} {median('load_ms'):>8.0f} "
+              f"{late['query_ms']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Hot/cold tier retrieval latency as the archive grows.
+
+Fills the tiers directly (no Ollama) with clustered synthetic chunks: a
+small hot tier of recent topics and a cold tier that grows to each of the
+--cold sizes. At every size, hybrid retrieve() is timed for queries about
+hot topics and about archived topics, against two layouts:
+
+    single   every chunk in one collection and one BM25 index (before tiers)
+    tiered   hot tier first, cold tier only when the hot hits are poor
+
+Hot-topic queries should stay flat in the tiered layout while the single
+layout slows down with the archive; archived-topic queries pay for both
+tiers. For retrieval quality with tiers, run bench_rag.py.
+
+Usage:
+    python bench_tiers.py
+    python bench_tiers.py --hot 2000 --cold 10000 50000 100000 --queries 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from prometheus_client import REGISTRY
+
+from bench_util import latency_summary
+
+WORDS = "alpha bravo cedar delta ember fjord glade harbor iris juniper kelp lumen maple nectar onyx pine quartz".split()
+
+
+def make_chunks(rng: np.random.Generator, centres: np.ndarray, topics: range, n: int, prefix: str, start: int):
+    """`n` chunks spread over `topics`, each near its topic's centre."""
+    dim = centres.shape[1]
+    topic_of = rng.choice(np.array(topics), size=n)
+    vectors = centres[topic_of] + rng.normal(scale=0.6 / np.sqrt(dim), size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"{prefix}_{start + i}" for i in range(n)]
+    documents = [f"topic{t} " + " ".join(rng.choice(WORDS, size=12)) for t in topic_of]
+    metadatas = [{"type": "conversation", "source": f"session/{prefix}.jsonl"} for _ in range(n)]
+    return ids, documents, vectors.astype(np.float32), metadatas
+
+
+def fill(tier, ids, documents, vectors, metadatas, batch: int = 2000):
+    for start in range(0, len(ids), batch):
+        end = start + batch
+        tier.store.upsert(ids[start:end], documents[start:end], vectors[start:end].tolist(), metadatas[start:end])
+        tier.lexical.upsert(ids[start:end], documents[start:end])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot/cold tier retrieval latency")
+    parser.add_argument("--hot", type=int, default=2000, help="Chunks in the hot tier")
+    parser.add_argument("--cold", type=int, nargs="+", default=[10000, 50000], help="Cold tier sizes to measure")
+    parser.add_argument("--topics", type=int, default=400, help="Topics; the first 10%% are hot")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per layout and kind")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # rag_service reads its config and opens Chroma at import time
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="rag-bench-")
+    os.environ["RAG_COMPACT_INTERVAL"] = "0"
+    sys.path.insert(0, str(Path(__file__).parent))
+    import rag_service
+    from collection_manager import CollectionManager
+    from lexical_index import LexicalIndex
+    from tiers import COLD, HOT, Tier
+
+    logging.getLogger("personal-rag").setLevel(logging.WARNING)
+    rng = np.random.default_rng(args.seed)
+    centres = rng.normal(size=(args.topics, args.dim)) / np.sqrt(args.dim)
+    hot_topics = range(args.topics // 10)
+    cold_topics = range(args.topics // 10, args.topics)
+    home = Path(os.environ["HOME"])
+
+    def tier(name: str, role: str) -> Tier:
+        store = CollectionManager(rag_service.chroma_client, f"bench_{name}", {"hnsw:space": "cosine"})
+        return Tier(role, store, LexicalIndex(home / f"{name}.json"))
+
+    hot, cold, single, empty = tier("hot", HOT), tier("cold", COLD), tier("single", HOT), tier("empty", COLD)
+    chunks = make_chunks(rng, centres, hot_topics, args.hot, "hot", 0)
+    fill(hot, *chunks)
+    fill(single, *chunks)
+
+    def queries(topics: range) -> list[tuple[str, list[float]]]:
+        picked = random.Random(args.seed).choices(topics, k=args.queries)
+        return [(f"topic{t} {WORDS[t % len(WORDS)]}", centres[t].tolist()) for t in picked]
+
+    async def timed(layout: dict, batch: list) -> tuple[dict, float]:
+        rag_service.tiers.update(layout)
+        fanouts = REGISTRY.get_sample_value("rag_cold_fanout_total")
+        latencies = []
+        for text, embedding in batch:
+            start = time.perf_counter()
+            await rag_service.retrieve(text, embedding, 5)
+            latencies.append(time.perf_counter() - start)
+        return latency_summary(latencies), (REGISTRY.get_sample_value("rag_cold_fanout_total") - fanouts) / len(batch)
+
+    print(f"hot tier: {args.hot} chunks over {len(hot_topics)} topics\n")
+    print(f"{'cold':>7} {'layout':<7} {'queries':<9} {'p50 ms':>8} {'p95 ms':>8} {'fan-out':>8}")
+    filled = 0
+    for size in sorted(args.cold):
+        chunks = make_chunks(rng, centres, cold_topics, size - filled, "cold", filled)
+        fill(cold, *chunks)
+        fill(single, *chunks)
+        filled = size
+        for kind, topics in (("hot", hot_topics), ("archived", cold_topics)):
+            batch = queries(topics)
+            for layout_name, layout in (("single", {HOT: single, COLD: empty}), ("tiered", {HOT: hot, COLD: cold})):
+                summary, fanout = asyncio.run(timed(layout, batch))
+                print(f"{size:>7} {layout_name:<7} {kind:<9} {summary['p50_ms']:>8} {summary['p95_ms']:>8} "
+                      f"{fanout:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Shared helpers for the personal-rag benchmarks: run the service as a
+subprocess against a throwaway HOME, and summarize latencies.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+
+SERVICE_DIR = Path(__file__).parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    """p50/p95/p99/max in milliseconds."""
+    return {
+        "n": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 2),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 2),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 2),
+        "max_ms": round(max(seconds, default=0.0) * 1000, 2),
+    }
+
+
+@contextmanager
+def run_service(ollama_url: str, home: str = None, env: dict = None, timeout: float = 60.0, ready: bool = True):
+    """Start rag_service under uvicorn in a subprocess; yield its base URL.
+
+    HOME points at a throwaway directory (or `home`), so Chroma, the sync
+    manifest and the caches never touch the real ~/.openclaw. Waits until
+    startup finished (GET /health/ready), or with `ready=False` only until
+    the port answers (GET /health).
+    """
+    port = free_port()
+    home = home or tempfile.mkdtemp(prefix="rag-bench-")
+    proc_env = {**os.environ, "HOME": home, "OLLAMA_HOST": ollama_url, **(env or {})}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "rag_service:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=SERVICE_DIR,
+        env=proc_env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"rag_service exited with code {proc.returncode}")
+            try:
+                resp = httpx.get(f"{url}/health/ready" if ready else f"{url}/health", timeout=1.0)
+                if not ready or resp.status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("rag_service did not start in time")
+            time.sleep(0.1)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
@@ -0,0 +1,201 @@
+"""
+Structure-aware, token-budgeted chunker shared by /sync and /ingest.
+
+Markdown is parsed into blocks (headings, paragraphs, lists and fenced code)
+and blocks are packed greedily into chunks of at most `max_tokens`. A chunk
+never crosses a heading, and a block is only split when it is larger than the
+budget on its own: paragraphs at sentence boundaries, lists between items,
+code between lines, and as a last resort between words.
+
+Every chunk carries the breadcrumb of the headings above it ("Notes >
+Coffee"). Only the innermost heading is prepended to the chunk text, as the
+old "## " split did: on bench_rag, embedding the whole breadcrumb diluted
+short chunks and lowered recall. IDs are derived from the content, so
+re-chunking an unchanged section yields the same ID and /sync skips it.
+
+Token counts come from a regex estimator (words, numbers and punctuation,
+with long words counted as several pieces, as subword tokenizers do). It is
+close enough to size chunks for nomic-embed-text and needs no model files.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+
+# Bump when chunk boundaries or text change, so /sync re-chunks every file
+CHUNKER_VERSION = "2"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^\s*(```|~~~)")
+_LIST_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=\S)")
+_SUBWORD_CHARS = 6  # words of 2x this length or more cost one token per this many characters
+_LONG_WORD_RE = re.compile(r"\w{%d,}" % (2 * _SUBWORD_CHARS))
+
+
+def count_tokens(text: str) -> int:
+    """Estimated subword token count of `text`."""
+    extra = sum(len(w) // _SUBWORD_CHARS - 1 for w in _LONG_WORD_RE.findall(text))
+    return len(_TOKEN_RE.findall(text)) + extra
+
+
+@dataclass
+class Chunk:
+    text: str
+    headings: tuple[str, ...] = ()
+    tokens: int = 0
+
+    @property
+    def breadcrumb(self) -> str:
+        return " > ".join(self.headings)
+
+
+@dataclass
+class _Block:
+    kind: str  # "heading", "paragraph", "list" or "code"
+    lines: list[str]
+    level: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def units(self) -> list[str]:
+        """Pieces the block may be split into if it exceeds the budget."""
+        if self.kind == "paragraph":
+            return _SENTENCE_RE.split(self.text)
+        if self.kind == "list":
+            items: list[list[str]] = []
+            for line in self.lines:
+                if _LIST_RE.match(line) or not items:
+                    items.append([line])
+                else:
+                    items[-1].append(line)
+            return ["\n".join(item) for item in items]
+        return self.lines
+
+
+def _blocks(text: str) -> list[_Block]:
+    blocks: list[_Block] = []
+    current = None
+    fence = None
+    for line in text.splitlines():
+        if fence is not None:
+            current.lines.append(line)
+            if line.strip().startswith(fence):
+                fence, current = None, None
+            continue
+        match = _FENCE_RE.match(line)
+        if match:
+            fence = match.group(1)
+            current = _Block("code", [line])
+            blocks.append(current)
+            continue
+        if not line.strip():
+            current = None
+            continue
+        match = _HEADING_RE.match(line)
+        if match:
+            blocks.append(_Block("heading", [match.group(2)], level=len(match.group(1))))
+            current = None
+            continue
+        kind = "list" if _LIST_RE.match(line) else "paragraph"
+        if current is None or (current.kind != kind and not (current.kind == "list" and line[:1].isspace())):
+            current = _Block(kind, [])
+            blocks.append(current)
+        current.lines.append(line)
+    return blocks
+
+
+def _split(text: str, max_tokens: int) -> list[str]:
+    """Hard-split a single oversized unit between words."""
+    pieces, words, used = [], [], 0
+    for word in text.split(" "):
+        cost = count_tokens(word)
+        if words and used + cost > max_tokens:
+            pieces.append(" ".join(words))
+            words, used = [], 0
+        words.append(word)
+        used += cost
+    if words:
+        pieces.append(" ".join(words))
+    return pieces
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """`text` cut to about `max_tokens` tokens, between words."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    return _split(text, max_tokens)[0]
+
+
+def chunk_markdown(text: str, max_tokens: int = 256) -> list[Chunk]:
+    """Split markdown into chunks of at most ~`max_tokens` tokens."""
+    chunks: list[Chunk] = []
+    stack: list[tuple[int, str]] = []
+    parts: list[str] = []
+    used = 0
+    header = 0  # tokens of the heading line
+
+    def flush():
+        nonlocal parts, used
+        if parts:
+            crumb = tuple(title for _, title in stack)
+            body = "\n\n".join(parts)
+            chunk_text = f"{crumb[-1]}\n\n{body}" if crumb else body
+            chunks.append(Chunk(chunk_text, crumb, used + header))
+        parts, used = [], 0
+
+    for block in _blocks(text):
+        if block.kind == "heading":
+            flush()
+            while stack and stack[-1][0] >= block.level:
+                stack.pop()
+            stack.append((block.level, block.lines[0]))
+            header = count_tokens(block.lines[0])
+            continue
+
+        budget = max(1, max_tokens - header)
+        block_text = block.text
+        cost = count_tokens(block_text)
+        if used + cost <= budget:
+            parts.append(block_text)
+            used += cost
+            continue
+        flush()
+        if cost <= budget:
+            parts, used = [block_text], cost
+            continue
+
+        # Oversized block: pack its units, joined the way the block joins them
+        joiner = " " if block.kind == "paragraph" else "\n"
+        piece, piece_used = [], 0
+        for unit in block.units():
+            unit_cost = count_tokens(unit)
+            if unit_cost <= budget:
+                subs = [(unit, unit_cost)]
+            else:
+                subs = [(sub, count_tokens(sub)) for sub in _split(unit, budget)]
+            for sub, sub_cost in subs:
+                if piece and piece_used + sub_cost > budget:
+                    parts, used = [joiner.join(piece)], piece_used
+                    flush()
+                    piece, piece_used = [], 0
+                piece.append(sub)
+                piece_used += sub_cost
+        if piece:
+            parts, used = [joiner.join(piece)], piece_used
+    flush()
+    return chunks
+
+
+def chunk_ids(prefix: str, chunks: list[Chunk]) -> list[str]:
+    """Content-derived IDs: `{prefix}_{hash}`, suffixed if a chunk repeats."""
+    ids, seen = [], {}
+    for chunk in chunks:
+        base = f"{prefix}_{hashlib.sha256(chunk.text.encode()).hexdigest()[:16]}"
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        ids.append(base if n == 0 else f"{base}_{n}")
+    return ids
@@ -0,0 +1,204 @@
+"""
+Tiered message classifier for /classify.
+
+Tier 1 is a compiled keyword/regex automaton: one alternation per category,
+so a message is scanned once per category. It decides only when exactly one
+category matches, and for PERSONAL only on whole-message patterns such as
+a bare greeting: a personal keyword inside a longer message ("remind me
+how TCP works") is only a hint, which rates the LLM tier's confidence.
+
+Tier 2 compares the message embedding with PERSONAL and COMPLEX centroids
+built from labelled examples. It decides when the best centroid wins by at
+least `margin` cosine similarity. Examples start from a small built-in seed
+set and grow from confident LLM decisions.
+
+The LLM (tier 3, in rag_service) is called only when both tiers abstain.
+"""
+
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("personal-rag")
+
+LABELS = ("PERSONAL", "COMPLEX")
+
+# Hints only: the same signals the LLM tier uses to rate its own confidence
+PERSONAL_KEYWORDS = [
+    "good morning", "good night", "bom dia", "boa noite",
+    "how are you", "what's up", "hi", "hello", "hey",
+    "i like", "i prefer", "my favorite", "remind me",
+    "what time", "my routine", "my schedule",
+]
+
+PERSONAL_HINTS = [rf"\b{re.escape(kw)}\b" for kw in PERSONAL_KEYWORDS] + [
+    r"\bdo i (usually|normally|like|prefer)\b",
+    r"\bmy (wife|husband|family|kids|habits?|preferences?)\b",
+]
+
+# Anchored to the whole message, so they cannot mean anything else
+PERSONAL_PATTERNS = [
+    r"^(hi|hey|hello|yo|thanks|thank you|ok|okay|good morning|good night|bom dia|boa noite)\W*$",
+    r"^((hi|hey|hello)\W+)?(how are you|what's up)\W*$",
+]
+
+COMPLEX_PATTERNS = [
+    r"\b(write|fix|debug|refactor|implement|review)\b.{0,40}\b(code|script|function|bug|test|class|query)\b",
+    r"\b(python|javascript|typescript|rust|golang|sql|regex|bash|docker|kubernetes)\b",
+    r"\bsearch (the )?(web|internet|online)\b",
+    r"\b(weather|forecast|news|stock price|exchange rate|bitcoin)\b",
+    r"\b(analy[sz]e|compare|summari[sz]e|translate|calculate)\b",
+    r"```",
+    r"https?://",
+]
+
+SEED_EXAMPLES = {
+    "PERSONAL": [
+        "good morning", "good night, talk tomorrow", "hey, how are you?", "bom dia",
+        "what's my morning routine?", "what coffee do I like?", "do I usually go to the gym on Mondays?",
+        "what's my schedule today?", "remind me what I told you about my diet",
+        "what is my favorite restaurant?", "when do I usually wake up?", "thanks, that's all for today",
+    ],
+    "COMPLEX": [
+        "write a python script that renames files by date", "why does this docker container keep restarting?",
+        "search the web for the latest openclaw release", "what's the weather in Lisbon tomorrow?",
+        "compare postgres and sqlite for an embedded app", "summarize this article for me",
+        "debug this stack trace from my fastapi service", "plan a three day trip to Porto with a budget",
+        "explain how HNSW indexes work", "translate this paragraph to German",
+        "calculate the monthly payment for a 200k mortgage at 4%", "refactor the sync function to be async",
+    ],
+}
+
+
+def _alternation(patterns: list[str]) -> re.Pattern:
+    return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+
+class KeywordTier:
+    def __init__(
+        self,
+        personal: list[str] = PERSONAL_PATTERNS,
+        complex_: list[str] = COMPLEX_PATTERNS,
+        hints: list[str] = PERSONAL_HINTS,
+    ):
+        self._personal = _alternation(personal)
+        self._patterns = {
+            "PERSONAL": _alternation(personal + hints),
+            "COMPLEX": _alternation(complex_),
+        }
+
+    def matches(self, message: str) -> set[str]:
+        """Categories with any pattern or hint in the message."""
+        text = message.lower().strip()
+        return {label for label, pattern in self._patterns.items() if pattern.search(text)}
+
+    def classify(self, message: str) -> Optional[str]:
+        """Category if exactly one category matches and, for PERSONAL, a whole-message pattern does; else None."""
+        matched = self.matches(message)
+        if matched == {"PERSONAL"} and not self._personal.search(message.lower().strip()):
+            return None
+        return matched.pop() if len(matched) == 1 else None
+
+
+class CentroidTier:
+    """Nearest-centroid classifier over message embeddings.
+
+    Keeps a running sum of unit-normalized example embeddings per label, so
+    adding an example is O(dim). Examples are appended to a JSONL file (for
+    audit and rebuilds); the sums are saved to an .npz tagged with the
+    embedding model, and discarded if the model changes.
+    """
+
+    def __init__(self, examples_path: Path, state_path: Path, model: str, margin: float):
+        self.examples_path = examples_path
+        self.state_path = state_path
+        self.model = model
+        self.margin = margin
+        self.sums: dict[str, np.ndarray] = {}
+        self.counts: dict[str, int] = {label: 0 for label in LABELS}
+
+    @property
+    def ready(self) -> bool:
+        return all(self.counts[label] > 0 for label in LABELS)
+
+    def load(self) -> bool:
+        """Load saved centroid sums. False if missing or from another model."""
+        if not self.state_path.exists():
+            return False
+        data = np.load(self.state_path)
+        if str(data["model"]) != self.model:
+            logger.info("Classifier centroids were built with another embedding model, rebuilding.")
+            return False
+        for i, label in enumerate(LABELS):
+            self.sums[label] = data["sums"][i].astype(np.float32)
+            self.counts[label] = int(data["counts"][i])
+        return True
+
+    def examples(self) -> list[tuple[str, str]]:
+        """All labelled examples: built-in seeds plus recorded ones."""
+        examples = [(text, label) for label, texts in SEED_EXAMPLES.items() for text in texts]
+        if self.examples_path.exists():
+            for line in self.examples_path.read_text().splitlines():
+                try:
+                    obj = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if obj.get("label") in LABELS:
+                    examples.append((obj["text"], obj["label"]))
+        return examples
+
+    def rebuild(self, examples: list[tuple[str, str]], embeddings: list[list[float]]):
+        self.sums = {}
+        self.counts = {label: 0 for label in LABELS}
+        for (_, label), embedding in zip(examples, embeddings):
+            self._add(label, embedding)
+        self.save()
+
+    def add(self, text: str, label: str, embedding: list[float], source: str = "llm"):
+        """Record a labelled example and fold it into the centroid."""
+        self._add(label, embedding)
+        with open(self.examples_path, "a") as f:
+            f.write(json.dumps({"text": text, "label": label, "source": source}, ensure_ascii=False) + "\n")
+        self.save()
+
+    def _add(self, label: str, embedding: list[float]):
+        vec = _unit(embedding)
+        self.sums[label] = self.sums.get(label, np.zeros_like(vec)) + vec
+        self.counts[label] += 1
+
+    def save(self):
+        if not self.ready:
+            return
+        tmp = self.state_path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            model=np.array(self.model),
+            sums=np.stack([self.sums[label] for label in LABELS]),
+            counts=np.array([self.counts[label] for label in LABELS]),
+        )
+        os.replace(tmp, self.state_path)
+
+    def scores(self, embedding: list[float]) -> dict[str, float]:
+        vec = _unit(embedding)
+        return {label: float(_unit(self.sums[label]) @ vec) for label in LABELS}
+
+    def classify(self, embedding: list[float]) -> tuple[Optional[str], dict[str, float]]:
+        """Best label if it beats the other by `margin`, else None; plus scores."""
+        if not self.ready:
+            return None, {}
+        scores = self.scores(embedding)
+        best, other = sorted(LABELS, key=scores.get, reverse=True)
+        if scores[best] - scores[other] >= self.margin:
+            return best, scores
+        return None, scores
+
+
+def _unit(vector) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm > 0 else arr
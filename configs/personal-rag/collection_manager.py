@@ -0,0 +1,88 @@
+"""
+Chroma collection handle and chunk count, resolved once per process.
+
+get_or_create_collection and collection.count() are each a SQLite round
+trip; /search and /query used to pay for both on every request. The
+manager resolves the collection on first use and keeps the count in memory.
+Writes go through upsert() and delete(), which recount once per write
+batch, so reads never touch SQLite for it and the count stays exact even
+when a batch overwrites IDs that already exist. Only this service writes
+to the collection, so nothing else can make the count stale. The client
+comes from a factory called on first use too, so opening Chroma can wait
+until the service starts up in the background.
+
+Blocking, like the Chroma calls it wraps: call it from a worker thread.
+"""
+
+import threading
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    import chromadb
+
+
+class CollectionManager:
+    def __init__(self, client: Callable[[], "chromadb.api.ClientAPI"], name: str, metadata: Optional[dict] = None):
+        self.client = client
+        self.name = name
+        self.metadata = metadata
+        self._collection = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    collection = self.client().get_or_create_collection(name=self.name, metadata=self.metadata)
+                    self._count = collection.count()
+                    self._collection = collection
+        return self._collection
+
+    def count(self) -> int:
+        """Chunks in the collection, without a round trip."""
+        self.collection
+        return self._count
+
+    def query(self, embedding: list[float], n: int, include: list[str], where: Optional[dict] = None) -> dict:
+        """Nearest `n` chunks, closest first: "ids", "distances" and the `include`d fields, as flat lists."""
+        results = self.collection.query(
+            query_embeddings=[embedding], n_results=n, where=where, include=include + ["distances"]
+        )
+        return {field: results[field][0] for field in ["ids", "distances", *include]}
+
+    def get(
+        self,
+        ids: Optional[list[str]] = None,
+        where: Optional[dict] = None,
+        include: Optional[list[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> dict:
+        """Chunks by ID and/or metadata filter: "ids" and the `include`d fields (include=[] for IDs only)."""
+        if include is None:
+            include = ["documents", "metadatas"]
+        return self.collection.get(ids=ids, where=where, include=include, limit=limit, offset=offset)
+
+    def upsert(self, ids: list[str], documents: list[str], embeddings: list, metadatas: list[dict]):
+        collection = self.collection
+        with self._lock:
+            collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+            self._count = collection.count()
+
+    def reset(self):
+        """Drop the collection and everything in it; it is recreated empty on next use."""
+        self.collection
+        with self._lock:
+            self.client().delete_collection(self.name)
+            self._collection = None
+            self._count = 0
+
+    def delete(self, ids: list[str]):
+        if not ids:
+            return
+        collection = self.collection
+        with self._lock:
+            collection.delete(ids=ids)
+            self._count = collection.count()
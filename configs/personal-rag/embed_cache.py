@@ -0,0 +1,125 @@
+"""
+Content-addressed embedding cache.
+
+SQLite table keyed by (model, sha256(text)) holding float32 vectors, so a
+chunk whose text has not changed is never sent to Ollama again. Entries are
+evicted least-recently-used once the cache grows past `max_entries`. Rows
+written by any other embedding model are dropped on open, so switching
+EMBED_MODEL invalidates the cache automatically.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("personal-rag")
+
+EVICT_FRACTION = 0.1  # evict down to 90% of max so eviction is amortized
+
+
+def _key(text: str) -> bytes:
+    return hashlib.sha256(text.encode()).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path, model: str, max_entries: int):
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL,"
+            " last_used INTEGER NOT NULL, PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+        purged = self._conn.execute("DELETE FROM embeddings WHERE model != ?", (model,)).rowcount
+        if purged:
+            logger.info("Embedding cache: dropped %d entries from other models.", purged)
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._clock = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM embeddings").fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get_many(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """Cached vectors for `texts`, None where missing. Marks hits as recently used."""
+        if not self.enabled:
+            self.misses += len(texts)
+            return [None] * len(texts)
+        keys = [_key(t) for t in texts]
+        found: dict[bytes, list[float]] = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            for start in range(0, len(unique), 500):
+                part = unique[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [self.model, *part],
+                ).fetchall()
+                for key, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+            if found:
+                self._clock += 1
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                    [(self._clock, self.model, key) for key in found],
+                )
+                self._conn.commit()
+            result = [found.get(key) for key in keys]
+            hits = sum(1 for v in result if v is not None)
+            self.hits += hits
+            self.misses += len(result) - hits
+        return result
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]):
+        if not self.enabled or not texts:
+            return
+        with self._lock:
+            self._clock += 1
+            rows = [
+                (self.model, _key(t), array("f", v).tobytes(), self._clock)
+                for t, v in zip(texts, vectors)
+            ]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self._count > self.max_entries:
+                target = int(self.max_entries * (1 - EVICT_FRACTION))
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE hash IN ("
+                    " SELECT hash FROM embeddings WHERE model = ? ORDER BY last_used LIMIT ?)",
+                    (self.model, self._count - target),
+                )
+                evicted = self._count - target
+                self.evictions += evicted
+                self._count = target
+                logger.info("Embedding cache: evicted %d least recently used entries.", evicted)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
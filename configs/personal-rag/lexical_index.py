@@ -0,0 +1,218 @@
+"""
+BM25 lexical index over the same chunks that live in Chroma.
+
+An in-memory inverted index (term -> {chunk id: term frequency}) that is
+updated alongside every Chroma upsert/delete and persisted as JSON next to
+the Chroma directory. It catches what embeddings miss: names, dates such as
+2025-01-12 (kept as one token), version strings and exact phrases.
+
+Each chunk gets an integer slot, and each term's BM25 weights are cached as
+a (slots, weights) NumPy pair, so scoring a query is one vectorized add per
+term. The cache is dropped on writes, since they change the average length.
+
+BM25 scores depend on corpus statistics (chunk count, average length and
+each term's document frequency), so scores from two indexes only compare
+when both are computed over the same statistics: search() takes the
+CorpusStats of several indexes, summed with merge_stats(), to score as if
+they were one index.
+"""
+
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger("personal-rag")
+
+INDEX_VERSION = 1
+_TOKEN_RE = re.compile(r"\d{4}-\d{2}-\d{2}|\w+(?:[.:]\w+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from had has have he her his i if in is it its me my "
+    "no not of on or our she so that the their them then there these they this to us was we were "
+    "what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class CorpusStats(NamedTuple):
+    docs: int
+    total_len: int
+    df: dict[str, int]  # query term -> chunks containing it
+
+
+def merge_stats(stats: Iterable[CorpusStats]) -> CorpusStats:
+    """Statistics of several indexes taken together."""
+    docs, total_len, df = 0, 0, {}
+    for part in stats:
+        docs += part.docs
+        total_len += part.total_len
+        for term, count in part.df.items():
+            df[term] = df.get(term, 0) + count
+    return CorpusStats(docs, total_len, df)
+
+
+class LexicalIndex:
+    def __init__(self, path: Path, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._docs: dict[str, dict[str, int]] = {}  # chunk id -> term frequencies
+        self._postings: dict[str, dict[str, int]] = {}  # term -> chunk id -> tf
+        self._doc_len: dict[str, int] = {}
+        self._total_len = 0
+        self._slots: dict[str, int] = {}  # chunk id -> row in the score vector
+        self._slot_ids: list[str] = []
+        self._free_slots: list[int] = []
+        # term -> (statistics they were computed with, slots, BM25 weights)
+        self._impacts: dict[str, tuple[tuple, np.ndarray, np.ndarray]] = {}
+        self._dirty = False  # changed since the last load/save
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def load(self) -> bool:
+        """Load the persisted index. False if missing, unreadable or outdated."""
+        if not self.path.exists():
+            return False
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable lexical index %s: %s", self.path, e)
+            return False
+        if data.get("version") != INDEX_VERSION:
+            return False
+        with self._lock:
+            self._reset()
+            for doc_id, tf in data["docs"].items():
+                self._add(doc_id, tf)
+            self._dirty = False
+        return True
+
+    def save(self):
+        """Persist the index, unless nothing changed since it was loaded or saved."""
+        with self._lock:
+            if not self._dirty and self.path.exists():
+                return
+            payload = json.dumps({"version": INDEX_VERSION, "docs": self._docs})
+            self._dirty = False
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(payload)
+            os.replace(tmp, self.path)
+        except OSError:
+            self._dirty = True
+            raise
+
+    def upsert(self, ids: list[str], texts: list[str]):
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                self._remove(doc_id)
+                self._add(doc_id, dict(Counter(tokenize(text))))
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._dirty = True
+
+    def remove(self, ids: list[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def stats(self, query: str) -> CorpusStats:
+        """This index's corpus statistics for the terms of `query`."""
+        terms = set(tokenize(query))
+        with self._lock:
+            df = {term: len(self._postings[term]) for term in terms if term in self._postings}
+            return CorpusStats(len(self._docs), self._total_len, df)
+
+    def search(
+        self, query: str, k: int, ids: Optional[Iterable[str]] = None, corpus: Optional[CorpusStats] = None
+    ) -> list[tuple[str, float]]:
+        """Top-k (chunk id, BM25 score) for `query`, only among `ids` if given.
+
+        With `corpus`, scores use those statistics instead of this index's own.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self._docs or not terms:
+                return []
+            scores = np.zeros(len(self._slot_ids), dtype=np.float32)
+            for term in terms:
+                if term not in self._postings:
+                    continue
+                key = (len(self._docs), self._total_len, len(self._postings[term]))
+                if corpus is not None:  # never below this index's own, which may have grown since
+                    key = tuple(map(max, key, (corpus.docs, corpus.total_len, corpus.df.get(term, 0))))
+                impact = self._impacts.get(term)
+                if impact is None or impact[0] != key:
+                    impact = self._impacts[term] = (key, *self._impact(term, *key))
+                scores[impact[1]] += impact[2]
+            if ids is not None:
+                allowed = np.zeros(len(scores), dtype=bool)
+                allowed[[self._slots[doc_id] for doc_id in ids if doc_id in self._slots]] = True
+                scores[~allowed] = 0
+            hits = np.flatnonzero(scores)
+            if len(hits) > k:
+                hits = hits[np.argpartition(scores[hits], -k)[-k:]]
+            top = heapq.nlargest(k, ((self._slot_ids[i], float(scores[i])) for i in hits), key=lambda x: x[1])
+        return top
+
+    def _impact(self, term: str, n: int, total_len: int, df: int) -> tuple[np.ndarray, np.ndarray]:
+        """Slots and BM25 weights of every chunk containing `term`, over a corpus of `n` chunks."""
+        postings = self._postings[term]
+        avg_len = total_len / n
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        slots = np.fromiter((self._slots[d] for d in postings), dtype=np.int64, count=len(postings))
+        tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+        lengths = np.fromiter((self._doc_len[d] for d in postings), dtype=np.float32, count=len(postings))
+        weights = idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * lengths / avg_len))
+        return slots, weights.astype(np.float32)
+
+    def _reset(self):
+        self._docs, self._postings, self._doc_len, self._total_len = {}, {}, {}, 0
+        self._slots, self._slot_ids, self._free_slots, self._impacts = {}, [], [], {}
+
+    def _add(self, doc_id: str, tf: dict[str, int]):
+        self._impacts.clear()
+        self._dirty = True
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = doc_id
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(doc_id)
+        self._slots[doc_id] = slot
+        self._docs[doc_id] = tf
+        length = sum(tf.values())
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def _remove(self, doc_id: str):
+        tf = self._docs.pop(doc_id, None)
+        if tf is None:
+            return
+        self._impacts.clear()
+        self._dirty = True
+        self._free_slots.append(self._slots.pop(doc_id))
+        self._total_len -= self._doc_len.pop(doc_id)
+        for term in tf:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
@@ -0,0 +1,169 @@
+"""
+Prometheus metrics and per-request stage timings.
+
+Every pipeline stage is timed with `stage(name)` (or `record()` for
+durations Ollama reports itself) into one histogram,
+rag_stage_seconds{stage=...}:
+
+    embed          query/message embedding, embedding cache included
+    sync_embed     embedding one write batch during a sync job
+    vector_query   Chroma nearest-neighbour query
+    lexical_query  BM25 search
+    chroma_get     fetching lexical-only hits from Chroma
+    prompt_build   MMR rerank, budget packing and prompt assembly
+    chat_queue     waiting for a chat slot
+    llm_load       model load, as reported by Ollama
+    llm_prefill    prompt evaluation, as reported by Ollama
+    llm_decode     token generation, as reported by Ollama
+
+The same durations are summed per request and returned in the X-Timing
+response header ("embed=12.1, vector_query=3.4, ..., total=95.0", in ms),
+so a single slow request can be profiled without Prometheus. Streaming
+/query responses send their headers before generation starts, so their
+`done` event carries the full `timings` instead.
+
+Counters that the caches already keep (hits, misses, evictions) and sizes
+that are cheap to read (collection and lexical index, per tier) are
+exported by a collector at scrape time rather than mirrored here.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.datastructures import MutableHeaders
+
+# 1 ms to 2 min: BM25 lookups sit at the bottom, cold qwen3:4b loads at the top
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_SECONDS = Histogram("rag_stage_seconds", "Time spent in each pipeline stage", ["stage"], buckets=BUCKETS)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds", "HTTP request latency by route", ["method", "route"], buckets=BUCKETS
+)
+SYNC_FILE_SECONDS = Histogram(
+    "rag_sync_file_seconds", "Time to parse and diff one changed file during sync", ["type"], buckets=BUCKETS
+)
+SYNC_PHASE_SECONDS = Histogram(
+    "rag_sync_phase_seconds", "Time spent in each sync job phase", ["phase"], buckets=BUCKETS
+)
+OLLAMA_ERRORS = Counter("rag_ollama_errors_total", "Failed Ollama calls, retried or not", ["endpoint"])
+OLLAMA_RETRIES = Counter("rag_ollama_retries_total", "Ollama calls retried after a transient failure", ["endpoint"])
+LLM_TOKENS = Counter("rag_llm_tokens_total", "Tokens processed by the chat model", ["kind"])
+COLD_FANOUTS = Counter("rag_cold_fanout_total", "Retrievals that also searched the cold tier")
+COMPACTED_CHUNKS = Counter("rag_compacted_chunks_total", "Chunks moved from the hot to the cold tier")
+
+OLLAMA_DURATIONS = (
+    ("load_duration", "llm_load"),
+    ("prompt_eval_duration", "llm_prefill"),
+    ("eval_duration", "llm_decode"),
+)
+
+_timings: ContextVar[Optional[dict]] = ContextVar("rag_timings", default=None)
+
+
+def record(name: str, seconds: float):
+    """Observe `seconds` for stage `name` and add it to the request's timings."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def record_ollama_stats(body: dict):
+    """Record the load/prefill/decode durations and token counts from a final /api/chat chunk."""
+    for field, name in OLLAMA_DURATIONS:
+        if body.get(field):
+            record(name, body[field] / 1e9)
+    LLM_TOKENS.labels("prompt").inc(body.get("prompt_eval_count") or 0)
+    LLM_TOKENS.labels("generated").inc(body.get("eval_count") or 0)
+
+
+def current_timings() -> dict[str, float]:
+    """Stage timings of the current request so far, in ms."""
+    return {name: round(ms, 1) for name, ms in (_timings.get() or {}).items()}
+
+
+def format_timings(timings: dict[str, float]) -> str:
+    return ", ".join(f"{name}={ms:.1f}" for name, ms in timings.items())
+
+
+class TimingMiddleware:
+    """Times each HTTP request, per route and per stage.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so the timings context is
+    shared with the endpoint and streaming bodies are passed through as-is.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _timings.set({})
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = round((time.perf_counter() - start) * 1000, 1)
+                MutableHeaders(scope=message).append("X-Timing", format_timings({**current_timings(), "total": total}))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(scope["method"], route.path if route else "unmatched").observe(
+                time.perf_counter() - start
+            )
+
+
+class ServiceCollector:
+    """Exports cache counters and index sizes, read when Prometheus scrapes.
+
+    `sizes` returns {name: (help, {tier: value})} for per-tier gauges;
+    `caches` returns {cache: stats()} for the embedding and answer caches.
+    """
+
+    def __init__(self, sizes: Callable[[], dict], caches: Callable[[], dict]):
+        self.sizes = sizes
+        self.caches = caches
+
+    def describe(self):
+        return []  # skip the collect() the registry would otherwise run at registration
+
+    def collect(self):
+        for name, (help_text, values) in self.sizes().items():
+            gauge = GaugeMetricFamily(name, help_text, labels=["tier"])
+            for tier, value in values.items():
+                gauge.add_metric([tier], value)
+            yield gauge
+        hits = CounterMetricFamily("rag_cache_hits", "Cache hits", labels=["cache", "match"])
+        misses = CounterMetricFamily("rag_cache_misses", "Cache misses", labels=["cache"])
+        evictions = CounterMetricFamily("rag_cache_evictions", "Embedding cache evictions", labels=["cache"])
+        entries = GaugeMetricFamily("rag_cache_entries", "Entries held by each cache", labels=["cache"])
+        for cache, stats in self.caches().items():
+            if "hits" in stats:
+                hits.add_metric([cache, "exact"], stats["hits"])
+            else:
+                hits.add_metric([cache, "exact"], stats["hits_exact"])
+                hits.add_metric([cache, "semantic"], stats["hits_semantic"])
+            misses.add_metric([cache], stats["misses"])
+            if "evictions" in stats:
+                evictions.add_metric([cache], stats["evictions"])
+            entries.add_metric([cache], stats["entries"])
+        yield from (hits, misses, evictions, entries)
@@ -0,0 +1,301 @@
+"""
+Brute-force vector store: a memory-mapped, quantized NumPy matrix.
+
+At tens of thousands of 768-d chunks an exact scan is a few milliseconds,
+so HNSW buys nothing while Chroma's graph, SQLite layer and Rust bindings
+cost memory and startup time. This store keeps:
+
+    vectors.npy   (capacity, dim) unit vectors, float16 or int8, memory-mapped
+    scales.npy    per-row dequantization scale (int8 only)
+    full.f32      raw float32 copy of every vector, read with pread (rescore only)
+    chunks.sqlite id -> row, document and JSON metadata
+
+A query scores every live row with one matmul per block of BLOCK_ROWS (the
+block is upcast into a reused float32 buffer, so BLAS does the work) and
+takes the exact top n. With rescore, 4x as many candidates are re-ranked
+against their float32 rows. int8 quarters the float32 footprint at ~1%
+score error and is the default: NumPy's float16-to-float32 cast is a
+scalar loop, which makes a float16 scan ~7x slower than an int8 one for
+half the saving.
+
+Implements the same interface as CollectionManager: count(), query(),
+get(), upsert(), delete() and reset(). `where` clauses (the subset
+rag_service builds: equality, $in, $gte, $lte, $and) run as SQL over the
+JSON metadata. Distances are cosine distances, as with Chroma's
+"hnsw:space": "cosine". Blocking: call it from a worker thread.
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+BLOCK_ROWS = 256  # rows upcast and scored at a time; a 768 KB float32 block stays in cache
+RESCORE_FACTOR = 4  # candidates re-ranked in float32, per result wanted
+DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+def _where_sql(where: dict) -> tuple[str, list]:
+    """SQL condition and parameters for a Chroma-style `where` clause."""
+    if "$and" in where:
+        parts = [_where_sql(clause) for clause in where["$and"]]
+        return " AND ".join(f"({sql})" for sql, _ in parts), [p for _, params in parts for p in params]
+    ((field, condition),) = where.items()
+    if not re.fullmatch(r"\w+", field):
+        raise ValueError(f"Unsupported metadata field {field!r}")
+    column = f"json_extract(metadata, '$.{field}')"
+    if not isinstance(condition, dict):
+        return f"{column} = ?", [condition]
+    ((op, value),) = condition.items()
+    if op == "$in":
+        return f"{column} IN ({','.join('?' * len(value))})", list(value)
+    if op in ("$gte", "$lte"):
+        return f"{column} {'>=' if op == '$gte' else '<='} ?", [value]
+    raise ValueError(f"Unsupported where operator {op}")
+
+
+class NumpyStore:
+    def __init__(self, directory: Path, dtype: str = "int8", rescore: bool = False):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}; use one of {', '.join(DTYPES)}")
+        self.directory = directory
+        self.name = directory.name
+        self.dtype = dtype
+        self.rescore = rescore
+        self._lock = threading.Lock()
+        self._open()
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.directory / "chunks.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, document TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._vectors = self._scales = self._full = None
+        if (self.directory / "vectors.npy").exists():
+            self._vectors = np.load(self.directory / "vectors.npy", mmap_mode="r+")
+            if self._vectors.dtype != DTYPES[self.dtype]:
+                raise ValueError(
+                    f"{self.directory} holds {self._vectors.dtype} vectors; set RAG_VECTOR_DTYPE to match "
+                    "or move the directory aside"
+                )
+            if self.dtype == "int8":
+                self._scales = np.load(self.directory / "scales.npy", mmap_mode="r+")
+            if self.rescore and not (self.directory / "full.f32").exists():
+                raise ValueError(f"{self.directory} was written without rescore vectors (full.f32)")
+        if self.rescore:
+            (self.directory / "full.f32").touch()
+            self._full = open(self.directory / "full.f32", "r+b")
+        else:
+            (self.directory / "full.f32").unlink(missing_ok=True)  # would go stale
+        capacity = 0 if self._vectors is None else len(self._vectors)
+        self._alive = np.zeros(capacity, dtype=bool)
+        rows = [row for (row,) in self._conn.execute("SELECT row FROM chunks")]
+        self._alive[rows] = True
+        self._high = max(rows, default=-1) + 1  # rows at or past this were never used
+        self._free = [int(row) for row in np.flatnonzero(~self._alive[: self._high])]
+        self._count = len(rows)
+
+    def count(self) -> int:
+        return self._count
+
+    def query(self, embedding: list[float], n: int, include: list[str], where: Optional[dict] = None) -> dict:
+        """Exact nearest `n` chunks by cosine distance, in the shape CollectionManager.query() returns."""
+        with self._lock:
+            vectors, scales, full, high = self._vectors, self._scales, self._full, self._high
+            alive = self._alive[:high].copy()
+        if vectors is None or n <= 0:
+            return {field: [] for field in ["ids", "distances", *include]}
+        if where is not None:
+            sql, params = _where_sql(where)
+            allowed = np.zeros(high, dtype=bool)
+            allowed[[row for (row,) in self._conn.execute(f"SELECT row FROM chunks WHERE {sql}", params)]] = True
+            alive &= allowed
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        scores = np.empty(high, dtype=np.float32)
+        block = np.empty((BLOCK_ROWS, vectors.shape[1]), dtype=np.float32)
+        for start in range(0, high, BLOCK_ROWS):
+            end = min(high, start + BLOCK_ROWS)
+            block[: end - start] = vectors[start:end]
+            np.matmul(block[: end - start], query, out=scores[start:end])
+            if scales is not None:
+                scores[start:end] *= scales[start:end]
+        scores[~alive] = -np.inf
+        live = int(alive.sum())
+        wanted = min(n, live)
+        pool = min(live, wanted * RESCORE_FACTOR) if full is not None else wanted
+        if pool == 0:
+            return {field: [] for field in ["ids", "distances", *include]}
+        top = np.argpartition(-scores, pool - 1)[:pool]
+        if full is not None:
+            top.sort()  # ascending offsets
+            scores[top] = self._read_full(top.tolist()) @ query
+        top = top[np.argsort(-scores[top], kind="stable")][:wanted]
+        result = self._rows(top.tolist(), include)
+        result["distances"] = [float(1.0 - scores[row]) for row in top]
+        return result
+
+    def get(
+        self,
+        ids: Optional[list[str]] = None,
+        where: Optional[dict] = None,
+        include: Optional[list[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> dict:
+        """Chunks by ID and/or metadata filter, in row order, like CollectionManager.get()."""
+        include = ["documents", "metadatas"] if include is None else include
+        conditions, params = [], []
+        if ids is not None:
+            if not ids:
+                return {field: [] for field in ["ids", *include]}
+            conditions.append(f"id IN ({','.join('?' * len(ids))})")
+            params += ids
+        if where is not None:
+            sql, where_params = _where_sql(where)
+            conditions.append(sql)
+            params += where_params
+        sql = "SELECT row FROM chunks" + (f" WHERE {' AND '.join(conditions)}" if conditions else "") + " ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        rows = [row for (row,) in self._conn.execute(sql, params)]
+        return self._rows(rows, include)
+
+    def _rows(self, rows: list[int], include: list[str]) -> dict:
+        """IDs and `include`d fields of `rows`, in that order."""
+        found = {}
+        for start in range(0, len(rows), 500):
+            part = rows[start : start + 500]
+            found.update(
+                (row, (doc_id, document, metadata))
+                for row, doc_id, document, metadata in self._conn.execute(
+                    f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(part))})",
+                    part,
+                )
+            )
+        rows = [row for row in rows if row in found]
+        result = {"ids": [found[row][0] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [found[row][1] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(found[row][2]) for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self._embeddings(rows)
+        return result
+
+    def _embeddings(self, rows: list[int]) -> np.ndarray:
+        if self._full is not None:
+            return self._read_full(rows)
+        vectors = self._vectors[rows].astype(np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows][:, None]
+        return vectors
+
+    def _read_full(self, rows: list[int]) -> np.ndarray:
+        """float32 rows from full.f32.
+
+        Read with pread rather than through a memory map, whose pages around
+        each scattered row (kernel fault-around) would all count towards RSS.
+        """
+        size = self._vectors.shape[1] * 4
+        fd = self._full.fileno()
+        data = b"".join(os.pread(fd, size, row * size) for row in rows)
+        return np.frombuffer(data, dtype=np.float32).reshape(len(rows), -1).copy()
+
+    def upsert(self, ids: list[str], documents: list[str], embeddings: list, metadatas: list[dict]):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            rows = []
+            existing = dict(self._conn.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids
+            )) if ids else {}
+            for doc_id in ids:
+                if doc_id in existing:
+                    rows.append(existing[doc_id])
+                elif self._free:
+                    rows.append(self._free.pop())
+                    existing[doc_id] = rows[-1]
+                else:
+                    rows.append(self._high)
+                    existing[doc_id] = self._high
+                    self._high += 1
+            self._reserve(self._high, matrix.shape[1])
+            if self._scales is not None:
+                scale = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+                self._vectors[rows] = np.round(matrix / scale[:, None]).astype(np.int8)
+                self._scales[rows] = scale
+            else:
+                self._vectors[rows] = matrix.astype(np.float16)
+            if self._full is not None:
+                size = matrix.shape[1] * 4
+                for row, vector in zip(rows, matrix):
+                    os.pwrite(self._full.fileno(), vector.tobytes(), row * size)
+            for array in (self._vectors, self._scales):
+                if array is not None:
+                    array.flush()  # vectors reach disk before SQLite points at them
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                [(doc_id, row, doc, json.dumps(meta)) for doc_id, row, doc, meta in zip(ids, rows, documents, metadatas)],
+            )
+            self._conn.commit()
+            self._alive[rows] = True
+            self._count = int(self._alive.sum())
+
+    def delete(self, ids: list[str]):
+        if not ids:
+            return
+        with self._lock:
+            rows = [row for (row,) in self._conn.execute(
+                f"SELECT row FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids
+            )]
+            self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(ids))})", ids)
+            self._conn.commit()
+            self._alive[rows] = False
+            self._free += rows
+            self._count = int(self._alive.sum())
+
+    def reset(self):
+        """Drop every chunk and the files holding them."""
+        with self._lock:
+            self._conn.close()
+            if self._full is not None:
+                self._full.close()
+            self._vectors = self._scales = self._full = None
+            shutil.rmtree(self.directory)
+            self._open()
+
+    def _reserve(self, rows: int, dim: int):
+        """Grow the memory-mapped files (doubling) to hold at least `rows` rows."""
+        capacity = 0 if self._vectors is None else len(self._vectors)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+        self._vectors = self._grow("vectors.npy", self._vectors, capacity, (dim,), DTYPES[self.dtype])
+        if self.dtype == "int8":
+            self._scales = self._grow("scales.npy", self._scales, capacity, (), np.float32)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self._alive)] = self._alive
+        self._alive = alive
+
+    def _grow(self, filename: str, old: Optional[np.ndarray], capacity: int, shape: tuple, dtype) -> np.ndarray:
+        path = self.directory / filename
+        tmp = path.with_suffix(".tmp.npy")
+        new = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=(capacity, *shape))
+        if old is not None:
+            new[: len(old)] = old
+        new.flush()
+        tmp.replace(path)
+        return new
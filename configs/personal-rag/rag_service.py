@@ -9,24 +9,62 @@ Endpoints:
     POST /query     - RAG query (search + generate with local model)
     POST /search    - Search only (return relevant chunks)
     POST /ingest    - Ingest new documents manually
-    POST /sync      - Re-sync from OpenClaw memory/sessions
+    POST /sync      - Queue an incremental sync from OpenClaw memory/sessions
+    GET  /sync/{id} - Sync job status and progress
     POST /classify  - Classify if message needs cloud or can go local
+    POST /compact   - Move aged conversations from the hot to the cold tier
+    POST /admin/export - Snapshot every chunk and its vector to disk
+    POST /admin/import - Restore a snapshot without re-embedding
+    POST /classify/examples - Add labelled examples for the centroid classifier
     GET  /stats     - Collection statistics
-    GET  /health    - Health check
+    GET  /metrics   - Prometheus metrics (stage latencies, Ollama errors, caches)
+    GET  /health    - Liveness, plus startup progress
+    GET  /health/ready - 200 once startup finished, 503 before
 """
 
+import asyncio
 import json
 import logging
 import os
 import re
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
-import chromadb
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 from pydantic import BaseModel
 
+from answer_cache import AnswerCache
+from chunker import CHUNKER_VERSION, chunk_ids, chunk_markdown, count_tokens, truncate_tokens
+from classifier import LABELS, CentroidTier, KeywordTier
+from collection_manager import CollectionManager
+from embed_cache import EmbeddingCache
+from lexical_index import CorpusStats, LexicalIndex, merge_stats
+from metrics import (
+    COLD_FANOUTS,
+    COMPACTED_CHUNKS,
+    OLLAMA_ERRORS,
+    OLLAMA_RETRIES,
+    SYNC_FILE_SECONDS,
+    SYNC_PHASE_SECONDS,
+    ServiceCollector,
+    TimingMiddleware,
+    current_timings,
+    record_ollama_stats,
+    stage,
+)
+from numpy_store import NumpyStore
+from rerank import select_context
+from snapshot import SnapshotError, export_snapshot, import_snapshot
+from sync_jobs import SyncJob, SyncQueue, watch_sources
+from sync_manifest import SyncManifest, content_hash
+from tiers import COLD, HOT, Tier, recency, tier_for, timestamp_epoch
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("personal-rag")
 
@@ -35,55 +73,436 @@ OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 EMBED_MODEL = os.environ.get("EMBED_MODEL", "nomic-embed-text")
 CHAT_MODEL = os.environ.get("CHAT_MODEL", "qwen3:4b")
 CHROMA_DIR = Path.home() / ".openclaw" / "personal-rag" / "chromadb"
+VECTOR_DIR = CHROMA_DIR.parent / "vectors"  # numpy backend
 MEMORY_DIR = Path.home() / ".openclaw" / "workspace" / "memory"
 SESSION_DIR = Path.home() / ".openclaw" / "agents" / "main" / "sessions"
+MANIFEST_PATH = CHROMA_DIR.parent / "sync_manifest.json"
+EMBED_CACHE_PATH = CHROMA_DIR.parent / "embed_cache.sqlite"
+LEXICAL_INDEX_PATH = CHROMA_DIR.parent / "lexical_index.json"
+COLD_LEXICAL_INDEX_PATH = CHROMA_DIR.parent / "lexical_index_archive.json"
+CLASSIFIER_EXAMPLES_PATH = CHROMA_DIR.parent / "classifier_examples.jsonl"
+CLASSIFIER_STATE_PATH = CHROMA_DIR.parent / "classifier_centroids.npz"
+SNAPSHOT_DIR = CHROMA_DIR.parent / "snapshots"
 TOP_K = int(os.environ.get("RAG_TOP_K", "5"))
+VECTOR_WEIGHT = float(os.environ.get("RAG_VECTOR_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.environ.get("RAG_LEXICAL_WEIGHT", "1.0"))  # 0 = vector-only retrieval
+RRF_K = int(os.environ.get("RAG_RRF_K", "60"))
+RETRIEVAL_DEPTH = 3  # candidates fetched from each retriever, as a multiple of top_k
+FILTER_OVERFETCH = 10  # candidates fetched per wanted one when metadata filters may drop hits
+RERANK_CANDIDATES = int(os.environ.get("RAG_RERANK_CANDIDATES", "20"))  # /query over-fetch before MMR
+MMR_LAMBDA = float(os.environ.get("RAG_MMR_LAMBDA", "0.7"))  # 1 = relevance only, lower = more diverse
+NUM_CTX = int(os.environ.get("RAG_NUM_CTX", "4096"))  # chat model context window (Modelfile num_ctx)
+ANSWER_TOKENS = int(os.environ.get("RAG_ANSWER_TOKENS", "512"))  # kept free for the answer
+CONTEXT_TOKENS = int(os.environ.get("RAG_CONTEXT_TOKENS", "768"))  # retrieved context per /query
+EMBED_BATCH_SIZE = int(os.environ.get("RAG_EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.environ.get("RAG_EMBED_CONCURRENCY", "2"))
+EMBED_RETRIES = int(os.environ.get("RAG_EMBED_RETRIES", "3"))
+EMBED_TIMEOUT = float(os.environ.get("RAG_EMBED_TIMEOUT", "60"))
+CHAT_CONCURRENCY = int(os.environ.get("RAG_CHAT_CONCURRENCY", "2"))
+CHAT_TIMEOUT = float(os.environ.get("RAG_CHAT_TIMEOUT", "300"))  # qwen3:4b on CPU can be slow on cold start
+WARM_UP = os.environ.get("RAG_WARM_UP", "1") == "1"  # load both models in Ollama at startup
+KEEP_ALIVE = os.environ.get("RAG_KEEP_ALIVE", "-1")  # how long Ollama keeps the models loaded; negative = forever
+READY_TIMEOUT = float(os.environ.get("RAG_READY_TIMEOUT", "600"))  # requests wait this long for startup, then 503
+EMBED_CACHE_MAX = int(os.environ.get("RAG_EMBED_CACHE_MAX", "50000"))  # 0 disables
+ANSWER_CACHE_MAX = int(os.environ.get("RAG_ANSWER_CACHE_MAX", "1000"))  # 0 disables
+ANSWER_CACHE_TTL = float(os.environ.get("RAG_ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("RAG_ANSWER_CACHE_SIMILARITY", "0.95"))
+CLASSIFY_MARGIN = float(os.environ.get("RAG_CLASSIFY_MARGIN", "0.05"))
+CHUNK_TOKENS = int(os.environ.get("RAG_CHUNK_TOKENS", "256"))  # chunk budget, estimated tokens
+SYNC_WATCH = os.environ.get("RAG_WATCH", "0") == "1"  # sync automatically when sources change
+SYNC_WATCH_DEBOUNCE_MS = int(os.environ.get("RAG_WATCH_DEBOUNCE_MS", "2000"))
+HOT_DAYS = float(os.environ.get("RAG_HOT_DAYS", "30"))  # conversations older than this go to the cold tier
+COLD_DISTANCE = float(os.environ.get("RAG_COLD_DISTANCE", "0.45"))  # hot vector hits this close count as good
+HOT_MIN_HITS = int(os.environ.get("RAG_HOT_MIN_HITS", "2"))  # fewer good hot hits: search the cold tier too
+DECAY_HALF_LIFE_DAYS = float(os.environ.get("RAG_DECAY_HALF_LIFE_DAYS", "90"))
+DECAY_WEIGHT = float(os.environ.get("RAG_DECAY_WEIGHT", "0.05"))  # 0 = no recency preference
+COMPACT_INTERVAL = float(os.environ.get("RAG_COMPACT_INTERVAL", "3600"))  # seconds; 0 = only on POST /compact
+# /ingest saves the BM25 indexes this many seconds later, once for every ingest in between
+LEXICAL_SAVE_DELAY = float(os.environ.get("RAG_LEXICAL_SAVE_DELAY", "5"))
+WRITE_BATCH_SIZE = 256  # chunks embedded + upserted per Chroma write
+VECTOR_BACKEND = os.environ.get("RAG_VECTOR_BACKEND", "chroma")  # "numpy": exact brute-force search
+VECTOR_DTYPE = os.environ.get("RAG_VECTOR_DTYPE", "int8")  # numpy backend: "int8" or "float16"
+VECTOR_RESCORE = os.environ.get("RAG_VECTOR_RESCORE", "0") == "1"  # numpy backend: re-rank top hits in float32
 
 # --- Startup ---
-CHROMA_DIR.mkdir(parents=True, exist_ok=True)
-chroma_client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+if VECTOR_BACKEND not in ("chroma", "numpy"):
+    raise ValueError(f"RAG_VECTOR_BACKEND must be 'chroma' or 'numpy', not {VECTOR_BACKEND!r}")
+if re.fullmatch(r"-?\d+", KEEP_ALIVE):
+    KEEP_ALIVE = int(KEEP_ALIVE)  # Ollama reads a bare number as seconds, but not a string without a unit
+CHROMA_DIR.parent.mkdir(parents=True, exist_ok=True)
+_chroma_client = None
+_chroma_lock = threading.Lock()
+
+
+def chroma_client():
+    """The Chroma client, opened on first use rather than at import.
+
+    Importing chromadb and opening the store take over a second, which the
+    numpy backend skips entirely and the service does in the background
+    while its port is already open.
+    """
+    global _chroma_client
+    with _chroma_lock:
+        if _chroma_client is None:
+            import chromadb
+
+            _chroma_client = chromadb.PersistentClient(path=str(CHROMA_DIR))
+    return _chroma_client
+
+
+def _open_store(name: str):
+    """The vector store of one tier, for the configured backend."""
+    if VECTOR_BACKEND == "numpy":
+        return NumpyStore(VECTOR_DIR / name, VECTOR_DTYPE, VECTOR_RESCORE)
+    return CollectionManager(chroma_client, name, {"hnsw:space": "cosine"})
+
+
+tiers = {
+    HOT: Tier(HOT, _open_store("personal_knowledge"), LexicalIndex(LEXICAL_INDEX_PATH)),
+    COLD: Tier(COLD, _open_store("personal_knowledge_archive"), LexicalIndex(COLD_LEXICAL_INDEX_PATH)),
+}
+embed_cache = EmbeddingCache(EMBED_CACHE_PATH, EMBED_MODEL, EMBED_CACHE_MAX)
+answer_cache = AnswerCache(ANSWER_CACHE_TTL, ANSWER_CACHE_MAX, ANSWER_CACHE_SIMILARITY)
+keyword_tier = KeywordTier()
+centroid_tier = CentroidTier(CLASSIFIER_EXAMPLES_PATH, CLASSIFIER_STATE_PATH, EMBED_MODEL, CLASSIFY_MARGIN)
+
+http_client: Optional[httpx.AsyncClient] = None  # pooled, opened in lifespan()
+# Separate slots so a long generation never holds up embedding (and vice versa)
+embed_slots = asyncio.Semaphore(EMBED_CONCURRENCY)
+chat_slots = asyncio.Semaphore(CHAT_CONCURRENCY)
+centroid_lock = asyncio.Lock()
+write_lock = asyncio.Lock()  # sync and compaction both move chunks between tiers
+# Startup steps run in the background: pending, ready, skipped or "failed: <error>"
+startup = {"store": "pending", "embed_model": "pending", "chat_model": "pending"}
+lexical_save: Optional[asyncio.Task] = None  # debounced save after /ingest
+ready = asyncio.Event()  # set once every startup step has finished, successfully or not
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(CHAT_TIMEOUT, connect=5.0),
+        limits=httpx.Limits(max_connections=EMBED_CONCURRENCY + CHAT_CONCURRENCY + 4),
+    )
+    tasks = [asyncio.create_task(_start_up()), asyncio.create_task(sync_queue.run_forever())]
+    if COMPACT_INTERVAL > 0:
+        tasks.append(asyncio.create_task(_compact_forever()))
+    if SYNC_WATCH:
+        tasks.append(asyncio.create_task(watch_sources(sync_queue, [MEMORY_DIR, SESSION_DIR], SYNC_WATCH_DEBOUNCE_MS)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if lexical_save is not None:
+            lexical_save.cancel()
+        if startup["store"] == "ready":
+            await asyncio.to_thread(_save_lexical_indexes)  # what a pending debounced save would have written
+        await http_client.aclose()
 
-app = FastAPI(title="Personal RAG", version="1.0.0")
-http_client = httpx.Client(timeout=300.0)  # 5 min — qwen3:4b on CPU can be slow on cold start
 
+app = FastAPI(title="Personal RAG", version="1.0.0", lifespan=lifespan)
+app.add_middleware(TimingMiddleware)
 
-def get_collection():
-    """Get or create the personal knowledge collection."""
-    return chroma_client.get_or_create_collection(
-        name="personal_knowledge",
-        metadata={"hnsw:space": "cosine"},
-    )
 
+def _open_stores():
+    """Resolve every tier's store and load its lexical index, or rebuild it.
 
-def ollama_embed(texts: list[str]) -> list[list[float]]:
-    """Get embeddings from Ollama nomic-embed-text."""
-    embeddings = []
-    for text in texts:
-        resp = http_client.post(
-            f"{OLLAMA_HOST}/api/embeddings",
-            json={"model": EMBED_MODEL, "prompt": text},
+    An index that does not cover the store (the service stopped before a
+    debounced save) is rebuilt too.
+    """
+    for tier in tiers.values():
+        if not tier.lexical.load() or len(tier.lexical) != tier.store.count():
+            _rebuild_lexical_index(tier)
+
+
+async def _warm_up(endpoint: str, payload: dict):
+    """Load a model in Ollama and pin it there for KEEP_ALIVE.
+
+    Ollama loads the model for an empty chat without generating anything.
+    """
+    try:
+        resp = await http_client.post(
+            f"{OLLAMA_HOST}{endpoint}", json={**payload, "keep_alive": KEEP_ALIVE}, timeout=CHAT_TIMEOUT
         )
         resp.raise_for_status()
-        embeddings.append(resp.json()["embedding"])
+    except httpx.HTTPError:
+        OLLAMA_ERRORS.labels("warm_up").inc()
+        raise
+
+
+async def _startup_step(name: str, step):
+    start = time.perf_counter()
+    try:
+        await step
+    except Exception as e:
+        startup[name] = f"failed: {e}"
+        logger.warning("Startup: %s failed after %.1fs: %s", name, time.perf_counter() - start, e)
+    else:
+        startup[name] = "ready"
+        logger.info("Startup: %s ready in %.1fs.", name, time.perf_counter() - start)
+
+
+async def _start_up():
+    """Open the store and load both models in Ollama side by side, then release held requests.
+
+    A model that fails to load does not hold the service back: requests
+    then load it themselves, as they would without warm-up.
+    """
+    start = time.perf_counter()
+    steps = [_startup_step("store", asyncio.to_thread(_open_stores))]
+    if WARM_UP:
+        steps.append(_startup_step("embed_model", _warm_up("/api/embed", {"model": EMBED_MODEL, "input": ["warm-up"]})))
+        steps.append(_startup_step("chat_model", _warm_up("/api/chat", {"model": CHAT_MODEL, "messages": []})))
+    else:
+        startup["embed_model"] = startup["chat_model"] = "skipped"
+    await asyncio.gather(*steps)
+    ready.set()
+    logger.info("Ready in %.1fs.", time.perf_counter() - start)
+
+
+async def wait_ready():
+    """Hold a request that arrives during startup until the store is open and the models are loaded."""
+    if not ready.is_set():
+        try:
+            await asyncio.wait_for(ready.wait(), READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Service is still starting")
+    if startup["store"] != "ready":
+        raise HTTPException(status_code=503, detail=f"Vector store unavailable: {startup['store']}")
+
+
+def _rebuild_lexical_index(tier: Tier):
+    """Rebuild a tier's BM25 index from the documents stored in Chroma."""
+    data = tier.store.get(include=["documents"])
+    tier.lexical.upsert(data["ids"], data["documents"])
+    tier.lexical.save()
+    logger.info("Built %s lexical index over %d chunks.", tier.name, len(data["ids"]))
+
+
+async def _embed_batch(batch: list[str]) -> list[list[float]]:
+    """Embed one batch via /api/embed, retrying transient failures with backoff."""
+    for attempt in range(EMBED_RETRIES + 1):
+        try:
+            async with embed_slots:
+                resp = await http_client.post(
+                    f"{OLLAMA_HOST}/api/embed",
+                    json={"model": EMBED_MODEL, "input": batch, "keep_alive": KEEP_ALIVE},
+                    timeout=EMBED_TIMEOUT,
+                )
+            resp.raise_for_status()
+            embeddings = resp.json()["embeddings"]
+            if len(embeddings) != len(batch):
+                raise ValueError(f"expected {len(batch)} embeddings, got {len(embeddings)}")
+            return embeddings
+        except httpx.HTTPStatusError as e:
+            OLLAMA_ERRORS.labels("embed").inc()
+            # 4xx (unknown model, bad request) will not fix itself
+            if e.response.status_code < 500 or attempt == EMBED_RETRIES:
+                raise
+            error = e
+        except (httpx.TransportError, ValueError) as e:
+            OLLAMA_ERRORS.labels("embed").inc()
+            if attempt == EMBED_RETRIES:
+                raise
+            error = e
+        OLLAMA_RETRIES.labels("embed").inc()
+        delay = 0.5 * 2**attempt
+        logger.warning("Embed batch of %d failed (%s), retry in %.1fs", len(batch), error, delay)
+        await asyncio.sleep(delay)
+
+
+async def ollama_embed(texts: list[str], background: bool = False) -> list[list[float]]:
+    """Get embeddings from Ollama nomic-embed-text.
+
+    Texts already in the embedding cache are not sent to Ollama; the rest are
+    de-duplicated, embedded and written back to the cache. `background` work
+    (sync) sends one batch at a time, so it never takes every embed slot.
+    """
+    if not texts:
+        return []
+    with stage("sync_embed" if background else "embed"):
+        embeddings = await asyncio.to_thread(embed_cache.get_many, texts)
+        missing = list(dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None))
+        if missing:
+            fresh = dict(zip(missing, await _embed_uncached(missing, background)))
+            await asyncio.to_thread(embed_cache.put_many, missing, [fresh[t] for t in missing])
+            embeddings = [e if e is not None else fresh[t] for t, e in zip(texts, embeddings)]
     return embeddings
 
 
-def ollama_chat(messages: list[dict], temperature: float = 0.3) -> str:
+async def _embed_uncached(texts: list[str], background: bool = False) -> list[list[float]]:
+    """Embed texts via Ollama.
+
+    Texts are sent in batches of EMBED_BATCH_SIZE, with at most
+    EMBED_CONCURRENCY batches in flight (one if `background`). Each batch is
+    retried on its own.
+    """
+    batches = [texts[i : i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    embeddings = []
+    if background:
+        for batch in batches:
+            embeddings.extend(await _embed_batch(batch))
+        return embeddings
+    for result in await asyncio.gather(*(_embed_batch(b) for b in batches)):
+        embeddings.extend(result)
+    return embeddings
+
+
+async def upsert_chunks(
+    ids: list[str], documents: list[str], metadatas: list[dict], job: Optional[SyncJob] = None
+) -> int:
+    """Embed and upsert chunks in bulk, WRITE_BATCH_SIZE at a time.
+
+    With a sync `job`, embedding runs in the background and progress is
+    recorded on the job.
+    """
+    for start in range(0, len(ids), WRITE_BATCH_SIZE):
+        end = start + WRITE_BATCH_SIZE
+        embeddings = await ollama_embed(documents[start:end], background=job is not None)
+        await asyncio.to_thread(_write_batch, ids[start:end], documents[start:end], embeddings, metadatas[start:end])
+        if job is not None:
+            job.chunks_done = min(end, len(ids))
+    return len(ids)
+
+
+def _write_batch(ids: list[str], documents: list[str], embeddings: list, metadatas: list[dict]):
+    """Upsert chunks into the tier each belongs in, and out of the other tier."""
+    now = time.time()
+    rows: dict[str, list[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        rows.setdefault(tier_for(metadata, now, HOT_DAYS), []).append(i)
+    for name, picked in rows.items():
+        tier, other = tiers[name], tiers[COLD if name == HOT else HOT]
+        batch_ids = [ids[i] for i in picked]
+        batch_documents = [documents[i] for i in picked]
+        tier.store.upsert(batch_ids, batch_documents, [embeddings[i] for i in picked], [metadatas[i] for i in picked])
+        tier.lexical.upsert(batch_ids, batch_documents)
+        if other.store.count():
+            other.store.delete(batch_ids)
+        other.lexical.remove(batch_ids)
+
+
+async def _acquire_chat_slot():
+    with stage("chat_queue"):
+        await chat_slots.acquire()
+
+
+async def ollama_chat(messages: list[dict], temperature: float = 0.3) -> str:
     """Chat with local Ollama model."""
-    resp = http_client.post(
-        f"{OLLAMA_HOST}/api/chat",
-        json={
-            "model": CHAT_MODEL,
-            "messages": messages,
-            "stream": False,
-            "options": {
-                "temperature": temperature,
-                "num_ctx": 4096,
+    await _acquire_chat_slot()
+    try:
+        resp = await http_client.post(
+            f"{OLLAMA_HOST}/api/chat",
+            json={
+                "model": CHAT_MODEL,
+                "messages": messages,
+                "keep_alive": KEEP_ALIVE,
+                "stream": False,
+                "options": {
+                    "temperature": temperature,
+                    "num_ctx": NUM_CTX,
+                },
             },
-        },
-    )
-    resp.raise_for_status()
-    return resp.json()["message"]["content"]
+            timeout=CHAT_TIMEOUT,
+        )
+        resp.raise_for_status()
+    except httpx.HTTPError:
+        OLLAMA_ERRORS.labels("chat").inc()
+        raise
+    finally:
+        chat_slots.release()
+    body = resp.json()
+    record_ollama_stats(body)
+    return body["message"]["content"]
+
+
+async def ollama_chat_stream(messages: list[dict], temperature: float = 0.3):
+    """Chat with local Ollama model, yielding content pieces as they arrive."""
+    await _acquire_chat_slot()
+    try:
+        async with http_client.stream(
+            "POST",
+            f"{OLLAMA_HOST}/api/chat",
+            json={
+                "model": CHAT_MODEL,
+                "messages": messages,
+                "keep_alive": KEEP_ALIVE,
+                "stream": True,
+                "options": {
+                    "temperature": temperature,
+                    "num_ctx": NUM_CTX,
+                },
+            },
+            timeout=CHAT_TIMEOUT,
+        ) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+                content = chunk.get("message", {}).get("content", "")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    record_ollama_stats(chunk)
+                    break
+    except (httpx.HTTPError, RuntimeError):
+        OLLAMA_ERRORS.labels("chat").inc()
+        raise
+    finally:
+        chat_slots.release()
+
+
+class ThinkFilter:
+    """Drops <think>...</think> blocks from a token stream.
+
+    Tags can be split across tokens, so a trailing partial tag is held back
+    until the next token settles it. Leading whitespace of the answer is
+    dropped too (qwen3 emits blank lines after </think>).
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self.buffer = ""
+        self.thinking = False
+        self.started = False
+
+    def feed(self, text: str) -> str:
+        self.buffer += text
+        out = []
+        while True:
+            tag = self.CLOSE if self.thinking else self.OPEN
+            idx = self.buffer.find(tag)
+            if idx >= 0:
+                if not self.thinking:
+                    out.append(self.buffer[:idx])
+                self.buffer = self.buffer[idx + len(tag) :]
+                self.thinking = not self.thinking
+                continue
+            keep = next((k for k in range(len(tag) - 1, 0, -1) if self.buffer.endswith(tag[:k])), 0)
+            split = len(self.buffer) - keep
+            if not self.thinking:
+                out.append(self.buffer[:split])
+            self.buffer = self.buffer[split:]
+            return self._visible("".join(out))
+
+    def flush(self) -> str:
+        rest = "" if self.thinking else self.buffer
+        self.buffer = ""
+        return self._visible(rest)
+
+    def _visible(self, text: str) -> str:
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        return text
 
 
 def extract_text_from_content(content) -> str:
@@ -110,19 +529,103 @@ def strip_telegram_envelope(text: str) -> str:
     return text.strip()
 
 
+def memory_chunks(md_file: Path) -> list[tuple[str, str, dict]]:
+    """Split a memory markdown file into (id, text, metadata) chunks.
+
+    IDs are content hashes, so editing one section leaves the IDs (and
+    vectors) of every other section untouched.
+    """
+    chunks = chunk_markdown(md_file.read_text(), CHUNK_TOKENS)
+    return [
+        (chunk_id, chunk.text, {"source": f"memory/{md_file.name}", "type": "memory", "headings": chunk.breadcrumb})
+        for chunk_id, chunk in zip(chunk_ids(f"memory_{md_file.stem}", chunks), chunks)
+    ]
+
+
+def session_chunks(
+    sf: Path, offset: int = 0, state: Optional[dict] = None
+) -> tuple[list[tuple[str, str, dict]], int, dict]:
+    """Extract user/assistant pairs from a session log, starting at byte `offset`.
+
+    Only complete lines are consumed. `state` carries the message count and the
+    last user message between calls, so a pair split across two syncs is still
+    found. Long replies are split into several chunks, each repeating the user
+    message. Returns (chunks, new_offset, new_state).
+    """
+    state = dict(state or {"count": 0, "prev": None})
+    with open(sf, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    chunks = []
+    for line in data[:end].decode("utf-8", errors="replace").splitlines():
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(obj, dict) or obj.get("type") != "message":
+            continue
+
+        i = state["count"]
+        state["count"] += 1
+        message = obj.get("message", {})
+        prev, state["prev"] = state["prev"], None
+        if message.get("role") == "user":
+            state["prev"] = {
+                "text": extract_text_from_content(message.get("content", "")),
+                "timestamp": obj.get("timestamp", ""),
+            }
+            continue
+        if message.get("role") != "assistant" or prev is None:
+            continue
+
+        user_text = prev["text"]
+        asst_text = extract_text_from_content(message.get("content", ""))
+        if len(user_text) < 5 or len(asst_text) < 10:
+            continue
+
+        clean_user = strip_telegram_envelope(user_text)
+        if not clean_user:
+            continue
+
+        user_line = f"User: {truncate_tokens(clean_user, CHUNK_TOKENS // 2)}\nAssistant: "
+        pieces = chunk_markdown(asst_text, CHUNK_TOKENS - count_tokens(user_line))
+        metadata = {"source": f"session/{sf.name}", "type": "conversation"}
+        timestamp = timestamp_epoch(prev["timestamp"])
+        if timestamp is not None:
+            metadata["timestamp"] = timestamp  # epoch seconds, so date filters run inside Chroma
+        for k, piece in enumerate(pieces):
+            chunks.append((f"session_{sf.stem}_{i - 1}" + (f"_{k}" if k else ""), user_line + piece.text, metadata))
+    return chunks, offset + end, state
+
+
 # --- Request/Response Models ---
 
 
-class QueryRequest(BaseModel):
+class Filters(BaseModel):
+    """Metadata filters, applied inside Chroma's vector query."""
+
+    type: Optional[Union[str, list[str]]] = None  # "memory" and/or "conversation"
+    source: Optional[Union[str, list[str]]] = None  # e.g. "memory/2025-01-12.md", "session/<id>.jsonl"
+    since: Optional[Union[float, str]] = None  # epoch seconds or ISO date; only timestamped chunks match
+    until: Optional[Union[float, str]] = None
+
+
+class QueryRequest(Filters):
     query: str
     top_k: int = TOP_K
+    vector_weight: float = VECTOR_WEIGHT  # reciprocal rank fusion weights
+    lexical_weight: float = LEXICAL_WEIGHT
     temperature: float = 0.3
     system_prompt: Optional[str] = None
+    stream: bool = False  # Server-Sent Events: sources, then tokens, then done
 
 
-class SearchRequest(BaseModel):
+class SearchRequest(Filters):
     query: str
     top_k: int = TOP_K
+    vector_weight: float = VECTOR_WEIGHT  # reciprocal rank fusion weights
+    lexical_weight: float = LEXICAL_WEIGHT
 
 
 class IngestRequest(BaseModel):
@@ -131,14 +634,28 @@ class IngestRequest(BaseModel):
     ids: Optional[list[str]] = None
 
 
+class SnapshotRequest(BaseModel):
+    name: Optional[str] = None  # directory under SNAPSHOT_DIR; export defaults to a timestamp
+
+
 class ClassifyRequest(BaseModel):
     message: str
 
 
+class ClassifyExample(BaseModel):
+    text: str
+    label: str
+
+
+class ClassifyExamplesRequest(BaseModel):
+    examples: list[ClassifyExample]
+
+
 class QueryResponse(BaseModel):
     answer: str
     sources: list[dict]
     model: str
+    cached: bool = False
 
 
 class SearchResponse(BaseModel):
@@ -149,91 +666,327 @@ class SearchResponse(BaseModel):
 class ClassifyResponse(BaseModel):
     category: str
     confidence: str
+    tier: str = "llm"  # keyword | centroid | llm
+    timings: dict[str, float] = {}  # ms spent in each tier that ran
+    cached: bool = False
 
 
 # --- Endpoints ---
 
 
 @app.get("/health")
-def health():
+async def health():
+    """Liveness: answers as soon as the port is open, with startup progress in `startup`."""
     try:
-        resp = http_client.get(f"{OLLAMA_HOST}/api/tags")
+        resp = await http_client.get(f"{OLLAMA_HOST}/api/tags", timeout=5.0)
         ollama_ok = resp.status_code == 200
     except Exception:
         ollama_ok = False
 
-    collection = get_collection()
     return {
         "status": "ok" if ollama_ok else "degraded",
+        "ready": ready.is_set() and startup["store"] == "ready",
+        "startup": startup,
         "ollama": ollama_ok,
         "embed_model": EMBED_MODEL,
         "chat_model": CHAT_MODEL,
-        "documents": collection.count(),
+        "documents": sum(tier.store.count() for tier in tiers.values()) if startup["store"] == "ready" else None,
     }
 
 
-@app.get("/stats")
-def stats():
-    collection = get_collection()
+@app.get("/health/ready")
+async def health_ready(response: Response):
+    """Readiness: 200 once the store is open and the models are warm, 503 until then."""
+    is_ready = ready.is_set() and startup["store"] == "ready"
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready, "startup": startup}
+
+
+@app.get("/stats", dependencies=[Depends(wait_ready)])
+async def stats():
     return {
-        "total_documents": collection.count(),
-        "collection_name": collection.name,
+        "total_documents": sum(tier.store.count() for tier in tiers.values()),
+        "collection_name": tiers[HOT].store.name,
+        "tiers": {
+            name: {"collection": tier.store.name, "documents": tier.store.count(), "lexical_chunks": len(tier.lexical)}
+            for name, tier in tiers.items()
+        },
         "chroma_dir": str(CHROMA_DIR),
+        "embed_cache": embed_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "sync_job": sync_queue.current.to_dict() if sync_queue.current else None,
     }
 
 
-@app.post("/search", response_model=SearchResponse)
-def search(req: SearchRequest):
-    """Search for relevant personal knowledge chunks."""
-    collection = get_collection()
-    if collection.count() == 0:
-        return SearchResponse(results=[], count=0)
+def _metric_sizes() -> dict:
+    return {
+        "rag_collection_chunks": (
+            "Chunks in each tier's Chroma collection",
+            {name: tier.store.count() for name, tier in tiers.items()},
+        ),
+        "rag_lexical_index_chunks": (
+            "Chunks in each tier's BM25 index",
+            {name: len(tier.lexical) for name, tier in tiers.items()},
+        ),
+    }
 
-    query_embedding = ollama_embed([req.query])[0]
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=min(req.top_k, collection.count()),
-    )
 
-    formatted = []
-    for i in range(len(results["ids"][0])):
-        formatted.append(
-            {
-                "id": results["ids"][0][i],
-                "text": results["documents"][0][i],
-                "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                "distance": results["distances"][0][i] if results["distances"] else None,
+def _metric_caches() -> dict:
+    return {"embed": embed_cache.stats(), "answer": answer_cache.stats()}
+
+
+REGISTRY.register(ServiceCollector(_metric_sizes, _metric_caches))
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, Ollama errors, cache hits, index sizes."""
+    body = await asyncio.to_thread(generate_latest, REGISTRY)
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
+
+
+def _where(filters: Filters) -> Optional[dict]:
+    """Chroma `where` clause for a request's metadata filters, None without any.
+
+    Lists match any of their values; since/until compare the numeric epoch
+    `timestamp`, so chunks without one (memory notes) never match a date range.
+    """
+    clauses = []
+    for field in ("type", "source"):
+        value = getattr(filters, field)
+        if isinstance(value, list):
+            clauses.append({field: {"$in": value}})
+        elif value is not None:
+            clauses.append({field: value})
+    for field, op in (("since", "$gte"), ("until", "$lte")):
+        value = getattr(filters, field)
+        if value is None:
+            continue
+        epoch = timestamp_epoch(value)
+        if epoch is None:
+            raise HTTPException(status_code=400, detail=f"Invalid {field}: expected epoch seconds or an ISO date")
+        clauses.append({"timestamp": {op: epoch}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _matches(where: dict, metadata: dict) -> bool:
+    """Evaluate a _where() clause against one chunk's metadata.
+
+    Over-fetched hits are checked here rather than by Chroma, which applies a
+    `where` (even to get(ids=...)) by scanning the whole metadata table.
+    """
+    if "$and" in where:
+        return all(_matches(clause, metadata) for clause in where["$and"])
+    (field, condition), = where.items()
+    value = metadata.get(field)
+    if not isinstance(condition, dict):
+        return value == condition
+    if "$in" in condition:
+        return value in condition["$in"]
+    if not isinstance(value, (int, float)):
+        return False
+    return value >= condition.get("$gte", value) and value <= condition.get("$lte", value)
+
+
+async def _vector_query(
+    tier: Tier, query_embedding: list[float], n: int, include: list[str], where: Optional[dict] = None
+) -> list[dict]:
+    results = await asyncio.to_thread(tier.store.query, query_embedding, n, include, where)
+    hits = []
+    for i, doc_id in enumerate(results["ids"]):
+        hit = {
+            "id": doc_id,
+            "text": results["documents"][i],
+            "metadata": results["metadatas"][i] or {},
+            "distance": results["distances"][i],
+            "tier": tier.name,
+        }
+        if "embeddings" in include:
+            hit["embedding"] = results["embeddings"][i]
+        hits.append(hit)
+    return hits
+
+
+async def _search_tier(
+    tier: Tier,
+    query_text: str,
+    query_embedding: Optional[list[float]],
+    depth: int,
+    vector_weight: float,
+    lexical_weight: float,
+    include: list[str],
+    where: Optional[dict] = None,
+    corpus: Optional[CorpusStats] = None,
+) -> tuple[list[dict], list[tuple[str, float, Tier]]]:
+    """Vector hits (closest first) and BM25 hits (best first) from one tier.
+
+    With a `where` filter, both retrievers over-fetch and keep the hits that
+    match it (the BM25 index has no metadata, so lexical hits have theirs
+    fetched). A filter too selective to fill `depth` that way falls back to
+    an exact search: Chroma's `where` for vectors, and BM25 restricted to
+    the IDs the store finds for it. BM25 scores over `corpus` if given.
+    """
+    total = tier.store.count()
+    if total == 0:
+        return [], []
+    depth = min(total, depth)
+    vector = []
+    if vector_weight > 0:
+        with stage("vector_query"):
+            if where is None:
+                vector = await _vector_query(tier, query_embedding, depth, include)
+            else:
+                # Over-fetch and filter here first (see _matches); only filters
+                # too selective to fill `depth` this way pay for Chroma's `where`
+                fetched = min(total, depth * FILTER_OVERFETCH)
+                hits = await _vector_query(tier, query_embedding, fetched, include)
+                vector = [hit for hit in hits if _matches(where, hit["metadata"])][:depth]
+                if len(vector) < depth and fetched < total:
+                    vector = await _vector_query(tier, query_embedding, depth, include, where)
+    lexical = []
+    if lexical_weight > 0:
+        with stage("lexical_query"):
+            if where is None:
+                found = tier.lexical.search(query_text, depth, corpus=corpus)
+            else:
+                fetched = depth * FILTER_OVERFETCH
+                hits = tier.lexical.search(query_text, fetched, corpus=corpus)
+                matching = set()
+                if hits:
+                    ids = [doc_id for doc_id, _ in hits]
+                    data = await asyncio.to_thread(tier.store.get, ids=ids, include=["metadatas"])
+                    matching = {doc_id for doc_id, meta in zip(data["ids"], data["metadatas"]) if _matches(where, meta)}
+                found = [(doc_id, score) for doc_id, score in hits if doc_id in matching][:depth]
+                if len(found) < depth and len(hits) == fetched:  # more BM25 matches than were fetched
+                    data = await asyncio.to_thread(tier.store.get, where=where, include=[])
+                    found = tier.lexical.search(query_text, depth, ids=data["ids"], corpus=corpus)
+            lexical = [(doc_id, score, tier) for doc_id, score in found]
+    return vector, lexical
+
+
+def _hot_is_enough(vector: list[dict], vector_weight: float) -> bool:
+    """Whether the hot tier alone answers the query well enough.
+
+    Judged on vector distance, which is comparable across queries; BM25
+    scores are not, so lexical-only searches always read both tiers.
+    """
+    if vector_weight <= 0:
+        return False
+    good = sum(1 for hit in vector if hit["distance"] is not None and hit["distance"] <= COLD_DISTANCE)
+    return good >= HOT_MIN_HITS
+
+
+async def retrieve(
+    query_text: str,
+    query_embedding: Optional[list[float]],
+    top_k: int,
+    vector_weight: float = VECTOR_WEIGHT,
+    lexical_weight: float = LEXICAL_WEIGHT,
+    with_embeddings: bool = False,
+    where: Optional[dict] = None,
+) -> list[dict]:
+    """Hybrid retrieval: Chroma vector search + BM25, fused by reciprocal rank.
+
+    The hot tier is searched first; the cold tier only when the hot results
+    are poor, in which case both retrievers' lists are merged across tiers.
+    Each tier's BM25 index scores over the statistics of both, so a cold
+    chunk's score means the same as a hot one's.
+    Older conversations have their similarity and BM25 scores scaled down
+    before ranking. Each retriever then contributes weight / (RRF_K + rank)
+    per chunk. Chunks found only lexically have distance None; chunks found
+    only by vector have bm25 None. A weight of 0 skips that retriever.
+    `with_embeddings` adds each chunk's stored vector as "embedding" (for
+    reranking). `where` is a Chroma metadata filter (see _where()); both
+    retrievers only return chunks that match it.
+    """
+    include = ["documents", "metadatas"] + (["embeddings"] if with_embeddings else [])
+    depth = top_k * RETRIEVAL_DEPTH
+    args = (query_text, query_embedding, depth, vector_weight, lexical_weight, include, where)
+    has_cold = tiers[COLD].store.count() > 0
+    corpus = None  # BM25 statistics of both tiers, for when their lexical hits are merged
+    if has_cold and lexical_weight > 0:
+        corpus = merge_stats(tier.lexical.stats(query_text) for tier in tiers.values())
+    hot_corpus = corpus if vector_weight <= 0 else None  # lexical-only searches always read both tiers
+    vector, lexical = await _search_tier(tiers[HOT], *args, hot_corpus)
+    if has_cold and not _hot_is_enough(vector, vector_weight):
+        COLD_FANOUTS.inc()
+        if corpus is not None and hot_corpus is None:
+            # Re-score the hot BM25 hits over both tiers, so they compare with the cold ones
+            _, lexical = await _search_tier(tiers[HOT], query_text, None, depth, 0.0, *args[4:], corpus)
+        cold_vector, cold_lexical = await _search_tier(tiers[COLD], *args, corpus)
+        vector += cold_vector
+        lexical += cold_lexical
+
+    hits = {hit["id"]: hit for hit in vector}
+    missing: dict[str, list[str]] = {}
+    for doc_id, _, tier in lexical:
+        if doc_id not in hits:
+            missing.setdefault(tier.name, []).append(doc_id)
+    for name, ids in missing.items():
+        with stage("chroma_get"):
+            data = await asyncio.to_thread(tiers[name].store.get, ids=ids, include=include)
+        for i, doc_id in enumerate(data["ids"]):
+            if where and not _matches(where, data["metadatas"][i]):
+                continue
+            hits[doc_id] = {
+                "id": doc_id,
+                "text": data["documents"][i],
+                "metadata": data["metadatas"][i] if data["metadatas"] else {},
+                "distance": None,
+                "tier": name,
             }
-        )
+            if with_embeddings:
+                hits[doc_id]["embedding"] = data["embeddings"][i]
+
+    # Decay each retriever's own score, so age only reorders chunks whose
+    # similarity or BM25 score is close; then rank, merging the tiers (BM25
+    # scores compare across tiers: both are scored over the same corpus)
+    now = time.time()
+    decay = {
+        doc_id: recency(hit["metadata"], now, DECAY_HALF_LIFE_DAYS, DECAY_WEIGHT) for doc_id, hit in hits.items()
+    }
+    vector_ranked = sorted(vector, key=lambda hit: (1 - hit["distance"]) * decay[hit["id"]], reverse=True)
+    bm25 = {doc_id: score for doc_id, score, _ in lexical if doc_id in hits}
+    lexical_ranked = sorted(bm25, key=lambda doc_id: bm25[doc_id] * decay[doc_id], reverse=True)
+
+    fused: dict[str, float] = {}
+    for rank, hit in enumerate(vector_ranked[:depth], start=1):
+        fused[hit["id"]] = vector_weight / (RRF_K + rank)
+    for rank, doc_id in enumerate(lexical_ranked[:depth], start=1):
+        fused[doc_id] = fused.get(doc_id, 0.0) + lexical_weight / (RRF_K + rank)
+    ranked = sorted(fused, key=fused.get, reverse=True)
+    return [
+        {**hits[doc_id], "score": round(fused[doc_id], 6), "bm25": bm25.get(doc_id)}
+        for doc_id in ranked[:top_k]
+    ]
+
 
+@app.post("/search", response_model=SearchResponse, dependencies=[Depends(wait_ready)])
+async def search(req: SearchRequest):
+    """Search for relevant personal knowledge chunks (hybrid vector + BM25)."""
+    query_embedding = None
+    if req.vector_weight > 0:
+        query_embedding = (await ollama_embed([req.query]))[0]
+    formatted = await retrieve(
+        req.query, query_embedding, req.top_k, req.vector_weight, req.lexical_weight, where=_where(req)
+    )
     return SearchResponse(results=formatted, count=len(formatted))
 
 
-@app.post("/query", response_model=QueryResponse)
-def query(req: QueryRequest):
-    """RAG query: search context + generate answer with local model."""
-    collection = get_collection()
+def _source_label(metadata: dict) -> str:
+    source = metadata.get("source", "unknown")
+    return f"{source} > {metadata['headings']}" if metadata.get("headings") else source
 
-    # Step 1: Retrieve relevant context
-    context_chunks = []
-    if collection.count() > 0:
-        query_embedding = ollama_embed([req.query])[0]
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=min(req.top_k, collection.count()),
-        )
-        for i in range(len(results["ids"][0])):
-            dist = results["distances"][0][i] if results["distances"] else 1.0
-            if dist < 0.8:
-                context_chunks.append(
-                    {
-                        "text": results["documents"][0][i],
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                        "distance": dist,
-                    }
-                )
 
-    # Step 2: Build prompt with context
+def _render_context(chunk: dict) -> str:
+    return f"[Source: {_source_label(chunk['metadata'])}]\n{chunk['text']}"
+
+
+async def _build_query_prompt(req: QueryRequest, query_embedding: list[float]) -> tuple[list[dict], list[dict]]:
+    """Retrieve context for a query and build the chat messages."""
     system = req.system_prompt or (
         "You are Anakin, a personal AI assistant for Arnaldo. "
         "Answer based on the personal knowledge context provided. "
@@ -241,128 +994,492 @@ def query(req: QueryRequest):
         "Be concise and direct."
     )
 
-    if context_chunks:
-        context_text = "\n\n---\n\n".join(
-            f"[Source: {c['metadata'].get('source', 'unknown')}]\n{c['text']}"
-            for c in context_chunks
-        )
-        system += f"\n\n## Personal Knowledge Context\n\n{context_text}"
+    # Step 1: Over-fetch relevant candidates (close vectors, or any lexical match)
+    candidates = await retrieve(
+        req.query,
+        query_embedding,
+        max(req.top_k, RERANK_CANDIDATES),
+        req.vector_weight,
+        req.lexical_weight,
+        with_embeddings=True,
+        where=_where(req),
+    )
+    candidates = [
+        c for c in candidates if (c["distance"] is not None and c["distance"] < 0.8) or c["bm25"] is not None
+    ]
+
+    with stage("prompt_build"):
+        # Step 2: Rerank for diversity and pack into what the context window leaves free
+        room = NUM_CTX - ANSWER_TOKENS - count_tokens(system) - count_tokens(req.query)
+        budget = max(0, min(CONTEXT_TOKENS, room))
+        context_chunks = select_context(candidates, _render_context, req.top_k, budget, MMR_LAMBDA)
+
+        # Step 3: Build prompt with context
+        if context_chunks:
+            context_text = "\n\n---\n\n".join(_render_context(c) for c in context_chunks)
+            system += f"\n\n## Personal Knowledge Context\n\n{context_text}"
 
     messages = [
         {"role": "system", "content": system},
         {"role": "user", "content": req.query},
     ]
+    sources = [{"id": c["id"], "text": c["text"][:200], "distance": c["distance"]} for c in context_chunks]
+    return messages, sources
 
-    # Step 3: Generate answer
-    answer = ollama_chat(messages, temperature=req.temperature)
 
-    return QueryResponse(
-        answer=answer,
-        sources=[{"text": c["text"][:200], "distance": c["distance"]} for c in context_chunks],
-        model=CHAT_MODEL,
-    )
+async def _cache_lookup(kind: str, scope: str, text: str) -> tuple[Optional[dict], Optional[list[float]]]:
+    """Answer cache lookup: exact text first, then nearest neighbour.
 
+    Returns (cached value or None, embedding of `text` if it was computed).
+    """
+    cached = answer_cache.get(kind, scope, text)
+    if cached is not None:
+        return cached, None
+    embedding = (await ollama_embed([text]))[0]
+    return answer_cache.get_similar(kind, scope, embedding), embedding
 
-@app.post("/ingest")
-def ingest(req: IngestRequest):
-    """Ingest documents into the vector store."""
-    if not req.documents:
-        raise HTTPException(status_code=400, detail="No documents provided")
 
-    collection = get_collection()
-    ids = req.ids or [f"doc_{collection.count() + i}" for i in range(len(req.documents))]
-    metadatas = req.metadatas or [{"source": "manual"} for _ in req.documents]
+def _query_scope(req: QueryRequest) -> str:
+    filters = [req.type, req.source, req.since, req.until]
+    return json.dumps([req.system_prompt, req.top_k, req.vector_weight, req.lexical_weight, req.temperature, *filters])
 
-    embeddings = ollama_embed(req.documents)
-    collection.add(
-        ids=ids,
-        documents=req.documents,
-        embeddings=embeddings,
-        metadatas=metadatas,
-    )
 
-    return {"ingested": len(req.documents), "total": collection.count()}
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
-@app.post("/sync")
-def sync():
-    """Re-sync from OpenClaw memory files and session logs."""
-    collection = get_collection()
-    ingested = 0
+async def _stream_query(req: QueryRequest, started: float):
+    """SSE body for a streaming /query: sources first, then answer tokens."""
+    try:
+        scope = _query_scope(req)
+        cached, embedding = await _cache_lookup("query", scope, req.query)
+        if cached is not None:
+            # A non-streaming /query caches the answer with its <think> block
+            think = ThinkFilter()
+            answer = think.feed(cached["answer"]) + think.flush()
+            yield _sse("sources", {"sources": cached["sources"], "model": cached["model"], "cached": True})
+            yield _sse("token", {"text": answer})
+            total = round((time.perf_counter() - started) * 1000, 1)
+            yield _sse(
+                "done",
+                {
+                    "answer": answer,
+                    "ttft_ms": total,
+                    "total_ms": total,
+                    "cached": True,
+                    "timings": current_timings(),
+                },
+            )
+            return
+        if embedding is None:
+            embedding = (await ollama_embed([req.query]))[0]
+
+        messages, sources = await _build_query_prompt(req, embedding)
+        yield _sse("sources", {"sources": sources, "model": CHAT_MODEL})
+
+        think = ThinkFilter()
+        answer = []
+        ttft = None
+        async for piece in ollama_chat_stream(messages, temperature=req.temperature):
+            text = think.feed(piece)
+            if not text:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - started
+                logger.info("query stream: first token after %.0f ms", ttft * 1000)
+            answer.append(text)
+            yield _sse("token", {"text": text})
+        tail = think.flush()
+        if tail:
+            answer.append(tail)
+            yield _sse("token", {"text": tail})
+
+        total = time.perf_counter() - started
+        logger.info("query stream: done in %.0f ms", total * 1000)
+        full_answer = "".join(answer)
+        answer_cache.put(
+            "query",
+            scope,
+            req.query,
+            embedding,
+            {"answer": full_answer, "sources": sources, "model": CHAT_MODEL},
+            sources=[src["id"] for src in sources],
+        )
+        yield _sse(
+            "done",
+            {
+                "answer": full_answer,
+                "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+                "total_ms": round(total * 1000, 1),
+                "cached": False,
+                "timings": current_timings(),
+            },
+        )
+    except Exception as e:
+        logger.exception("query stream failed")
+        yield _sse("error", {"detail": str(e)})
+
+
+@app.post("/query", response_model=QueryResponse, dependencies=[Depends(wait_ready)])
+async def query(req: QueryRequest):
+    """RAG query: search context + generate answer with local model.
+
+    With "stream": true the response is text/event-stream: a `sources` event,
+    then `token` events as the model generates (<think> blocks removed), then
+    a `done` event with the full answer, time-to-first-token and stage
+    timings. Non-streaming responses carry the stage timings in X-Timing.
+    """
+    if req.stream:
+        return StreamingResponse(
+            _stream_query(req, time.perf_counter()),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-    # 1. Ingest memory markdown files
-    if MEMORY_DIR.exists():
-        for md_file in MEMORY_DIR.glob("*.md"):
-            content = md_file.read_text()
-            sections = re.split(r"\n(?=## )", content)
-            for j, section in enumerate(sections):
-                section = section.strip()
-                if len(section) < 50:
-                    continue
-                # Chunk large sections (~400 tokens ~ 1600 chars)
-                if len(section) > 1600:
-                    chunks = [section[i : i + 1600] for i in range(0, len(section), 1200)]
-                else:
-                    chunks = [section]
-
-                for k, chunk in enumerate(chunks):
-                    doc_id = f"memory_{md_file.stem}_{j}_{k}"
-                    embedding = ollama_embed([chunk])[0]
-                    collection.upsert(
-                        ids=[doc_id],
-                        documents=[chunk],
-                        embeddings=[embedding],
-                        metadatas=[{"source": f"memory/{md_file.name}", "type": "memory"}],
-                    )
-                    ingested += 1
-
-    # 2. Ingest session conversation pairs
-    if SESSION_DIR.exists():
-        for sf in list(SESSION_DIR.glob("*.jsonl")) + list(SESSION_DIR.glob("*.jsonl.old")):
-            messages = []
-            with open(sf) as f:
-                for line in f:
-                    try:
-                        obj = json.loads(line)
-                        if obj.get("type") == "message":
-                            messages.append(obj)
-                    except json.JSONDecodeError:
-                        continue
-
-            for i in range(len(messages) - 1):
-                if messages[i].get("message", {}).get("role") != "user":
-                    continue
-                if messages[i + 1].get("message", {}).get("role") != "assistant":
-                    continue
+    scope = _query_scope(req)
+    cached, embedding = await _cache_lookup("query", scope, req.query)
+    if cached is not None:
+        return QueryResponse(**cached, cached=True)
+    if embedding is None:
+        embedding = (await ollama_embed([req.query]))[0]
 
-                user_text = extract_text_from_content(messages[i]["message"].get("content", ""))
-                asst_text = extract_text_from_content(messages[i + 1]["message"].get("content", ""))
+    messages, sources = await _build_query_prompt(req, embedding)
 
-                if len(user_text) < 5 or len(asst_text) < 10:
-                    continue
+    # Step 3: Generate answer
+    answer = await ollama_chat(messages, temperature=req.temperature)
 
-                clean_user = strip_telegram_envelope(user_text)
-                if not clean_user:
-                    continue
+    result = {"answer": answer, "sources": sources, "model": CHAT_MODEL}
+    answer_cache.put("query", scope, req.query, embedding, result, sources=[src["id"] for src in sources])
+    return QueryResponse(**result)
 
-                combined = f"User: {clean_user}\nAssistant: {asst_text[:500]}"
-                doc_id = f"session_{sf.stem}_{i}"
-                embedding = ollama_embed([combined])[0]
-                collection.upsert(
-                    ids=[doc_id],
-                    documents=[combined],
-                    embeddings=[embedding],
-                    metadatas=[
-                        {
-                            "source": f"session/{sf.name}",
-                            "type": "conversation",
-                            "timestamp": messages[i].get("timestamp", ""),
-                        }
-                    ],
-                )
-                ingested += 1
 
-    return {"synced": ingested, "total": collection.count()}
+@app.post("/ingest", dependencies=[Depends(wait_ready)])
+async def ingest(req: IngestRequest):
+    """Ingest documents into the vector store."""
+    if not req.documents:
+        raise HTTPException(status_code=400, detail="No documents provided")
+    empty = [i for i, text in enumerate(req.documents) if not text.strip()]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Documents {empty} are empty")
+    for field, values in (("ids", req.ids), ("metadatas", req.metadatas)):
+        if values is not None and len(values) != len(req.documents):
+            raise HTTPException(status_code=400, detail=f"Got {len(values)} {field} for {len(req.documents)} documents")
+
+    # Content-derived IDs: concurrent ingests cannot collide, and re-ingesting
+    # the same text updates it in place instead of adding a copy
+    doc_ids = req.ids or [f"doc_{content_hash(text)[:16]}" for text in req.documents]
+    doc_metadatas = req.metadatas or [{"source": "manual"} for _ in req.documents]
+    # Timestamps are stored as epoch seconds, so since/until filters can compare them
+    for metadata in doc_metadatas:
+        if "timestamp" in metadata:
+            timestamp = timestamp_epoch(metadata.pop("timestamp"))
+            if timestamp is not None:
+                metadata["timestamp"] = timestamp
+
+    # Long documents become several chunks: the document ID, then `{id}_1`, ...
+    # A repeated ID keeps its last chunk, as consecutive upserts would.
+    chunks: dict[str, tuple[str, dict]] = {}
+    for doc_id, text, metadata in zip(doc_ids, req.documents, doc_metadatas):
+        for k, chunk in enumerate(chunk_markdown(text, CHUNK_TOKENS)):
+            metadata_k = {**metadata, "headings": chunk.breadcrumb} if chunk.headings else metadata
+            chunks[doc_id if k == 0 else f"{doc_id}_{k}"] = (chunk.text, metadata_k)
+    ids = list(chunks)
+    documents = [text for text, _ in chunks.values()]
+    metadatas = [metadata for _, metadata in chunks.values()]
+
+    await upsert_chunks(ids, documents, metadatas)
+    _save_lexical_soon()
+    answer_cache.invalidate(ids)
+
+    total = sum(tier.store.count() for tier in tiers.values())
+    return {"ingested": len(req.documents), "chunks": len(ids), "ids": doc_ids, "total": total}
+
+
+def _sync_sources() -> list[tuple[str, Path]]:
+    """Manifest key and path of every file /sync indexes."""
+    sources = []
+    if MEMORY_DIR.exists():
+        sources += [(f"memory/{p.name}", p) for p in sorted(MEMORY_DIR.glob("*.md"))]
+    if SESSION_DIR.exists():
+        session_files = list(SESSION_DIR.glob("*.jsonl")) + list(SESSION_DIR.glob("*.jsonl.old"))
+        sources += [(f"session/{p.name}", p) for p in sorted(session_files)]
+    return sources
+
+
+def _stored_ids(source: str) -> set[str]:
+    """IDs of every chunk of `source` in the tiers, whatever produced them."""
+    ids = set()
+    for tier in tiers.values():
+        if tier.store.count():
+            ids.update(tier.store.get(where={"source": source}, include=["metadatas"])["ids"])
+    return ids
+
+
+def _plan_sync(full: bool, job: Optional[SyncJob] = None):
+    """Parse changed files and diff them against the manifest.
+
+    Returns the updated (unsaved) manifest, the chunks to upsert, the ids to
+    delete and the counts for the response. Runs in a worker thread and
+    records file progress on `job`.
+
+    A full sync (asked for, or forced by a missing manifest or a new chunker
+    version) also deletes stored chunks of each re-parsed file that this run
+    did not produce, such as chunks with IDs from an older ID scheme that no
+    manifest recorded.
+    """
+    manifest = SyncManifest.load(MANIFEST_PATH)
+    if manifest.chunker != CHUNKER_VERSION:
+        # Chunk boundaries changed: re-chunk every file and drop the old chunks
+        full = True
+        manifest.chunker = CHUNKER_VERSION
+    counts = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0, "files_skipped": 0}
+    ids: list[str] = []
+    documents: list[str] = []
+    metadatas: list[dict] = []
+    stale: list[str] = []
+    seen = set()
+
+    sources = _sync_sources()
+    if job is not None:
+        job.files_total = len(sources)
+    for n, (key, path) in enumerate(sources, 1):
+        if job is not None:
+            job.files_done = n - 1
+        seen.add(key)
+        st = path.stat()
+        entry = manifest.files.get(key)
+        if entry and not full and entry.unchanged(st):
+            counts["skipped"] += len(entry.chunks)
+            counts["files_skipped"] += 1
+            continue
+
+        start = time.perf_counter()
+        if key.startswith("memory/"):
+            chunks, offset, state = memory_chunks(path), st.st_size, {}
+            known, previous = {}, entry.chunks if entry else {}
+        elif entry and not full and entry.appended(path, st):
+            # Append-only log: parse the tail, keep everything already indexed
+            chunks, offset, state = session_chunks(path, entry.offset, entry.state)
+            known, previous = dict(entry.chunks), entry.chunks
+            counts["skipped"] += len(entry.chunks)
+        else:
+            chunks, offset, state = session_chunks(path)
+            known, previous = {}, entry.chunks if entry else {}
+
+        for chunk_id, text, metadata in chunks:
+            digest = content_hash(text + json.dumps(metadata, sort_keys=True))
+            known[chunk_id] = digest
+            old = previous.get(chunk_id)
+            if old == digest:
+                counts["skipped"] += 1
+                continue
+            counts["updated" if old else "added"] += 1
+            ids.append(chunk_id)
+            documents.append(text)
+            metadatas.append(metadata)
+        stale += [chunk_id for chunk_id in previous if chunk_id not in known]
+        if full:
+            stale += [chunk_id for chunk_id in _stored_ids(key) if chunk_id not in known and chunk_id not in previous]
+        manifest.record(key, path, st, offset, known, state)
+        SYNC_FILE_SECONDS.labels(key.split("/", 1)[0]).observe(time.perf_counter() - start)
+
+    # Files that were removed or renamed since the last sync
+    for key in [k for k in manifest.files if k not in seen]:
+        stale += list(manifest.files.pop(key).chunks)
+    counts["deleted"] = len(stale)
+    if job is not None:
+        job.files_done = len(sources)
+
+    return manifest, (ids, documents, metadatas), stale, counts
+
+
+def _delete_chunks(ids: list[str]):
+    """Delete chunks from whichever tier holds them."""
+    for tier in tiers.values():
+        if tier.store.count():
+            for start in range(0, len(ids), WRITE_BATCH_SIZE):
+                tier.store.delete(ids[start : start + WRITE_BATCH_SIZE])
+        tier.lexical.remove(ids)
+
+
+def _save_lexical_indexes():
+    for tier in tiers.values():
+        tier.lexical.save()
+
+
+async def _save_lexical_later():
+    await asyncio.sleep(LEXICAL_SAVE_DELAY)
+    try:
+        await asyncio.to_thread(_save_lexical_indexes)
+    except Exception:
+        logger.exception("Saving the lexical indexes failed")
+
+
+def _save_lexical_soon():
+    """Save the lexical indexes LEXICAL_SAVE_DELAY seconds from now, unless a save is already due.
+
+    A burst of /ingest calls then rewrites each index file once, not once per call.
+    """
+    global lexical_save
+    if lexical_save is None or lexical_save.done():
+        lexical_save = asyncio.create_task(_save_lexical_later())
+
+
+async def _run_sync(job: SyncJob) -> dict:
+    """Incrementally sync from OpenClaw memory files and session logs.
+
+    Unchanged files are skipped, growing session logs are read from where the
+    last sync stopped, and vectors of chunks that disappeared are deleted.
+    Each chunk is written to the tier it belongs in.
+    """
+    await ready.wait()  # the watcher can queue a job before startup finished
+    async with write_lock:
+        job.phase = "parsing"
+        with SYNC_PHASE_SECONDS.labels("parsing").time():
+            manifest, (ids, documents, metadatas), stale, counts = await asyncio.to_thread(_plan_sync, job.full, job)
+        job.phase, job.chunks_total = "embedding", len(ids)
+        with SYNC_PHASE_SECONDS.labels("embedding").time():
+            await upsert_chunks(ids, documents, metadatas, job=job)
+        job.phase = "deleting"
+        with SYNC_PHASE_SECONDS.labels("deleting").time():
+            await asyncio.to_thread(_delete_chunks, stale)
+        job.phase = "saving"
+        with SYNC_PHASE_SECONDS.labels("saving").time():
+            await asyncio.to_thread(manifest.save)
+            await asyncio.to_thread(_save_lexical_indexes)
+    answer_cache.invalidate(ids + stale)
+    total = sum(tier.store.count() for tier in tiers.values())
+    return {"synced": counts["added"] + counts["updated"], **counts, "total": total}
+
+
+sync_queue = SyncQueue(_run_sync)
+
+
+@app.post("/sync", status_code=202, dependencies=[Depends(wait_ready)])
+async def sync(response: Response, full: bool = False, wait: bool = False):
+    """Queue an incremental sync and return its job; poll GET /sync/{id}.
+
+    Pass ?full=true to re-parse every file, and ?wait=true to block until the
+    job finishes and get its result directly.
+    """
+    job = sync_queue.submit(full=full)
+    if not wait:
+        return job.to_dict()
+    await job.done.wait()
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Sync job {job.id} failed: {job.error}")
+    response.status_code = 200
+    return {"job_id": job.id, **job.result}
+
+
+@app.get("/sync/{job_id}")
+async def sync_status(job_id: str):
+    """Status, progress and (once done) result of a sync job."""
+    job = sync_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sync job {job_id}")
+    return job.to_dict()
+
+
+def _compact() -> int:
+    """Move hot conversations older than HOT_DAYS, vectors included, to the cold tier."""
+    hot, cold = tiers[HOT], tiers[COLD]
+    if not hot.store.count():
+        return 0
+    now = time.time()
+    data = hot.store.get(where={"type": "conversation"}, include=["metadatas"])
+    aged = [
+        doc_id
+        for doc_id, metadata in zip(data["ids"], data["metadatas"])
+        if tier_for(metadata, now, HOT_DAYS) == COLD
+    ]
+    for start in range(0, len(aged), WRITE_BATCH_SIZE):
+        batch = hot.store.get(
+            ids=aged[start : start + WRITE_BATCH_SIZE], include=["documents", "metadatas", "embeddings"]
+        )
+        cold.store.upsert(batch["ids"], batch["documents"], batch["embeddings"], batch["metadatas"])
+        cold.lexical.upsert(batch["ids"], batch["documents"])
+        hot.store.delete(batch["ids"])
+        hot.lexical.remove(batch["ids"])
+    _save_lexical_indexes()
+    COMPACTED_CHUNKS.inc(len(aged))
+    return len(aged)
+
+
+async def compact() -> dict:
+    async with write_lock:
+        start = time.perf_counter()
+        moved = await asyncio.to_thread(_compact)
+    elapsed = time.perf_counter() - start
+    if moved:
+        logger.info("Compaction moved %d chunks to the cold tier in %.2fs", moved, elapsed)
+    return {
+        "moved": moved,
+        "seconds": round(elapsed, 3),
+        **{name: tier.store.count() for name, tier in tiers.items()},
+    }
+
+
+async def _compact_forever():
+    await ready.wait()
+    while True:
+        try:
+            await compact()
+        except Exception:
+            logger.exception("Compaction failed")
+        await asyncio.sleep(COMPACT_INTERVAL)
+
+
+@app.post("/compact", dependencies=[Depends(wait_ready)])
+async def compact_tiers():
+    """Move conversations that aged past RAG_HOT_DAYS from the hot to the cold tier.
+
+    Also runs every RAG_COMPACT_INTERVAL seconds and once at startup, which
+    moves archives and old sessions out of a pre-tiering collection.
+    """
+    return await compact()
+
+
+def _snapshot_path(name: str) -> Path:
+    if not re.fullmatch(r"[\w][\w.-]*", name):
+        raise HTTPException(status_code=400, detail=f"Invalid snapshot name: {name!r}")
+    return SNAPSHOT_DIR / name
+
+
+@app.post("/admin/export", dependencies=[Depends(wait_ready)])
+async def admin_export(req: SnapshotRequest):
+    """Write every chunk of both tiers, vectors included, to a snapshot in SNAPSHOT_DIR."""
+    name = req.name or time.strftime("%Y%m%d-%H%M%S")
+    path = _snapshot_path(name)
+    async with write_lock:
+        try:
+            result = await asyncio.to_thread(export_snapshot, tiers, MANIFEST_PATH, path, EMBED_MODEL)
+        except SnapshotError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Exported %d chunks to %s in %.1fs.", result["chunks"], path, result["seconds"])
+    return {"name": name, "path": str(path), **result}
+
+
+@app.post("/admin/import", dependencies=[Depends(wait_ready)])
+async def admin_import(req: SnapshotRequest):
+    """Replace the store with a snapshot from SNAPSHOT_DIR, using its stored vectors.
+
+    Refuses snapshots made with another EMBED_MODEL. Searches that run while
+    the import does may see a partly restored store.
+    """
+    if not req.name:
+        raise HTTPException(status_code=400, detail="No snapshot name provided")
+    path = _snapshot_path(req.name)
+    if not path.is_dir():
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot {req.name}")
+    async with write_lock:
+        try:
+            result = await asyncio.to_thread(import_snapshot, tiers, MANIFEST_PATH, path, EMBED_MODEL, embed_cache)
+        except SnapshotError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    answer_cache.clear()
+    logger.info("Imported %d chunks from %s in %.1fs.", result["chunks"], path, result["seconds"])
+    return {"name": req.name, **result}
 
 
 CLASSIFIER_SYSTEM = """You are a message classifier. Classify the user's message into one of these categories:
@@ -372,25 +1489,69 @@ CLASSIFIER_SYSTEM = """You are a message classifier. Classify the user's message
 Respond with ONLY the category name, nothing else. Do not use thinking tags."""
 
 
-@app.post("/classify", response_model=ClassifyResponse)
-def classify(req: ClassifyRequest):
-    """Classify whether a message needs cloud or can be handled locally."""
+async def _ensure_centroids():
+    """Load the centroid classifier, or build it from its examples."""
+    if centroid_tier.ready:
+        return
+    async with centroid_lock:
+        if centroid_tier.ready or await asyncio.to_thread(centroid_tier.load):
+            return
+        examples = await asyncio.to_thread(centroid_tier.examples)
+        embeddings = await ollama_embed([text for text, _ in examples])
+        await asyncio.to_thread(centroid_tier.rebuild, examples, embeddings)
+        logger.info("Built classifier centroids from %d examples.", len(examples))
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+@app.post("/classify", response_model=ClassifyResponse, dependencies=[Depends(wait_ready)])
+async def classify(req: ClassifyRequest):
+    """Classify whether a message needs cloud or can be handled locally.
+
+    Tiered: keyword automaton, then embedding centroids, then the LLM only
+    when both are unsure. Confident LLM decisions become centroid examples.
+    """
+    timings = {}
+
+    # Tier 1: keyword/regex automaton
+    start = time.perf_counter()
+    category = keyword_tier.classify(req.message)
+    timings["keyword"] = _elapsed_ms(start)
+    if category:
+        logger.info("classify: tier=keyword category=%s timings=%s", category, timings)
+        return ClassifyResponse(category=category, confidence="high", tier="keyword", timings=timings)
+
+    start = time.perf_counter()
+    cached, embedding = await _cache_lookup("classify", "", req.message)
+    timings["embed"] = _elapsed_ms(start)
+    if cached is not None:
+        return ClassifyResponse(**cached, timings=timings, cached=True)
+    if embedding is None:
+        embedding = (await ollama_embed([req.message]))[0]
+
+    # Tier 2: nearest centroid
+    start = time.perf_counter()
+    await _ensure_centroids()
+    category, _ = centroid_tier.classify(embedding)
+    timings["centroid"] = _elapsed_ms(start)
+    if category:
+        logger.info("classify: tier=centroid category=%s timings=%s", category, timings)
+        return ClassifyResponse(category=category, confidence="high", tier="centroid", timings=timings)
+
+    # Tier 3: LLM
+    start = time.perf_counter()
     messages = [
         {"role": "system", "content": CLASSIFIER_SYSTEM},
         {"role": "user", "content": req.message},
     ]
 
-    result = ollama_chat(messages, temperature=0.1)
+    result = await ollama_chat(messages, temperature=0.1)
     category = "PERSONAL" if "PERSONAL" in result.upper() else "COMPLEX"
+    timings["llm"] = _elapsed_ms(start)
 
-    personal_keywords = [
-        "good morning", "good night", "bom dia", "boa noite",
-        "how are you", "what's up", "hi ", "hello", "hey",
-        "i like", "i prefer", "my favorite", "remind me",
-        "what time", "my routine", "my schedule",
-    ]
-    msg_lower = req.message.lower()
-    keyword_match = any(kw in msg_lower for kw in personal_keywords)
+    keyword_match = "PERSONAL" in keyword_tier.matches(req.message)
 
     if keyword_match and category == "PERSONAL":
         confidence = "high"
@@ -399,4 +1560,23 @@ def classify(req: ClassifyRequest):
     else:
         confidence = "low"
 
-    return ClassifyResponse(category=category, confidence=confidence)
+    if confidence == "high":
+        await asyncio.to_thread(centroid_tier.add, req.message, category, embedding)
+
+    logger.info("classify: tier=llm category=%s timings=%s", category, timings)
+    result = {"category": category, "confidence": confidence, "tier": "llm"}
+    answer_cache.put("classify", "", req.message, embedding, result)
+    return ClassifyResponse(**result, timings=timings)
+
+
+@app.post("/classify/examples", dependencies=[Depends(wait_ready)])
+async def add_classify_examples(req: ClassifyExamplesRequest):
+    """Add labelled examples (PERSONAL or COMPLEX) to the centroid classifier."""
+    bad = [ex.label for ex in req.examples if ex.label not in LABELS]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Labels must be one of {LABELS}, got {bad}")
+    await _ensure_centroids()
+    embeddings = await ollama_embed([ex.text for ex in req.examples])
+    for ex, embedding in zip(req.examples, embeddings):
+        await asyncio.to_thread(centroid_tier.add, ex.text, ex.label, embedding, "manual")
+    return {"added": len(req.examples), "examples": centroid_tier.counts}
@@ -0,0 +1,75 @@
+"""
+Context selection for /query: MMR reranking and token-budget packing.
+
+retrieve() over-fetches candidates and this module picks the ones that go
+into the prompt. Maximal marginal relevance trades a candidate's retrieval
+score against its similarity to chunks already picked (lambda_ = 1 is pure
+relevance), so a handful of near-identical session pairs cannot crowd out
+everything else, and near-duplicates are dropped outright. The picks are
+then packed greedily into a token budget, skipping any that no longer fit,
+because prompt prefill is most of qwen3:4b's latency on CPU.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from chunker import count_tokens
+
+DUPLICATE_SIMILARITY = 0.95  # cosine at which a candidate repeats a picked chunk
+
+
+def mmr(relevance: np.ndarray, vectors: np.ndarray, lambda_: float = 0.7) -> list[int]:
+    """Candidate indices in MMR order, near-duplicates left out.
+
+    `relevance` is in [0, 1]; `vectors` holds one embedding per candidate.
+    """
+    if not len(relevance):
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms > 0, norms, 1.0)
+    closest = np.full(len(relevance), -1.0)  # cosine to the most similar picked chunk
+    remaining = np.ones(len(relevance), dtype=bool)
+    order = []
+    while remaining.any():
+        scores = lambda_ * relevance - (1 - lambda_) * closest if order else relevance.copy()
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        remaining[best] = False
+        if order and closest[best] >= DUPLICATE_SIMILARITY:
+            continue
+        order.append(best)
+        closest = np.maximum(closest, unit @ unit[best])
+    return order
+
+
+def pack(texts: list[str], order: list[int], budget: int, limit: Optional[int] = None) -> list[int]:
+    """Indices from `order` whose texts fit in `budget` tokens, at most `limit`."""
+    picked, used = [], 0
+    for i in order:
+        if limit is not None and len(picked) >= limit:
+            break
+        cost = count_tokens(texts[i])
+        if used + cost > budget:
+            continue
+        picked.append(i)
+        used += cost
+    return picked
+
+
+def select_context(
+    candidates: list[dict], render, k: int, budget: int, lambda_: float = 0.7
+) -> list[dict]:
+    """Pick up to `k` candidates for the prompt within `budget` tokens.
+
+    Candidates need "score" (fused retrieval score) and "embedding";
+    `render` turns one into the text that goes into the prompt.
+    """
+    if not candidates:
+        return []
+    scores = np.array([c["score"] for c in candidates], dtype=np.float32)
+    relevance = scores / scores.max() if scores.max() > 0 else scores
+    vectors = np.array([c["embedding"] for c in candidates], dtype=np.float32)
+    order = mmr(relevance, vectors, lambda_)
+    picked = pack([render(c) for c in candidates], order, budget, limit=k)
+    return [candidates[i] for i in picked]
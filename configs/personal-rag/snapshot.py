@@ -0,0 +1,249 @@
+"""
+Snapshots of the vector store: export, and restore without Ollama.
+
+A snapshot is a directory holding every chunk of both tiers:
+
+    snapshot.json       format version, embedding model, dimensions, counts
+    embeddings.npy      (chunks, dim) float16 matrix, one row per chunk
+    chunks.jsonl        id, tier, document and metadata, in row order
+    sync_manifest.json  the sync manifest at export time, if there was one
+
+Restoring writes the stored vectors straight into Chroma, so rebuilding a
+lost or corrupted store (or moving to a new host) takes minutes instead of
+a full re-embedding /sync. The sync manifest comes back with it, so the
+next /sync only embeds what changed after the export, and the embedding
+cache is seeded with the restored vectors. float16 halves the file against
+float32; its ~1e-3 relative error does not change cosine rankings in
+practice. A snapshot made with another EMBED_MODEL is refused, since its
+vectors would not be comparable with new query embeddings.
+
+Blocking: run it from a worker thread, with writes (sync, compaction) held
+off. From the command line, with the service stopped (Chroma does not
+support two processes on one store):
+
+    python snapshot.py export ~/rag-backup
+    python snapshot.py import ~/rag-backup
+    python snapshot.py info ~/rag-backup
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_BATCH = 1000  # chunks read from or written to Chroma at a time
+
+
+class SnapshotError(ValueError):
+    """A snapshot that cannot be written or restored here."""
+
+
+def read_info(src: Path) -> dict:
+    """The snapshot's snapshot.json, after checking it is one this version can restore."""
+    try:
+        info = json.loads((src / "snapshot.json").read_text())
+    except (OSError, json.JSONDecodeError) as e:
+        raise SnapshotError(f"Not a snapshot: {src} ({e})") from e
+    if info.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {info.get('version')} (expected {SNAPSHOT_VERSION})")
+    return info
+
+
+def export_snapshot(tiers: dict, manifest_path: Path, dest: Path, model: str) -> dict:
+    """Write every chunk of every tier to a new snapshot directory `dest`."""
+    if dest.exists():
+        raise SnapshotError(f"{dest} already exists")
+    start = time.perf_counter()
+    tmp = dest.with_name(dest.name + ".partial")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    total = sum(tier.store.count() for tier in tiers.values())
+    vectors = None
+    row = 0
+    counts = {}
+    with open(tmp / "chunks.jsonl", "w") as out:
+        for name, tier in tiers.items():
+            counts[name] = 0
+            for offset in range(0, tier.store.count(), SNAPSHOT_BATCH):
+                data = tier.store.get(
+                    limit=SNAPSHOT_BATCH, offset=offset, include=["documents", "metadatas", "embeddings"]
+                )
+                batch = np.asarray(data["embeddings"], dtype=np.float32)
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(
+                        tmp / "embeddings.npy", mode="w+", dtype=np.float16, shape=(total, batch.shape[1])
+                    )
+                vectors[row : row + len(batch)] = batch
+                for doc_id, document, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+                    record = {"id": doc_id, "tier": name, "document": document, "metadata": metadata}
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                row += len(batch)
+                counts[name] += len(batch)
+    if vectors is None:
+        np.save(tmp / "embeddings.npy", np.zeros((0, 0), dtype=np.float16))
+        dim = 0
+    else:
+        vectors.flush()
+        dim = vectors.shape[1]
+        del vectors
+    if row != total:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise SnapshotError(f"Store changed during export ({row} chunks read, {total} expected)")
+
+    if manifest_path.exists():
+        shutil.copyfile(manifest_path, tmp / "sync_manifest.json")
+    info = {
+        "version": SNAPSHOT_VERSION,
+        "embed_model": model,
+        "dim": dim,
+        "chunks": total,
+        "tiers": counts,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    (tmp / "snapshot.json").write_text(json.dumps(info, indent=2))
+    os.replace(tmp, dest)
+    size = sum(f.stat().st_size for f in dest.iterdir())
+    return {**info, "bytes": size, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def _metadata_value(value) -> bool:
+    """Whether the stores accept `value` as a metadata value: a scalar, None, or a list of scalars."""
+    if isinstance(value, list):
+        return all(isinstance(item, (str, int, float, bool)) for item in value)
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def _read_chunks(path: Path, tiers: dict, expected: int):
+    """Yield (record, row) for every line of chunks.jsonl, raising SnapshotError on the first bad one."""
+    row = 0
+    seen = set()
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise SnapshotError(f"chunks.jsonl line {row + 1} is not JSON: {e}") from e
+            if not isinstance(record, dict) or not isinstance(record.get("id"), str) or not record["id"]:
+                raise SnapshotError(f"chunks.jsonl line {row + 1} has no chunk id")
+            if record["id"] in seen:
+                raise SnapshotError(f"Chunk {record['id']} appears twice in chunks.jsonl")
+            seen.add(record["id"])
+            if record.get("tier") not in tiers:
+                raise SnapshotError(f"Chunk {record['id']} has unknown tier {record.get('tier')!r}")
+            if not isinstance(record.get("document"), str):
+                raise SnapshotError(f"Chunk {record['id']} has no document")
+            metadata = record.get("metadata")
+            if not isinstance(metadata, dict) or not all(map(_metadata_value, metadata.values())):
+                raise SnapshotError(f"Chunk {record['id']} has invalid metadata {metadata!r}")
+            if row >= expected:
+                raise SnapshotError(f"chunks.jsonl has more chunks than snapshot.json's {expected}")
+            yield record, row
+            row += 1
+    if row != expected:
+        raise SnapshotError(f"chunks.jsonl has {row} chunks, snapshot.json's {expected}")
+
+
+def import_snapshot(tiers: dict, manifest_path: Path, src: Path, model: str, embed_cache=None) -> dict:
+    """Replace the contents of every tier with snapshot `src`.
+
+    Checks the embedding model, the file shapes and every line of
+    chunks.jsonl before touching the store, so a bad snapshot leaves it
+    as it was. Lexical indexes are rebuilt from the documents; with
+    `embed_cache`, it is seeded with the restored vectors.
+    """
+    start = time.perf_counter()
+    info = read_info(src)
+    if info.get("embed_model") != model:
+        raise SnapshotError(
+            f"Snapshot was embedded with {info.get('embed_model')!r}, but EMBED_MODEL is {model!r}; "
+            "restore it with the same model, or run a full /sync instead"
+        )
+    unknown = set(info.get("tiers", {})) - set(tiers)
+    if unknown:
+        raise SnapshotError(f"Snapshot has unknown tiers: {', '.join(sorted(unknown))}")
+    try:
+        vectors = np.load(src / "embeddings.npy", mmap_mode="r")
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot read embeddings.npy: {e}") from e
+    if vectors.ndim != 2 or vectors.shape[0] != info["chunks"] or (info["chunks"] and vectors.shape[1] != info["dim"]):
+        raise SnapshotError(f"embeddings.npy has shape {vectors.shape}, expected ({info['chunks']}, {info['dim']})")
+    chunks_path = src / "chunks.jsonl"
+    try:
+        for _ in _read_chunks(chunks_path, tiers, info["chunks"]):
+            pass
+    except OSError as e:
+        raise SnapshotError(f"Cannot read chunks.jsonl: {e}") from e
+
+    for tier in tiers.values():
+        tier.store.reset()
+        tier.lexical.clear()
+    counts = {name: 0 for name in tiers}
+    pending: dict[str, list] = {name: [] for name in tiers}
+
+    def flush(name: str):
+        rows = pending[name]
+        if not rows:
+            return
+        ids = [r["id"] for r, _ in rows]
+        documents = [r["document"] for r, _ in rows]
+        embeddings = vectors[[i for _, i in rows]].astype(np.float32).tolist()
+        tiers[name].store.upsert(ids, documents, embeddings, [r["metadata"] for r, _ in rows])
+        tiers[name].lexical.upsert(ids, documents)
+        if embed_cache is not None:
+            embed_cache.put_many(documents, embeddings)
+        counts[name] += len(rows)
+        pending[name] = []
+
+    for record, row in _read_chunks(chunks_path, tiers, info["chunks"]):
+        pending[record["tier"]].append((record, row))
+        if len(pending[record["tier"]]) >= SNAPSHOT_BATCH:
+            flush(record["tier"])
+    for name in tiers:
+        flush(name)
+
+    for tier in tiers.values():
+        tier.lexical.save()
+    if (src / "sync_manifest.json").exists():
+        tmp = manifest_path.with_suffix(".tmp")
+        shutil.copyfile(src / "sync_manifest.json", tmp)
+        os.replace(tmp, manifest_path)
+    return {"chunks": info["chunks"], "tiers": counts, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Export or restore the personal-rag vector store")
+    parser.add_argument("command", choices=["export", "import", "info"])
+    parser.add_argument("path", type=Path, help="Snapshot directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        print(json.dumps(read_info(args.path), indent=2))
+        return
+    # rag_service opens the store and reads EMBED_MODEL at import time
+    sys.path.insert(0, str(Path(__file__).parent))
+    import rag_service
+
+    try:
+        if args.command == "export":
+            result = export_snapshot(rag_service.tiers, rag_service.MANIFEST_PATH, args.path, rag_service.EMBED_MODEL)
+        else:
+            result = import_snapshot(
+                rag_service.tiers, rag_service.MANIFEST_PATH, args.path, rag_service.EMBED_MODEL,
+                rag_service.embed_cache,
+            )
+    except SnapshotError as e:
+        sys.exit(f"error: {e}")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Stub Ollama Server
+
+Deterministic, dependency-free stand-in for the parts of the Ollama HTTP API
+that the personal-rag service uses. Benchmarks start it in-process so they can
+measure the service itself without Ollama, a model download or a GPU.
+
+Embeddings are hashed bag-of-words vectors (768d, L2-normalized), so texts
+sharing words land close together and retrieval benchmarks stay meaningful.
+Latency is simulated per request, per text and per token, and a model can
+only serve `parallel` requests at once, like a CPU-bound Ollama.
+
+Endpoints:
+    POST /api/embed       - Batch embeddings ({"input": str | list[str]})
+    POST /api/embeddings  - Legacy single embedding ({"prompt": str})
+    POST /api/chat        - Chat completion (streaming or not); no messages = load only
+    POST /api/generate    - Model load / keep-alive only
+    GET  /api/tags        - Model list
+
+Usage:
+    python stub_ollama.py --port 11435 --request-ms 20 --chat-ms 1500
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBED_DIM = 768
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def stub_embedding(text: str, dim: int = EMBED_DIM) -> list[float]:
+    """Deterministic hashed bag-of-words embedding, L2-normalized."""
+    vec = [0.0] * dim
+    for token in _TOKEN_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec))
+    if norm == 0:
+        vec[0] = 1.0
+        return vec
+    return [v / norm for v in vec]
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count used to simulate prefill cost."""
+    return len(_TOKEN_RE.findall(text))
+
+
+class StubConfig:
+    def __init__(
+        self,
+        request_ms: float = 5.0,
+        per_text_ms: float = 2.0,
+        chat_ms: float = 200.0,
+        prefill_ms_per_token: float = 0.0,
+        decode_ms_per_token: float = 5.0,
+        load_ms: float = 0.0,
+        parallel: int = 1,
+        fail_rate: float = 0.0,
+        think: bool = False,
+    ):
+        self.request_ms = request_ms
+        self.per_text_ms = per_text_ms
+        self.chat_ms = chat_ms
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.decode_ms_per_token = decode_ms_per_token
+        self.load_ms = load_ms
+        self.parallel = parallel
+        self.fail_rate = fail_rate
+        self.think = think
+
+
+class StubState:
+    """Per-server mutable state: model slots, loaded models, counters."""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.slots: dict[str, threading.Semaphore] = {}
+        self.loaded: set[str] = set()
+        self.loading: dict[str, threading.Event] = {}  # set once the model's cold load finished
+        self.requests: dict[str, int] = {}
+        self.prompt_tokens: list[int] = []  # per chat request, for prompt-size benchmarks
+        self._fail_acc = 0.0
+
+    def slot(self, model: str) -> threading.Semaphore:
+        with self.lock:
+            if model not in self.slots:
+                self.slots[model] = threading.Semaphore(self.config.parallel)
+            return self.slots[model]
+
+    def count(self, endpoint: str):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def should_fail(self) -> bool:
+        """Deterministically fail every 1/fail_rate-th request."""
+        if self.config.fail_rate <= 0:
+            return False
+        with self.lock:
+            self._fail_acc += self.config.fail_rate
+            if self._fail_acc >= 1.0:
+                self._fail_acc -= 1.0
+                return True
+        return False
+
+    def ensure_loaded(self, model: str) -> int:
+        """Simulate the cold load of a model on its first request.
+
+        Requests that arrive during the load wait for it. Returns the
+        nanoseconds this request spent on it, like Ollama's load_duration.
+        """
+        start = time.perf_counter()
+        with self.lock:
+            event = self.loading.get(model)
+            cold = event is None
+            if cold:
+                event = self.loading[model] = threading.Event()
+            self.loaded.add(model)
+        if cold:
+            if self.config.load_ms:
+                time.sleep(self.config.load_ms / 1000)
+            event.set()
+        else:
+            event.wait()
+        return int((time.perf_counter() - start) * 1e9)
+
+
+def _stub_answer(messages: list[dict]) -> str:
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    if "message classifier" in system:
+        personal = re.search(r"\b(morning|night|like|prefer|favorite|routine|schedule|hello|hi|hey)\b", user.lower())
+        return "PERSONAL" if personal else "COMPLEX"
+    words = user.split()[:12]
+    return "Stub answer about " + " ".join(words) + ". Based on your notes, here is what I found."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "StubServer"
+
+    def log_message(self, format, *args):  # noqa: A002 - silence default access log
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload: dict):
+        data = json.dumps(payload).encode() + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            models = [{"name": m} for m in sorted(self.server.state.loaded)]
+            self._send_json({"models": models})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        state = self.server.state
+        cfg = state.config
+        body = self._read_json()
+        model = body.get("model", "")
+        state.count(self.path)
+
+        if self.path in ("/api/embed", "/api/embeddings"):
+            texts = body.get("input", body.get("prompt", ""))
+            if isinstance(texts, str):
+                texts = [texts]
+            with state.slot(model):
+                load_ns = state.ensure_loaded(model)
+                time.sleep((cfg.request_ms + cfg.per_text_ms * len(texts)) / 1000)
+            if state.should_fail():
+                self._send_json({"error": "simulated failure"}, 500)
+                return
+            vectors = [stub_embedding(t) for t in texts]
+            if self.path == "/api/embeddings":
+                self._send_json({"embedding": vectors[0]})
+            else:
+                self._send_json({"model": model, "embeddings": vectors, "load_duration": load_ns})
+            return
+
+        if self.path == "/api/generate":
+            with state.slot(model):
+                state.ensure_loaded(model)
+            self._send_json({"model": model, "response": "", "done": True})
+            return
+
+        if self.path == "/api/chat":
+            messages = body.get("messages", [])
+            if not messages:
+                with state.slot(model):
+                    load_ns = state.ensure_loaded(model)
+                self._send_json({
+                    "model": model, "message": {"role": "assistant", "content": ""},
+                    "done_reason": "load", "done": True, "load_duration": load_ns,
+                })
+                return
+            prompt_tokens = sum(count_tokens(m.get("content", "")) for m in messages)
+            with state.lock:
+                state.prompt_tokens.append(prompt_tokens)
+            answer = _stub_answer(messages)
+            if cfg.think:
+                answer = "<think>\nLet me consider the notes.\n</think>\n\n" + answer
+            pieces = re.findall(r"\S+\s*|\s+", answer)
+            with state.slot(model):
+                load_ns = state.ensure_loaded(model)
+                start = time.perf_counter()
+                time.sleep((cfg.chat_ms + cfg.prefill_ms_per_token * prompt_tokens) / 1000)
+                prefill_ns = int((time.perf_counter() - start) * 1e9)
+                stats = {
+                    "load_duration": load_ns,
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": prefill_ns,
+                    "eval_count": len(pieces),
+                    "eval_duration": int(cfg.decode_ms_per_token * len(pieces) * 1e6),
+                }
+                if not body.get("stream", True):
+                    time.sleep(cfg.decode_ms_per_token * len(pieces) / 1000)
+                    self._send_json(
+                        {"model": model, "message": {"role": "assistant", "content": answer}, "done": True, **stats}
+                    )
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in pieces:
+                    time.sleep(cfg.decode_ms_per_token / 1000)
+                    self._send_chunk(
+                        {"model": model, "message": {"role": "assistant", "content": piece}, "done": False}
+                    )
+                self._send_chunk(
+                    {"model": model, "message": {"role": "assistant", "content": ""}, "done": True, **stats}
+                )
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            return
+
+        self._send_json({"error": "not found"}, 404)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: StubConfig):
+        super().__init__(address, StubHandler)
+        self.state = StubState(config)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, **config) -> StubServer:
+    """Start a stub server on a background thread. Call .shutdown() to stop."""
+    server = StubServer((host, port), StubConfig(**config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic stub of the Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--request-ms", type=float, default=5.0, help="Fixed cost per embed request")
+    parser.add_argument("--per-text-ms", type=float, default=2.0, help="Cost per embedded text")
+    parser.add_argument("--chat-ms", type=float, default=200.0, help="Fixed cost per chat request")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.0, help="Prompt prefill cost")
+    parser.add_argument("--decode-ms-per-token", type=float, default=5.0, help="Generation cost")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Cold load cost per model")
+    parser.add_argument("--parallel", type=int, default=1, help="Concurrent requests per model")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of embed requests that fail")
+    parser.add_argument("--think", action="store_true", help="Prefix answers with a <think> block")
+    args = parser.parse_args()
+
+    config = {k: v for k, v in vars(args).items() if k not in ("host", "port")}
+    server = StubServer((args.host, args.port), StubConfig(**config))
+    print(f"Stub Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
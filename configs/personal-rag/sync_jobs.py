@@ -0,0 +1,135 @@
+"""
+Background sync jobs for /sync.
+
+POST /sync enqueues a job instead of syncing inside the request. A single
+worker runs jobs one at a time. A request that arrives while a job is still
+queued joins that job; one that arrives while a job is running queues one
+follow-up job, because files may have changed after the running job planned
+its work. Recent jobs are kept so GET /sync/{id} can report progress and the
+result.
+
+The optional watcher (watchfiles, inotify on Linux) submits a job whenever
+memory notes or session logs change, after a quiet period.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger("personal-rag")
+
+
+@dataclass
+class SyncJob:
+    id: str
+    full: bool = False
+    trigger: str = "api"  # "api" or "watch"
+    status: str = "queued"  # queued, running, done, failed
+    phase: str = ""  # parsing, embedding, deleting, saving
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    files_total: int = 0
+    files_done: int = 0
+    chunks_total: int = 0
+    chunks_done: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        data = {k: v for k, v in self.__dict__.items() if k != "done"}
+        end = self.finished or time.time()
+        data["elapsed_s"] = round(end - self.started, 3) if self.started else None
+        return data
+
+
+class SyncQueue:
+    def __init__(self, run: Callable[[SyncJob], Awaitable[dict]], history: int = 50):
+        self._run = run
+        self._history = history
+        self._jobs: OrderedDict[str, SyncJob] = OrderedDict()
+        self._pending: Optional[SyncJob] = None
+        self._wakeup = asyncio.Event()
+        self.current: Optional[SyncJob] = None
+
+    def submit(self, full: bool = False, trigger: str = "api") -> SyncJob:
+        """Queue a sync, or join the one already waiting to run."""
+        if self._pending is not None:
+            self._pending.full |= full
+            return self._pending
+        job = SyncJob(id=uuid.uuid4().hex[:12], full=full, trigger=trigger)
+        self._pending = job
+        self._jobs[job.id] = job
+        while len(self._jobs) > self._history:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status in ("queued", "running"):
+                break
+            self._jobs.popitem(last=False)
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list[SyncJob]:
+        return list(self._jobs.values())
+
+    async def run_forever(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending is not None:
+                job, self._pending = self._pending, None
+                self.current = job
+                job.status, job.started = "running", time.time()
+                try:
+                    job.result = await self._run(job)
+                    job.status = "done"
+                except Exception as e:
+                    logger.exception("Sync job %s failed", job.id)
+                    job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+                finally:
+                    job.finished = time.time()
+                    job.phase = ""
+                    self.current = None
+                    job.done.set()
+                elapsed = job.finished - job.started
+                logger.info("Sync job %s (%s) %s in %.2fs", job.id, job.trigger, job.status, elapsed)
+
+
+def _is_source(path: str) -> bool:
+    return path.endswith((".md", ".jsonl", ".jsonl.old"))
+
+
+async def watch_sources(queue: SyncQueue, dirs: list[Path], debounce_ms: int):
+    """Submit a sync whenever a source file under `dirs` changes.
+
+    Changes are yielded once `debounce_ms` pass without a new event (or
+    after 10x that while a log keeps growing), so a burst of session-log
+    appends becomes one incremental sync.
+    """
+    try:
+        from watchfiles import awatch
+    except ImportError:
+        logger.warning("RAG_WATCH is set but watchfiles is not installed; the sync watcher is off.")
+        return
+    existing = [d for d in dirs if d.exists()]
+    if not existing:
+        logger.warning("Sync watcher: none of %s exist; the sync watcher is off.", ", ".join(map(str, dirs)))
+        return
+    logger.info("Watching %s for changes", ", ".join(map(str, existing)))
+    async for changes in awatch(
+        *existing,
+        watch_filter=lambda _, path: _is_source(path),
+        step=debounce_ms,
+        debounce=debounce_ms * 10,
+        recursive=False,
+    ):
+        job = queue.submit(trigger="watch")
+        logger.info("Sync watcher: %d change(s), job %s", len(changes), job.id)
@@ -0,0 +1,102 @@
+"""
+Sync manifest for incremental /sync.
+
+Records, per source file, what the last sync saw: mtime, size, the byte
+offset up to which a session log has been parsed, a hash of the file head
+(to tell an appended log from a rewritten one) and the hash of every chunk
+the file produced. /sync uses it to skip unchanged files, read only the
+appended tail of growing session logs, and delete vectors of chunks that
+no longer exist.
+
+Stored as JSON next to the Chroma directory and replaced atomically.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger("personal-rag")
+
+MANIFEST_VERSION = 1
+HEAD_BYTES = 4096
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a chunk's content."""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def file_head_hash(path: Path, length: int) -> str:
+    """Hash of the first `length` bytes of a file."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+@dataclass
+class FileEntry:
+    mtime_ns: int
+    size: int
+    offset: int = 0  # bytes parsed so far (session logs only)
+    head_len: int = 0
+    head: str = ""
+    chunks: dict[str, str] = field(default_factory=dict)  # chunk id -> content hash
+    state: dict = field(default_factory=dict)  # parser carry-over between syncs
+
+    def unchanged(self, st: os.stat_result) -> bool:
+        return st.st_mtime_ns == self.mtime_ns and st.st_size == self.size
+
+    def appended(self, path: Path, st: os.stat_result) -> bool:
+        """True if the file only grew since the last sync."""
+        if st.st_size < self.offset or not self.head_len:
+            return False
+        return file_head_hash(path, self.head_len) == self.head
+
+
+class SyncManifest:
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: dict[str, FileEntry] = {}
+        self.chunker = ""  # chunker version the recorded chunks were produced with
+
+    @classmethod
+    def load(cls, path: Path) -> "SyncManifest":
+        manifest = cls(path)
+        if not path.exists():
+            return manifest
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable sync manifest %s: %s", path, e)
+            return manifest
+        if data.get("version") != MANIFEST_VERSION:
+            logger.info("Sync manifest version changed, starting fresh.")
+            return manifest
+        manifest.files = {key: FileEntry(**entry) for key, entry in data["files"].items()}
+        manifest.chunker = data.get("chunker", "")
+        return manifest
+
+    def save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "chunker": self.chunker,
+            "files": {key: asdict(entry) for key, entry in self.files.items()},
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.path)
+
+    def record(self, key: str, path: Path, st: os.stat_result, offset: int, chunks: dict, state: dict):
+        """Store the result of parsing `path` under `key`."""
+        head_len = min(HEAD_BYTES, offset)
+        self.files[key] = FileEntry(
+            mtime_ns=st.st_mtime_ns,
+            size=st.st_size,
+            offset=offset,
+            head_len=head_len,
+            head=file_head_hash(path, head_len) if head_len else "",
+            chunks=chunks,
+            state=state,
+        )
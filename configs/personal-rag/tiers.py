@@ -0,0 +1,82 @@
+"""
+Hot and cold tiers of the knowledge base.
+
+Memory notes, manual documents and recent conversations live in the hot
+tier (the original personal_knowledge collection). Archived session logs
+(.jsonl.old) and conversations older than the hot window live in the cold
+tier, a second collection with its own BM25 index. /search and /query read
+the hot tier first and only fan out to the cold one when the hot results
+score poorly, so the HNSW graph searched on most requests stays small as
+history grows. Compaction moves conversations out of the hot tier once they
+age past the window.
+
+Ranking also leans towards recent conversations: before the vector and
+BM25 lists are ranked and fused, each chunk's similarity and BM25 score is
+scaled by 1 - w + w * 0.5 ** (age / half_life). Decaying the raw scores
+rather than the fused one means age only reorders chunks that match about
+equally well (an old statement and its newer correction); RRF scores of
+adjacent ranks differ by under 2%, so decaying those would bury old chunks
+wholesale. Memory notes carry no timestamp and are never decayed.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Union
+
+from collection_manager import CollectionManager
+from lexical_index import LexicalIndex
+from numpy_store import NumpyStore
+
+HOT, COLD = "hot", "cold"
+DAY = 86400.0
+
+
+@dataclass
+class Tier:
+    name: str
+    store: Union[CollectionManager, NumpyStore]
+    lexical: LexicalIndex
+
+
+def timestamp_epoch(value) -> Optional[float]:
+    """Epoch seconds from a number, numeric string or ISO-8601 `timestamp`, None if absent or invalid.
+
+    ISO dates without a UTC offset are taken as UTC, like the epoch timestamps of session logs.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def tier_for(metadata: dict, now: float, hot_days: float) -> str:
+    """The tier a chunk belongs in today."""
+    if metadata.get("type") != "conversation":
+        return HOT
+    if metadata.get("source", "").endswith(".jsonl.old"):
+        return COLD
+    ts = timestamp_epoch(metadata.get("timestamp"))
+    if ts is not None and now - ts > hot_days * DAY:
+        return COLD
+    return HOT
+
+
+def recency(metadata: dict, now: float, half_life_days: float, weight: float) -> float:
+    """Score multiplier in [1 - weight, 1] for a chunk's age; 1 without a timestamp."""
+    ts = timestamp_epoch(metadata.get("timestamp"))
+    if ts is None or weight <= 0 or half_life_days <= 0:
+        return 1.0
+    age_days = max(0.0, now - ts) / DAY
+    return 1 - weight + weight * math.pow(0.5, age_days / half_life_days)
@@ -0,0 +1,122 @@
+"""
+Audio decoding for voice-auth: upload bytes to a 16 kHz mono waveform.
+
+Uploads are decoded in memory, with no temp files and no subprocess. PCM
+WAV is read with the standard library's wave module. OGG/Opus (Telegram
+voice notes) and other compressed formats are read with PyAV, which runs
+FFmpeg's decoders in-process. Downmixing and resampling to 16 kHz happen
+in torch, and the resampling kernel is cached per source rate. Uploads
+PyAV cannot read fall back to the ffmpeg command line.
+"""
+
+import functools
+import io
+import subprocess
+import tempfile
+import wave
+
+import av
+import numpy as np
+import torch
+import torchaudio
+
+SAMPLE_RATE = 16000  # what ECAPA-TDNN was trained on
+_PCM_DTYPES = {1: np.uint8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}  # WAV sample width -> dtype
+
+
+class AudioDecodeError(ValueError):
+    """The upload could not be decoded by any path."""
+
+
+@functools.lru_cache(maxsize=8)
+def _resampler(rate: int) -> torchaudio.transforms.Resample:
+    return torchaudio.transforms.Resample(rate, SAMPLE_RATE)
+
+
+def _to_float(samples: np.ndarray) -> np.ndarray:
+    """Integer PCM to float32 in [-1, 1); float samples as float32."""
+    if samples.dtype.kind == "f":
+        return samples.astype(np.float32, copy=False)
+    if samples.dtype.kind == "u":
+        half = 2 ** (8 * samples.dtype.itemsize - 1)
+        return (samples.astype(np.float32) - half) / half
+    return samples.astype(np.float32) / -np.iinfo(samples.dtype).min
+
+
+def _read_wav(data: bytes) -> tuple[np.ndarray, int]:
+    """(time, channels) samples and rate of an 8/16/32-bit PCM WAV; wave.Error for anything else."""
+    with wave.open(io.BytesIO(data)) as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width not in _PCM_DTYPES:
+        raise wave.Error(f"unsupported sample width {width}")
+    return _to_float(np.frombuffer(raw, dtype=_PCM_DTYPES[width]).reshape(-1, channels)), rate
+
+
+def _read_av(data: bytes) -> tuple[np.ndarray, int]:
+    """(time, channels) samples and rate of the first audio stream, decoded by PyAV."""
+    with av.open(io.BytesIO(data)) as container:
+        stream = container.streams.audio[0]
+        chunks = []
+        for frame in container.decode(stream):
+            samples = frame.to_ndarray()
+            # planar: (channels, time); packed: (1, time * channels)
+            chunks.append(samples.T if frame.format.is_planar else samples.reshape(-1, len(frame.layout.channels)))
+        rate = stream.codec_context.sample_rate
+    if not chunks:
+        raise AudioDecodeError("No audio in upload")
+    return _to_float(np.concatenate(chunks)), rate
+
+
+def decode_in_memory(data: bytes) -> torch.Tensor:
+    """Decode audio bytes into a (1, time) 16 kHz mono float32 tensor, without leaving the process."""
+    try:
+        samples, rate = _read_wav(data)
+    except (wave.Error, EOFError):
+        try:
+            samples, rate = _read_av(data)
+        except (av.error.FFmpegError, IndexError) as e:
+            raise AudioDecodeError(f"Cannot decode audio in memory: {e}")
+    if not len(samples):
+        raise AudioDecodeError("No audio in upload")
+    waveform = torch.from_numpy(samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]).unsqueeze(0)
+    if rate != SAMPLE_RATE:
+        waveform = _resampler(rate)(waveform)
+    return waveform
+
+
+def decode_with_ffmpeg(data: bytes, ext: str = "ogg") -> torch.Tensor:
+    """Decode audio bytes with the ffmpeg command into a (1, time) 16 kHz mono float32 tensor.
+
+    The upload goes through a temp file, since some containers (MP4/M4A)
+    need a seekable input, but the samples come back on a pipe.
+    """
+    with tempfile.NamedTemporaryFile(suffix=f".{ext}") as f:
+        f.write(data)
+        f.flush()
+        result = subprocess.run(
+            [
+                "ffmpeg", "-nostdin", "-loglevel", "error", "-i", f.name,
+                "-ar", str(SAMPLE_RATE), "-ac", "1", "-f", "f32le", "pipe:1",
+            ],
+            capture_output=True,
+            check=True,
+        )
+    return torch.from_numpy(np.frombuffer(result.stdout, dtype=np.float32).copy()).unsqueeze(0)
+
+
+def decode_audio(data: bytes, ext: str = "ogg") -> torch.Tensor:
+    """Decode an upload in memory, falling back to the ffmpeg command for what that cannot read."""
+    try:
+        return decode_in_memory(data)
+    except AudioDecodeError:
+        pass
+    try:
+        waveform = decode_with_ffmpeg(data, ext)
+    except FileNotFoundError:
+        raise AudioDecodeError("Unsupported audio format, and ffmpeg is not installed to convert it")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(f"ffmpeg conversion failed: {e.stderr.decode(errors='replace')}")
+    if not waveform.numel():
+        raise AudioDecodeError("ffmpeg decoded no audio")
+    return waveform
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Per-request audio decode latency: in-memory decoding vs the ffmpeg command.
+
+Synthesizes a voice-like clip (--seconds long: a gliding harmonic series
+with syllable-rate amplitude and a little noise) and encodes it the ways
+uploads arrive: a Telegram voice note (OGG/Opus, 48 kHz mono), an iPhone
+voice memo (M4A/AAC), a 16 kHz WAV and a 44.1 kHz stereo WAV. Each is
+decoded to a 16 kHz mono tensor --runs times by:
+
+    memory    decode_in_memory (wave or PyAV on the upload bytes)
+    ffmpeg    decode_with_ffmpeg (temp input file, raw samples on a pipe)
+    legacy    the old path: temp file, ffmpeg to a second temp WAV,
+              torchaudio.load, resample and downmix ("fail" for WAV
+              uploads, whose output path was the input path)
+    auto      decode_audio, which the service uses
+
+"diff" is the RMS difference between the memory and ffmpeg waveforms,
+relative to the signal RMS: resamplers differ slightly, and ffmpeg
+downmixes stereo with other gains than a plain mean. The ffmpeg columns
+need the ffmpeg command.
+
+Usage:
+    python bench_decode.py
+    python bench_decode.py --seconds 10 --runs 50
+"""
+
+import argparse
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+
+import av
+import numpy as np
+import torch
+import torchaudio
+
+from audio import SAMPLE_RATE, decode_audio, decode_in_memory, decode_with_ffmpeg
+
+
+def voice_like(seconds: float, sr: int, seed: int = 7, pitch: float = 120) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    pitch = pitch + 0.25 * pitch * np.sin(2 * np.pi * 0.7 * t)  # Hz, gliding
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    signal = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) ** 2  # ~4 syllables per second
+    return (0.2 * envelope * signal + 0.005 * rng.normal(size=t.size)).astype(np.float32)
+
+
+def encode(samples: np.ndarray, rate: int, fmt: str, codec: str) -> bytes:
+    """Encode mono float samples with PyAV, e.g. ("ogg", "libopus") or ("ipod", "aac")."""
+    buf = io.BytesIO()
+    with av.open(buf, "w", format=fmt) as container:
+        stream = container.add_stream(codec, rate=rate, layout="mono")
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="flt", layout="mono")
+        frame.sample_rate = rate
+        for packet in [*stream.encode(frame), *stream.encode(None)]:
+            container.mux(packet)
+    return buf.getvalue()
+
+
+def encode_wav(samples: np.ndarray, rate: int) -> bytes:
+    """16-bit PCM WAV of (time,) or (time, channels) float samples."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1 if samples.ndim == 1 else samples.shape[1])
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+
+def decode_legacy(data: bytes, ext: str) -> torch.Tensor:
+    """The path /enroll and /verify used to take."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_path = os.path.join(tmpdir, f"input.{ext}")
+        with open(input_path, "wb") as f:
+            f.write(data)
+        wav_path = input_path.rsplit(".", 1)[0] + ".wav"
+        subprocess.run(
+            ["ffmpeg", "-y", "-i", input_path, "-ar", "16000", "-ac", "1", "-f", "wav", wav_path],
+            capture_output=True,
+            check=True,
+        )
+        waveform, sr = torchaudio.load(wav_path)
+    if sr != SAMPLE_RATE:
+        waveform = torchaudio.functional.resample(waveform, sr, SAMPLE_RATE)
+    if waveform.dim() == 2 and waveform.shape[0] > 1:
+        waveform = waveform.mean(dim=0, keepdim=True)
+    return waveform
+
+
+def timed(fn, runs: int) -> tuple[float, torch.Tensor]:
+    """Median milliseconds per call, and the last result."""
+    fn()  # warm-up: resampler kernels, page cache
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-memory vs ffmpeg audio decoding")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Clip length")
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+    torch.set_num_threads(1)
+
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    clip48 = voice_like(args.seconds, 48000)
+    inputs = {
+        "ogg/opus 48k": ("ogg", encode(clip48, 48000, "ogg", "libopus")),
+        "m4a/aac 48k": ("m4a", encode(clip48, 48000, "ipod", "aac")),
+        "wav 16k": ("wav", encode_wav(voice_like(args.seconds, 16000), 16000)),
+        "wav 44.1k st": ("wav", encode_wav(np.stack([voice_like(args.seconds, 44100)] * 2, axis=1), 44100)),
+    }
+
+    print(f"{'input':<13} {'KB':>6} {'memory ms':>10} {'ffmpeg ms':>10} {'legacy ms':>10} {'auto ms':>8} {'diff':>6}")
+    for name, (ext, data) in inputs.items():
+        row = {}
+        row["memory"], memory = timed(lambda: decode_in_memory(data), args.runs)
+        if has_ffmpeg:
+            row["ffmpeg"], ffmpeg = timed(lambda: decode_with_ffmpeg(data, ext), args.runs)
+            try:
+                row["legacy"], _ = timed(lambda: decode_legacy(data, ext), args.runs)
+            except subprocess.CalledProcessError:
+                row["legacy"] = None  # a .wav upload made ffmpeg write over its own input
+        row["auto"], _ = timed(lambda: decode_audio(data, ext), args.runs)
+        diff = ""
+        if has_ffmpeg:
+            n = min(memory.shape[1], ffmpeg.shape[1])
+            rms = (memory[0, :n] - ffmpeg[0, :n]).pow(2).mean().sqrt() / ffmpeg[0, :n].pow(2).mean().sqrt()
+            diff = f"{float(rms):.3f}"
+        cells = " ".join(
+            f"{row[k]:>{w}.1f}" if row.get(k) is not None else f"{'fail' if k in row else '-':>{w}}"
+            for k, w in (("memory", 10), ("ffmpeg", 10), ("legacy", 10), ("auto", 8))
+        )
+        print(f"{name:<13} {len(data) / 1024:>6.0f} {cells} {diff:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Per-enrollment storage cost: the old per-sample .npz files vs VoiceprintStore.
+
+For a speaker who already has --existing samples, times the storage part of
+one /enroll (the embedding itself is not included):
+
+    old       save sample_NNN.npz (NNN = number of files), glob and load
+              every sample, average them and save the voiceprint
+    store     VoiceprintStore.add: append one row, fold it into the running
+              sums, replace the voiceprint file atomically
+
+and with --writers processes enrolling --per-writer samples each into the
+same speaker at once, how many samples survive and how many enrollments
+failed: the old scheme's glob-count file names can collide, and a reader
+can load a sample file another process has only half written. Appends and
+atomic renames avoid both.
+
+Usage:
+    python bench_enroll.py
+    python bench_enroll.py --existing 10 100 1000 5000 --runs 20
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from voiceprint_store import VoiceprintStore
+
+DIM = 192
+
+
+def unit(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def old_enroll(voiceprint_dir: Path, sample_dir: Path, embedding: np.ndarray):
+    """Storage part of the old /enroll."""
+    sample_dir.mkdir(parents=True, exist_ok=True)
+    sample_idx = len(list(sample_dir.glob("*.npz")))
+    np.savez(sample_dir / f"sample_{sample_idx:03d}.npz", embedding=embedding)
+    all_embeddings = [np.load(path)["embedding"] for path in sorted(sample_dir.glob("*.npz"))]
+    averaged = np.mean(all_embeddings, axis=0)
+    averaged = averaged / np.linalg.norm(averaged)
+    np.savez(voiceprint_dir / "speaker.npz", embedding=averaged)
+
+
+def seed_old(root: Path, embeddings: np.ndarray) -> tuple[Path, Path]:
+    voiceprint_dir, sample_dir = root / "voiceprints", root / "samples" / "speaker"
+    voiceprint_dir.mkdir(parents=True)
+    sample_dir.mkdir(parents=True)
+    for i, embedding in enumerate(embeddings):
+        np.savez(sample_dir / f"sample_{i:03d}.npz", embedding=embedding)
+    return voiceprint_dir, sample_dir
+
+
+def seed_store(root: Path, embeddings: np.ndarray) -> VoiceprintStore:
+    (root / "voiceprints").mkdir(parents=True)
+    store = VoiceprintStore(root / "voiceprints", root / "samples")
+    for embedding in embeddings:
+        store.add("speaker", embedding)
+    return store
+
+
+def median_ms(fn, args_list) -> float:
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000
+
+
+def old_writer(root: str, count: int, seed: int) -> int:
+    """Enroll `count` samples the old way; return how many enrollments raised."""
+    failed = 0
+    for embedding in unit(np.random.default_rng(seed).normal(size=(count, DIM))):
+        try:
+            old_enroll(Path(root) / "voiceprints", Path(root) / "samples" / "speaker", embedding)
+        except (EOFError, OSError, ValueError, zipfile.BadZipFile):  # read a half-written file
+            failed += 1
+    return failed
+
+
+def store_writer(root: str, count: int, seed: int) -> int:
+    store = VoiceprintStore(Path(root) / "voiceprints", Path(root) / "samples")
+    for embedding in unit(np.random.default_rng(seed).normal(size=(count, DIM))):
+        store.add("speaker", embedding)
+    return 0
+
+
+def race(writer, root: Path, writers: int, per_writer: int) -> int:
+    with multiprocessing.Pool(writers) as pool:
+        return sum(pool.starmap(writer, [(str(root), per_writer, seed) for seed in range(writers)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental voiceprint updates")
+    parser.add_argument("--existing", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--per-writer", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    print(f"{'existing':>8} {'old ms':>8} {'store ms':>9}")
+    for existing in args.existing:
+        embeddings = unit(rng.normal(size=(existing + args.runs, DIM)))
+        with tempfile.TemporaryDirectory() as old_root, tempfile.TemporaryDirectory() as store_root:
+            voiceprint_dir, sample_dir = seed_old(Path(old_root), embeddings[:existing])
+            old = median_ms(old_enroll, [(voiceprint_dir, sample_dir, e) for e in embeddings[existing:]])
+            store = seed_store(Path(store_root), embeddings[:existing])
+            new = median_ms(store.add, [("speaker", e) for e in embeddings[existing:]])
+            print(f"{existing:>8} {old:>8.2f} {new:>9.3f}")
+
+    expected = args.writers * args.per_writer
+    with tempfile.TemporaryDirectory() as old_root, tempfile.TemporaryDirectory() as store_root:
+        (Path(old_root) / "voiceprints").mkdir()
+        (Path(store_root) / "voiceprints").mkdir()
+        old_failed = race(old_writer, Path(old_root), args.writers, args.per_writer)
+        store_failed = race(store_writer, Path(store_root), args.writers, args.per_writer)
+        old_kept = len(list((Path(old_root) / "samples" / "speaker").glob("*.npz")))
+        store_kept = len(VoiceprintStore(Path(store_root) / "voiceprints", Path(store_root) / "samples")
+                         .read_samples("speaker"))
+    print(f"{args.writers} concurrent writers, {expected} samples: old kept {old_kept} ({old_failed} enrollments "
+          f"failed), store kept {store_kept} ({store_failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
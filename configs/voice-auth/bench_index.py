@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+/verify scoring latency with thousands of enrolled speakers.
+
+Builds --speakers synthetic speakers (random unit-vector identities, each
+with samples scattered around it) and scores probe embeddings against them:
+
+    loop      the old path: a Python loop over a name -> voiceprint dict,
+              one dot product per speaker
+    index     SpeakerIndex.search: one matrix-vector product over all rows
+              and a partial sort for the top k
+
+for 1 and --centroids centroids per speaker, with and without AS-norm
+against a --cohort of impostor embeddings. "set" and "remove" are the
+per-call costs of re-enrolling and deleting one speaker in the index.
+"top-1" checks the index against brute-force scoring of every speaker.
+
+No model is needed; the embeddings are synthetic.
+
+Usage:
+    python bench_index.py
+    python bench_index.py --speakers 1000 10000 50000 --runs 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from speaker_index import SpeakerIndex, spherical_kmeans
+
+DIM = 192
+
+
+def unit(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def loop_search(voiceprints: dict[str, np.ndarray], embedding: np.ndarray) -> tuple[str, float]:
+    """The old /verify loop."""
+    best_name, best_score = None, -1.0
+    scores = {}
+    for name, vp in voiceprints.items():
+        score = float(np.dot(embedding, vp))
+        scores[name] = round(score, 4)
+        if score > best_score:
+            best_name, best_score = name, score
+    return best_name, best_score
+
+
+def median_ms(fn, args_list) -> float:
+    latencies = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized speaker scoring")
+    parser.add_argument("--speakers", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--samples", type=int, default=9, help="Enrollment samples per speaker")
+    parser.add_argument("--centroids", type=int, default=3)
+    parser.add_argument("--cohort", type=int, default=2000, help="Impostor embeddings for AS-norm")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    cohort = unit(rng.normal(size=(args.cohort, DIM)))
+
+    print(f"{'speakers':>8} {'centroids':>9} {'norm':>7} {'loop ms':>8} {'index ms':>9} "
+          f"{'speedup':>8} {'set ms':>7} {'remove ms':>9} {'top-1':>6}")
+    for n in args.speakers:
+        identities = unit(rng.normal(size=(n, DIM)))
+        # Samples: the identity plus noise, about 0.6 cosine from it
+        samples = unit(identities[:, None] + 0.12 * rng.normal(size=(n, args.samples, DIM)))
+        names = [f"speaker{i:05d}" for i in range(n)]
+        averaged = unit(samples.mean(axis=1))
+        voiceprints = dict(zip(names, averaged))
+        truth = rng.integers(0, n, size=args.runs)
+        probes = unit(identities[truth] + 0.12 * rng.normal(size=(args.runs, DIM)))
+
+        loop = median_ms(lambda e: loop_search(voiceprints, e), [(p,) for p in probes])
+        for k in dict.fromkeys((1, args.centroids)):
+            centroids = averaged[:, None] if k == 1 else np.stack([spherical_kmeans(s, k) for s in samples])
+            for norm in (False, True):
+                index = SpeakerIndex(cohort=cohort if norm else None)
+                for name, c in zip(names, centroids):
+                    index.set(name, c)
+                fast = median_ms(lambda e: index.search(e, 5), [(p,) for p in probes])
+
+                # Brute force: every speaker's score from its own rows, no shared buffers
+                agree = 0
+                for p, t in zip(probes[:20], truth[:20]):
+                    per_speaker = np.einsum("nkd,d->nk", centroids, p)
+                    if norm:
+                        query_mean, query_std = index._cohort_stats(p[None])
+                        row_mean, row_std = index._cohort_stats(centroids.reshape(-1, DIM))
+                        per_speaker = 0.5 * ((per_speaker - query_mean) / query_std
+                                             + (per_speaker - row_mean.reshape(n, -1)) / row_std.reshape(n, -1))
+                    agree += index.search(p, 1)[0][0] == names[int(np.argmax(per_speaker.max(axis=1)))]
+
+                victims = rng.choice(n, size=min(args.runs, n), replace=False)
+                set_ms = median_ms(index.set, [(names[v], centroids[v]) for v in victims])
+                remove_ms = median_ms(index.remove, [(names[v],) for v in victims])
+                print(f"{n:>8} {k:>9} {'as-norm' if norm else 'none':>7} {loop:>8.2f} {fast:>9.3f} "
+                      f"{loop / fast:>7.0f}x {set_ms:>7.3f} {remove_ms:>9.3f} {agree:>3}/20")
+
+
+if __name__ == "__main__":
+    main()
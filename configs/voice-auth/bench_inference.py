@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Concurrent embedding throughput: inline encode_batch vs the inference worker.
+
+--clients coroutines each embed voice-like clips (2-6 s, 16 kHz) until
+--requests have been served, the way concurrent /enroll and /verify calls
+would, in three modes:
+
+    inline    encode_batch called on the event loop, one clip at a time
+              (the old _extract_embedding)
+    thread    EmbeddingWorker with max_batch=1: off the loop, no batching
+    batch     EmbeddingWorker with max_batch=--max-batch, --max-wait-ms
+              and --max-padding
+
+and reports clips/s, p50/p95 request latency, and the worst event-loop
+stall seen by a 5 ms ticker (what /health would have waited). "cos"
+is the lowest cosine similarity between a clip's batched (padded)
+embedding and its embedding on its own.
+
+Uses the pretrained model when it is downloaded or can be; otherwise the
+same ECAPA-TDNN architecture with random weights, which costs the same
+to run.
+
+Usage:
+    python bench_inference.py
+    python bench_inference.py --clients 1 4 8 --requests 64 --threads 2
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from speechbrain.inference.speaker import SpeakerRecognition
+from speechbrain.lobes.features import Fbank
+from speechbrain.lobes.models.ECAPA_TDNN import ECAPA_TDNN
+from speechbrain.processing.features import InputNormalization
+
+from audio import SAMPLE_RATE
+from bench_decode import voice_like
+from inference import EmbeddingWorker
+
+# As in speaker_service, which loads the model at import
+MODEL_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
+MODEL_SAVEDIR = Path(__file__).parent / "pretrained_models" / "spkrec-ecapa-voxceleb"
+
+
+def load_model() -> tuple[SpeakerRecognition, str]:
+    try:
+        return SpeakerRecognition.from_hparams(source=MODEL_SOURCE, savedir=str(MODEL_SAVEDIR)), "pretrained"
+    except Exception:
+        modules = {  # spkrec-ecapa-voxceleb's hyperparameters
+            "compute_features": Fbank(n_mels=80),
+            "mean_var_norm": InputNormalization(norm_type="sentence", std_norm=False),
+            "embedding_model": ECAPA_TDNN(80, channels=[1024, 1024, 1024, 1024, 3072], lin_neurons=192),
+            "classifier": None,
+        }
+        model = SpeakerRecognition(modules=modules, hparams={}, run_opts={"device": "cpu"})
+        model.mods.eval()
+        return model, "random weights"
+
+
+def solo_embedding(model: SpeakerRecognition, clip: torch.Tensor) -> np.ndarray:
+    with torch.inference_mode():
+        embedding = model.encode_batch(clip[None]).reshape(-1).numpy()
+    return embedding / np.linalg.norm(embedding)
+
+
+async def run(mode: str, model, clips: list[torch.Tensor], clients: int, requests: int, args) -> dict:
+    worker = None
+    if mode != "inline":
+        worker = EmbeddingWorker(
+            model.encode_batch, max_batch=1 if mode == "thread" else args.max_batch, max_wait_ms=args.max_wait_ms,
+            max_queue=requests, max_padding=args.max_padding,
+        )
+        worker.start()
+    latencies, results, worst_stall = [], {}, 0.0
+    next_request = iter(range(requests))
+    finished = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst_stall
+        while not finished.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            worst_stall = max(worst_stall, time.perf_counter() - start - 0.005)
+
+    async def client():
+        for i in next_request:
+            clip = clips[i % len(clips)]
+            start = time.perf_counter()
+            if worker is None:
+                results[i] = solo_embedding(model, clip)
+            else:
+                results[i] = await worker.embed(clip)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    finished.set()
+    await tick
+    if worker is not None:
+        worker.stop()
+    return {
+        "clips/s": requests / elapsed,
+        "p50": float(np.percentile(latencies, 50)) * 1000,
+        "p95": float(np.percentile(latencies, 95)) * 1000,
+        "stall": worst_stall * 1000,
+        "batch": worker.stats()["mean_batch"] if worker else 1.0,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the micro-batching inference worker")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=48, help="Clips embedded per run")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-padding", type=float, default=0.25)
+    parser.add_argument("--threads", type=int, default=torch.get_num_threads(), help="torch intra-op threads")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    torch.set_num_threads(args.threads)
+
+    model, kind = load_model()
+    rng = np.random.default_rng(args.seed)
+    clips = [
+        torch.from_numpy(voice_like(rng.uniform(2, 6), SAMPLE_RATE, seed=i)) for i in range(16)
+    ]
+    solo = [solo_embedding(model, clip) for clip in clips]  # also warms the model up
+    print(f"ECAPA-TDNN ({kind}), {args.threads} torch thread(s), {len(clips)} clips of 2-6 s")
+
+    print(f"{'mode':<7} {'clients':>7} {'clips/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'stall ms':>9} "
+          f"{'batch':>6} {'cos':>7}")
+    for clients in args.clients:
+        for mode in ("inline", "thread", "batch"):
+            row = asyncio.run(run(mode, model, clips, clients, args.requests, args))
+            cos = min(float(row["results"][i] @ solo[i % len(clips)]) for i in row["results"])
+            print(f"{mode:<7} {clients:>7} {row['clips/s']:>8.1f} {row['p50']:>8.0f} {row['p95']:>8.0f} "
+                  f"{row['stall']:>9.0f} {row['batch']:>6.1f} {cos:>7.4f}")
+
+
+if __name__ == "__main__":
+    main()
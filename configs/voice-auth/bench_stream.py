@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Time to an authentication decision: /verify/stream vs uploading to /verify.
+
+Runs the service in-process with a temporary HOME, using the model that
+bench_inference.py loads. It enrolls a synthetic voice from --enroll
+voice-like clips, then for each --seconds length and for a matching and
+an impostor voice (another pitch):
+
+    stream    sends the clip as 16 kHz s16le PCM in --chunk-ms chunks at
+              real-time pace, after 0.3 s of silence, and times the
+              decision from the first speech
+    upload    records the whole clip (its length), then POSTs it as WAV
+              to /verify; the time is the clip length plus the request
+
+"at" is how many seconds of speech the stream had decided on. With the
+random-weight fallback the scores say nothing about accuracy, only about
+timing. Pass --threshold (and a --margin to match) to put it between the
+two voices' scores.
+
+Usage:
+    python bench_stream.py
+    python bench_stream.py --seconds 3 6 10 --threshold 0.986 --margin 0.005
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from audio import SAMPLE_RATE
+from bench_decode import encode_wav, voice_like
+from bench_inference import load_model
+
+
+def load_service(model):
+    """Import speaker_service with `model` in place of the pretrained download, storing under a temp HOME."""
+    os.environ["HOME"] = tempfile.mkdtemp(prefix="voice-auth-bench-")
+    from speechbrain.inference.speaker import SpeakerRecognition
+
+    SpeakerRecognition.from_hparams = staticmethod(lambda **kwargs: model)
+    import speaker_service
+
+    return speaker_service
+
+
+def stream(client, speech: np.ndarray, chunk_ms: float, threshold, margin) -> tuple[dict, float]:
+    """Stream 0.3 s of silence and then `speech` at real-time pace; the decision, and seconds from speech start."""
+    audio = np.concatenate([np.zeros(int(0.3 * SAMPLE_RATE), dtype=np.float32), speech])
+    step = int(chunk_ms / 1000 * SAMPLE_RATE)
+    params = {"threshold": threshold, "margin": margin}
+    query = "&".join(f"{key}={value}" for key, value in params.items() if value is not None)
+    decision, decided = {}, threading.Event()
+    with client.websocket_connect(f"/verify/stream?{query}") as ws:
+
+        def read():
+            try:
+                while True:
+                    message = ws.receive_json()
+                    if message["type"] == "decision":
+                        decision.update(message, at=time.perf_counter())
+                        break
+            finally:
+                decided.set()
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        start = time.perf_counter()
+        for i in range(0, len(audio), step):
+            if decided.is_set():
+                break
+            ws.send_bytes((audio[i : i + step] * 32767).astype("<i2").tobytes())
+            time.sleep(max(0.0, start + (i + step) / SAMPLE_RATE - time.perf_counter()))
+        if not decided.is_set():
+            ws.send_text(json.dumps({"type": "end"}))
+        decided.wait()
+    return decision, decision["at"] - start - 0.3
+
+
+def upload(client, speech: np.ndarray, threshold) -> tuple[dict, float]:
+    data = {} if threshold is None else {"threshold": str(threshold)}
+    start = time.perf_counter()
+    result = client.post("/verify", files={"file": ("clip.wav", encode_wav(speech, SAMPLE_RATE))}, data=data).json()
+    return result, len(speech) / SAMPLE_RATE + time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming vs upload verification latency")
+    parser.add_argument("--seconds", type=float, nargs="+", default=[3.0, 6.0, 10.0], help="Utterance lengths")
+    parser.add_argument("--enroll", type=int, default=3, help="Enrollment clips")
+    parser.add_argument("--chunk-ms", type=float, default=100.0)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--margin", type=float, default=None)
+    args = parser.parse_args()
+
+    model, kind = load_model()
+    service = load_service(model)
+    from fastapi.testclient import TestClient
+
+    client = TestClient(service.app)
+    for seed in range(args.enroll):
+        clip = encode_wav(voice_like(4.0, SAMPLE_RATE, seed=seed), SAMPLE_RATE)
+        client.post("/enroll", files={"file": ("enroll.wav", clip)}, data={"name": "owner"})
+    print(f"ECAPA-TDNN ({kind}), {args.enroll} enrollment clips, {args.chunk_ms:.0f} ms chunks", file=sys.stderr)
+
+    print(f"{'voice':<9} {'clip s':>6} {'stream s':>9} {'at s':>5} {'verdict':>8} {'score':>7} "
+          f"{'upload s':>9} {'verdict':>8} {'score':>7}")
+    for seconds in args.seconds:
+        for voice, pitch in (("owner", 120.0), ("impostor", 210.0)):
+            speech = voice_like(seconds, SAMPLE_RATE, seed=100 + int(seconds), pitch=pitch)
+            decision, streamed = stream(client, speech, args.chunk_ms, args.threshold, args.margin)
+            result, uploaded = upload(client, speech, args.threshold)
+            print(f"{voice:<9} {seconds:>6.1f} {streamed:>9.2f} {decision['seconds'] - 0.3:>5.1f} "
+                  f"{'accept' if decision['verified'] else 'reject':>8} {decision['confidence']:>7.3f} "
+                  f"{uploaded:>9.2f} {'accept' if result['verified'] else 'reject':>8} {result['confidence']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
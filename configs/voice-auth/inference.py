@@ -0,0 +1,188 @@
+"""
+ECAPA-TDNN inference off the event loop, with micro-batching.
+
+One worker thread owns the model. Requests put their waveform on a
+bounded queue and await a future. The worker takes the oldest waveform,
+waits up to `max_wait_ms` after it was queued for more to arrive (up to
+`max_batch`), zero-pads them to the longest and embeds them with one
+`encode_batch` call; the relative lengths make feature normalization and
+attentive pooling ignore the padding. Padding still costs compute, so a
+batch is split by length into groups whose longest clip is at most
+`1 + max_padding` times their shortest. When the worker is already busy,
+whatever queued up meanwhile goes into the next batch without waiting.
+
+PyTorch releases the GIL in its kernels, so the event loop keeps serving
+/health and uploads while a batch runs. A full queue is rejected at once
+(QueueFullError) instead of growing latency without bound.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+import torch
+
+
+class QueueFullError(RuntimeError):
+    """The inference queue is at capacity."""
+
+
+@dataclass
+class _Job:
+    waveform: torch.Tensor  # (time,)
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    queued: float = field(default_factory=time.perf_counter)
+
+
+def _resolve(future: asyncio.Future, result=None, error: BaseException = None):
+    if future.done():  # the request was cancelled (client went away)
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class EmbeddingWorker:
+    def __init__(
+        self,
+        encode: Callable[[torch.Tensor, torch.Tensor], torch.Tensor],
+        max_batch: int = 8,
+        max_wait_ms: float = 10.0,
+        max_queue: int = 32,
+        max_padding: float = 0.25,
+    ):
+        """`encode(wavs, wav_lens)` is the model's encode_batch: (batch, time) and (batch,) -> (batch, 1, dim)."""
+        self._encode = encode
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.max_padding = max_padding
+        self._queue: deque[_Job] = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        # Counters for stats(); written by the worker thread, read anywhere
+        self.in_flight = 0
+        self.peak_depth = 0
+        self.batches = 0
+        self.embedded = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batch_sizes: dict[int, int] = {}
+        self.wait_seconds = 0.0
+        self.encode_seconds = 0.0
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="ecapa-inference", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Finish the queued work, then stop the thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    async def embed(self, waveform: torch.Tensor) -> np.ndarray:
+        """L2-normalized embedding of a (1, time) or (time,) 16 kHz mono waveform."""
+        loop = asyncio.get_running_loop()
+        job = _Job(waveform.reshape(-1), loop.create_future(), loop)
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"Inference queue is full ({self.max_queue} waiting)")
+            self._queue.append(job)
+            self.peak_depth = max(self.peak_depth, len(self._queue))
+            self._cond.notify()
+        return await job.future
+
+    def stats(self) -> dict:
+        done = self.embedded + self.failed
+        return {
+            "queue_depth": len(self._queue),
+            "queue_peak": self.peak_depth,
+            "queue_max": self.max_queue,
+            "in_flight": self.in_flight,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_padding": self.max_padding,
+            "batches": self.batches,
+            "embedded": self.embedded,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "mean_batch": round(self.embedded / self.batches, 2) if self.batches else None,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "mean_wait_ms": round(self.wait_seconds / done * 1000, 2) if done else None,
+            "mean_encode_ms": round(self.encode_seconds / self.batches * 1000, 2) if self.batches else None,
+        }
+
+    def _next_batch(self) -> list[_Job]:
+        """Block until there is work; then gather a batch. Empty when stopping with nothing queued."""
+        with self._cond:
+            while not self._queue and not self._stopping:
+                self._cond.wait()
+            if self._queue:
+                deadline = self._queue[0].queued + self.max_wait
+                while len(self._queue) < self.max_batch and not self._stopping:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+
+    def _run(self):
+        while True:
+            jobs = self._next_batch()
+            if not jobs:
+                return
+            jobs = [job for job in jobs if not job.future.cancelled()]
+            for group in self._by_length(jobs):
+                self._embed_batch(group)
+
+    def _by_length(self, jobs: list[_Job]) -> list[list[_Job]]:
+        """Split jobs, shortest first, into groups that need at most `max_padding` padding."""
+        groups = []
+        for job in sorted(jobs, key=lambda job: job.waveform.shape[0]):
+            if groups and job.waveform.shape[0] <= groups[-1][0].waveform.shape[0] * (1 + self.max_padding):
+                groups[-1].append(job)
+            else:
+                groups.append([job])
+        return groups
+
+    def _embed_batch(self, jobs: list[_Job]):
+        start = time.perf_counter()
+        self.in_flight = len(jobs)
+        lengths = [job.waveform.shape[0] for job in jobs]
+        longest = max(lengths)
+        wavs = torch.zeros(len(jobs), longest)
+        for row, job in enumerate(jobs):
+            wavs[row, : lengths[row]] = job.waveform
+        wav_lens = torch.tensor(lengths, dtype=torch.float32) / longest
+        try:
+            with torch.inference_mode():
+                embeddings = self._encode(wavs, wav_lens).reshape(len(jobs), -1).cpu().numpy()
+        except Exception as e:
+            self.failed += len(jobs)
+            for job in jobs:
+                job.loop.call_soon_threadsafe(_resolve, job.future, None, e)
+        else:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms > 0, norms, 1)
+            for job, embedding in zip(jobs, embeddings):
+                job.loop.call_soon_threadsafe(_resolve, job.future, embedding)
+            self.embedded += len(jobs)
+        finally:
+            self.in_flight = 0
+            self.batches += 1
+            self.batch_sizes[len(jobs)] = self.batch_sizes.get(len(jobs), 0) + 1
+            self.wait_seconds += sum(start - job.queued for job in jobs)
+            self.encode_seconds += time.perf_counter() - start
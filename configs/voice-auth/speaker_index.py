@@ -0,0 +1,175 @@
+"""
+Enrolled-speaker index: every voiceprint in one contiguous float32 matrix.
+
+Each speaker owns one or more rows (centroids) of an (N, dim) matrix, and
+`owner[row]` says whose row it is. A query is scored against all rows
+with one matrix-vector product, a speaker's score is the best of its
+rows, and the top k speakers come from a partial sort. The buffers grow by
+doubling. Replacing or removing a speaker rewrites its rows in place or
+moves the last rows into the freed slots, so enrolling or deleting costs
+O(rows of that speaker), not a rebuild.
+
+With a cohort matrix of impostor embeddings, scores are AS-normalized
+(adaptive symmetric normalization): each raw cosine s(e, v) becomes
+
+    0.5 * ((s - mean_e) / std_e + (s - mean_v) / std_v)
+
+where mean/std are taken over the `cohort_top` cohort embeddings closest
+to the query e and to the enrolled row v. The row statistics are computed
+once, when the row is added. Normalized scores are on a z-score scale, so
+they need their own threshold.
+
+Not thread-safe: the service updates and queries it from the event loop.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+def spherical_kmeans(embeddings: np.ndarray, k: int, iterations: int = 10) -> np.ndarray:
+    """Up to `k` L2-normalized centroids of L2-normalized `embeddings`, as a (k, dim) matrix.
+
+    Deterministic: seeded with the first embedding and then, in turn, the
+    one farthest from every seed so far.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    k = max(1, min(k, len(embeddings)))
+    seeds = [0]
+    nearest = embeddings @ embeddings[0]
+    while len(seeds) < k:
+        seeds.append(int(np.argmin(nearest)))
+        nearest = np.maximum(nearest, embeddings @ embeddings[seeds[-1]])
+    centroids = embeddings[seeds]
+    for _ in range(iterations if k > 1 else 1):
+        assignment = np.argmax(embeddings @ centroids.T, axis=1)
+        for c in range(k):
+            members = embeddings[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+class SpeakerIndex:
+    def __init__(self, dim: int = 192, cohort: Optional[np.ndarray] = None, cohort_top: int = 200):
+        self.dim = dim
+        self.matrix = np.zeros((16, dim), dtype=np.float32)  # rows [0, rows) are live
+        self.owner = np.zeros(16, dtype=np.int64)  # row -> speaker id
+        self.rows = 0
+        self.names: list[str] = []  # speaker id -> name
+        self._ids: dict[str, int] = {}
+        self.cohort = None
+        self.cohort_top = cohort_top
+        self._row_mean = np.zeros(16, dtype=np.float32)  # AS-norm statistics of each row
+        self._row_std = np.ones(16, dtype=np.float32)
+        if cohort is not None and len(cohort):
+            cohort = np.asarray(cohort, dtype=np.float32)
+            self.cohort = cohort / np.maximum(np.linalg.norm(cohort, axis=1, keepdims=True), 1e-12)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    @property
+    def normalized(self) -> bool:
+        return self.cohort is not None
+
+    def centroids(self, name: str) -> np.ndarray:
+        """A copy of the speaker's rows."""
+        return self.matrix[: self.rows][self.owner[: self.rows] == self._ids[name]].copy()
+
+    def _cohort_stats(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Mean and std of each vector's `cohort_top` best cohort scores."""
+        scores = vectors @ self.cohort.T  # (n, cohort)
+        top = min(self.cohort_top, scores.shape[1])
+        best = np.partition(scores, scores.shape[1] - top, axis=1)[:, -top:]
+        return best.mean(axis=1), np.maximum(best.std(axis=1), 1e-6)
+
+    def _grow(self, rows: int):
+        capacity = len(self.matrix)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        for attr in ("matrix", "owner", "_row_mean", "_row_std"):
+            old = getattr(self, attr)
+            new = np.zeros((capacity, *old.shape[1:]), dtype=old.dtype)
+            new[: self.rows] = old[: self.rows]
+            setattr(self, attr, new)
+
+    def _drop_rows(self, picked: np.ndarray):
+        """Free rows `picked`, filling the holes with the last live rows."""
+        keep = self.rows - len(picked)
+        holes = picked[picked < keep]
+        movers = np.setdiff1d(np.arange(keep, self.rows), picked)
+        for attr in ("matrix", "owner", "_row_mean", "_row_std"):
+            array = getattr(self, attr)
+            array[holes] = array[movers]
+        self.rows = keep
+
+    def set(self, name: str, centroids: np.ndarray):
+        """Add a speaker, or replace its centroids; `centroids` is (k, dim) or (dim,), L2-normalized."""
+        centroids = np.asarray(centroids, dtype=np.float32).reshape(-1, self.dim)
+        speaker = self._ids.get(name)
+        if speaker is None:
+            speaker = self._ids[name] = len(self.names)
+            self.names.append(name)
+            picked = np.empty(0, dtype=np.int64)
+        else:
+            picked = np.flatnonzero(self.owner[: self.rows] == speaker)
+        if len(picked) != len(centroids):
+            self._drop_rows(picked)
+            self._grow(self.rows + len(centroids))
+            picked = np.arange(self.rows, self.rows + len(centroids))
+            self.rows += len(centroids)
+        self.matrix[picked] = centroids
+        self.owner[picked] = speaker
+        if self.cohort is not None:
+            self._row_mean[picked], self._row_std[picked] = self._cohort_stats(centroids)
+
+    def remove(self, name: str) -> bool:
+        """Remove a speaker; False if it was not enrolled."""
+        speaker = self._ids.pop(name, None)
+        if speaker is None:
+            return False
+        self._drop_rows(np.flatnonzero(self.owner[: self.rows] == speaker))
+        last = len(self.names) - 1
+        if speaker != last:  # the last speaker takes over the freed id
+            moved = self.names[last]
+            self.names[speaker] = moved
+            self._ids[moved] = speaker
+            self.owner[: self.rows][self.owner[: self.rows] == last] = speaker
+        self.names.pop()
+        return True
+
+    def search(self, embedding: np.ndarray, top_k: int = 5) -> list[tuple[str, float, float]]:
+        """Best `top_k` speakers for an L2-normalized embedding: (name, score, raw cosine), best first.
+
+        `score` is the AS-normalized score with a cohort, the raw cosine without.
+        """
+        if not self.names:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        owner = self.owner[: self.rows]
+        raw = self.matrix[: self.rows] @ query
+        scores = raw
+        if self.cohort is not None:
+            mean, std = self._cohort_stats(query[None])
+            row_mean, row_std = self._row_mean[: self.rows], self._row_std[: self.rows]
+            scores = 0.5 * ((raw - mean[0]) / std[0] + (raw - row_mean) / row_std)
+        best = np.full(len(self.names), -np.inf, dtype=np.float32)
+        best_raw = np.empty_like(best)
+        if self.rows == len(self.names):  # one row per speaker: a plain scatter
+            best[owner] = scores
+            best_raw[owner] = raw
+        else:
+            np.maximum.at(best, owner, scores)
+            winners = scores == best[owner]  # each speaker's best row (ties: any of them)
+            best_raw[owner[winners]] = raw[winners]
+        top_k = min(top_k, len(best))
+        top = np.argpartition(-best, top_k - 1)[:top_k]
+        top = top[np.argsort(-best[top])]
+        return [(self.names[i], float(best[i]), float(best_raw[i])) for i in top]
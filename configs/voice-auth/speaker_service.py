@@ -2,29 +2,36 @@
 Voice Authentication Microservice
 
 FastAPI service wrapping SpeechBrain ECAPA-TDNN for speaker verification.
-Stores voiceprints as .npz files in ~/.openclaw/voice-auth/voiceprints/.
+Stores voiceprints as .npz files in ~/.openclaw/voice-auth/voiceprints/,
+and every sample embedding in ~/.openclaw/voice-auth/samples/<name>/.
 
 Endpoints:
     POST /enroll   - Enroll a voice sample for a speaker
     POST /verify   - Verify a voice sample against enrolled speakers
+    WS   /verify/stream - Verify live PCM audio, deciding as soon as the score is clear
     GET  /speakers - List enrolled speakers with sample counts
     GET  /health   - Health check
     DELETE /speakers/{name} - Remove a speaker's voiceprint
 """
 
+import asyncio
+import json
 import logging
 import os
-import shutil
-import subprocess
-import tempfile
+import time
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
-import torch
-import torchaudio
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
 from speechbrain.inference.speaker import SpeakerRecognition
 
+from audio import AudioDecodeError, decode_audio
+from inference import EmbeddingWorker, QueueFullError
+from speaker_index import SpeakerIndex
+from streaming import VoiceStream, decide
+from voiceprint_store import VoiceprintStore
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("voice-auth")
 
@@ -32,6 +39,28 @@ logger = logging.getLogger("voice-auth")
 VOICEPRINT_DIR = Path.home() / ".openclaw" / "voice-auth" / "voiceprints"
 SAMPLES_DIR = Path.home() / ".openclaw" / "voice-auth" / "samples"
 DEFAULT_THRESHOLD = float(os.environ.get("VOICE_AUTH_THRESHOLD", "0.25"))
+# Voiceprint centroids per speaker: more than 1 lets a speaker match in different conditions (phone, room, mood)
+CENTROIDS = int(os.environ.get("VOICE_AUTH_CENTROIDS", "1"))
+# Impostor embeddings, (n, 192) .npy; when present, scores are AS-normalized against them
+COHORT_PATH = Path(os.environ.get("VOICE_AUTH_COHORT", Path.home() / ".openclaw" / "voice-auth" / "cohort.npy"))
+COHORT_TOP = int(os.environ.get("VOICE_AUTH_COHORT_TOP", "200"))
+NORM_THRESHOLD = float(os.environ.get("VOICE_AUTH_NORM_THRESHOLD", "3.0"))  # on the AS-norm scale
+# Voice notes per encode_batch call; batching only pays off with cores (or a GPU) to spread a batch over
+MAX_BATCH = int(os.environ.get("VOICE_AUTH_MAX_BATCH", "8" if (os.cpu_count() or 1) > 1 else "1"))
+MAX_WAIT_MS = float(os.environ.get("VOICE_AUTH_MAX_WAIT_MS", "10"))  # how long a voice note waits for company
+MAX_QUEUE = int(os.environ.get("VOICE_AUTH_MAX_QUEUE", "32"))  # more waiting than this gets a 503
+MAX_PADDING = float(os.environ.get("VOICE_AUTH_MAX_PADDING", "0.25"))  # batch clips within 25% of each other's length
+# Rebuild a speaker's voiceprint in the background every N enrolled samples, leaving outliers out (0 = never)
+REESTIMATE_EVERY = int(os.environ.get("VOICE_AUTH_REESTIMATE_EVERY", "0"))
+OUTLIER_MADS = float(os.environ.get("VOICE_AUTH_OUTLIER_MADS", "3.0"))  # 0 keeps every sample
+# /verify/stream: first score after this much speech, then again after every hop of new audio
+STREAM_MIN_SPEECH = float(os.environ.get("VOICE_AUTH_STREAM_MIN_SPEECH", "1.0"))
+STREAM_HOP = float(os.environ.get("VOICE_AUTH_STREAM_HOP", "0.5"))
+STREAM_MAX_SECONDS = float(os.environ.get("VOICE_AUTH_STREAM_MAX_SECONDS", "10"))  # decide at the threshold by then
+# How far past the threshold a score must be for an early decision (cosine, or AS-norm scale)
+STREAM_MARGIN = float(os.environ.get("VOICE_AUTH_STREAM_MARGIN", "0.1"))
+STREAM_NORM_MARGIN = float(os.environ.get("VOICE_AUTH_STREAM_NORM_MARGIN", "1.0"))
+STREAM_VAD_RMS = float(os.environ.get("VOICE_AUTH_STREAM_VAD_RMS", "0.01"))  # frames quieter than this are silence
 MODEL_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
 MODEL_SAVEDIR = Path(__file__).parent / "pretrained_models" / "spkrec-ecapa-voxceleb"
 
@@ -48,56 +77,78 @@ verifier = SpeakerRecognition.from_hparams(
 )
 logger.info("Model loaded.")
 
-# In-memory cache of voiceprints: name -> numpy array (192,)
-voiceprints: dict[str, np.ndarray] = {}
+# All inference runs on this worker's thread, in micro-batches
+worker = EmbeddingWorker(
+    verifier.encode_batch,
+    max_batch=MAX_BATCH,
+    max_wait_ms=MAX_WAIT_MS,
+    max_queue=MAX_QUEUE,
+    max_padding=MAX_PADDING,
+)
+worker.start()
+
+# In-memory index of voiceprints: every speaker's centroids stacked in one matrix
+index = SpeakerIndex(cohort=np.load(COHORT_PATH) if COHORT_PATH.exists() else None, cohort_top=COHORT_TOP)
+if index.normalized:
+    logger.info("AS-norm enabled with %d cohort embeddings.", len(index.cohort))
+
+store = VoiceprintStore(VOICEPRINT_DIR, SAMPLES_DIR, max_centroids=CENTROIDS)
+_reestimating: dict[str, asyncio.Task] = {}
+store_lock = asyncio.Lock()  # store.add runs in a thread: keep apply and delete from interleaving with it
 
 
 def _load_voiceprints():
-    """Load all stored voiceprints from disk into memory."""
-    voiceprints.clear()
-    for npz_path in VOICEPRINT_DIR.glob("*.npz"):
-        data = np.load(npz_path)
-        voiceprints[npz_path.stem] = data["embedding"]
-    logger.info("Loaded %d voiceprint(s) from disk.", len(voiceprints))
+    """Load all stored voiceprints from disk into the index."""
+    for name, vp in store.load().items():
+        index.set(name, vp.centroids)
+    logger.info("Loaded %d voiceprint(s) (%d centroids) from disk.", len(index), index.rows)
+
+
+async def _reestimate(name: str):
+    """Rebuild a speaker's voiceprint from all its samples in a thread, then swap it into the index.
+
+    A speaker deleted or re-enrolled meanwhile makes the result stale; it is dropped.
+    """
+    try:
+        try:
+            base, vp = await asyncio.to_thread(store.reestimate, name, OUTLIER_MADS)
+        except KeyError:  # deleted before the re-estimate started
+            vp = None
+        else:
+            async with store_lock:
+                vp = store.apply(name, base, vp)
+                if vp is not None:
+                    index.set(name, vp.centroids)
+        if vp is None:
+            logger.info("Stale re-estimate of '%s' skipped.", name)
+            return
+        logger.info(
+            "Re-estimated '%s': %d sample(s), %d outlier(s), %d centroid(s).",
+            name, vp.samples, vp.outliers, len(vp.counts),
+        )
+    except Exception:
+        logger.exception("Re-estimating '%s' failed", name)
+    finally:
+        _reestimating.pop(name, None)
 
 
 _load_voiceprints()
 
 
-def _convert_to_wav(input_path: str) -> str:
-    """Convert OGG/Opus or any audio to 16kHz mono WAV via ffmpeg."""
-    wav_path = input_path.rsplit(".", 1)[0] + ".wav"
-    subprocess.run(
-        [
-            "ffmpeg", "-y", "-i", input_path,
-            "-ar", "16000", "-ac", "1", "-f", "wav", wav_path,
-        ],
-        capture_output=True,
-        check=True,
-    )
-    return wav_path
-
-
-def _extract_embedding(audio_path: str) -> np.ndarray:
-    """Extract a 192-dim L2-normalized embedding from an audio file."""
-    waveform, sr = torchaudio.load(audio_path)
-    if sr != 16000:
-        waveform = torchaudio.functional.resample(waveform, sr, 16000)
-    # SpeechBrain expects (batch, time)
-    if waveform.dim() == 2 and waveform.shape[0] > 1:
-        waveform = waveform.mean(dim=0, keepdim=True)
-    embedding = verifier.encode_batch(waveform)  # (1, 1, 192)
-    emb_np = embedding.squeeze().cpu().numpy()
-    # L2-normalize
-    norm = np.linalg.norm(emb_np)
-    if norm > 0:
-        emb_np = emb_np / norm
-    return emb_np
-
-
-def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
-    """Cosine similarity between two L2-normalized vectors."""
-    return float(np.dot(a, b))
+async def _embed_upload(file: UploadFile) -> np.ndarray:
+    """Decode an uploaded voice note in a thread (in memory, or via ffmpeg) and embed it on the worker."""
+    if not file.filename:
+        raise HTTPException(400, "No file provided")
+    ext = file.filename.rsplit(".", 1)[-1] if "." in file.filename else "ogg"
+    content = await file.read()
+    try:
+        waveform = await asyncio.to_thread(decode_audio, content, ext)
+    except AudioDecodeError as e:
+        raise HTTPException(400, str(e))
+    try:
+        return await worker.embed(waveform)
+    except QueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "1"})
 
 
 @app.get("/health")
@@ -105,18 +156,19 @@ async def health():
     return {
         "status": "ok",
         "model": MODEL_SOURCE,
-        "speakers_enrolled": len(voiceprints),
-        "threshold": DEFAULT_THRESHOLD,
+        "speakers_enrolled": len(index),
+        "threshold": NORM_THRESHOLD if index.normalized else DEFAULT_THRESHOLD,
+        "score_norm": "as-norm" if index.normalized else None,
+        "inference": worker.stats(),
     }
 
 
 @app.get("/speakers")
 async def list_speakers():
     speakers = []
-    for name in sorted(voiceprints.keys()):
-        sample_dir = SAMPLES_DIR / name
-        sample_count = len(list(sample_dir.glob("*.npz"))) if sample_dir.exists() else 0
-        speakers.append({"name": name, "samples": sample_count})
+    for name in sorted(index.names):
+        vp = store.voiceprints[name]
+        speakers.append({"name": name, "samples": vp.samples, "outliers": vp.outliers})
     return {"speakers": speakers}
 
 
@@ -125,53 +177,25 @@ async def enroll(
     file: UploadFile = File(...),
     name: str = Form("arnaldo"),
 ):
-    """Enroll a voice sample. Stores the individual sample embedding and
-    recomputes the averaged voiceprint for the speaker."""
-    if not file.filename:
-        raise HTTPException(400, "No file provided")
+    """Enroll a voice sample. Appends the sample embedding and folds it
+    into the speaker's voiceprint, without re-reading earlier samples."""
+    embedding = await _embed_upload(file)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # Save uploaded file
-        ext = file.filename.rsplit(".", 1)[-1] if "." in file.filename else "ogg"
-        input_path = os.path.join(tmpdir, f"input.{ext}")
-        with open(input_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+    # Store the sample and update the voiceprint on disk (append and fsync, in a thread), and the index in place
+    async with store_lock:
+        vp = await asyncio.to_thread(store.add, name, embedding)
+        index.set(name, vp.centroids)
 
-        # Convert to WAV
-        try:
-            wav_path = _convert_to_wav(input_path)
-        except subprocess.CalledProcessError as e:
-            raise HTTPException(400, f"ffmpeg conversion failed: {e.stderr.decode()}")
-
-        # Extract embedding
-        embedding = _extract_embedding(wav_path)
-
-    # Store individual sample
-    sample_dir = SAMPLES_DIR / name
-    sample_dir.mkdir(parents=True, exist_ok=True)
-    sample_idx = len(list(sample_dir.glob("*.npz")))
-    np.savez(sample_dir / f"sample_{sample_idx:03d}.npz", embedding=embedding)
-
-    # Recompute averaged voiceprint from all samples
-    all_embeddings = []
-    for npz_path in sorted(sample_dir.glob("*.npz")):
-        data = np.load(npz_path)
-        all_embeddings.append(data["embedding"])
-
-    averaged = np.mean(all_embeddings, axis=0)
-    norm = np.linalg.norm(averaged)
-    if norm > 0:
-        averaged = averaged / norm
-
-    # Store averaged voiceprint
-    np.savez(VOICEPRINT_DIR / f"{name}.npz", embedding=averaged)
-    voiceprints[name] = averaged
+    # Re-cluster once there are samples for another centroid, and periodically drop outliers
+    due = REESTIMATE_EVERY > 0 and vp.samples % REESTIMATE_EVERY == 0
+    if (due or store.wants_clusters(name)) and name not in _reestimating:
+        _reestimating[name] = asyncio.create_task(_reestimate(name))
 
     return {
         "status": "enrolled",
         "speaker": name,
-        "total_samples": len(all_embeddings),
+        "total_samples": vp.samples,
+        "centroids": len(vp.counts),
         "embedding_dim": int(embedding.shape[0]),
     }
 
@@ -179,66 +203,166 @@ async def enroll(
 @app.post("/verify")
 async def verify(
     file: UploadFile = File(...),
-    threshold: float = Form(DEFAULT_THRESHOLD),
+    threshold: Optional[float] = Form(None),
+    top_k: int = Form(5),
 ):
-    """Verify a voice sample against all enrolled speakers."""
-    if not voiceprints:
+    """Verify a voice sample against all enrolled speakers.
+
+    Without a cohort, `threshold` applies to the cosine similarity
+    (default VOICE_AUTH_THRESHOLD); with one, to the AS-normalized score
+    (default VOICE_AUTH_NORM_THRESHOLD). `scores` holds the cosine
+    similarities of the `top_k` best-matching speakers.
+    """
+    if not len(index):
         raise HTTPException(
             400,
             "No speakers enrolled. Use /enroll first.",
         )
+    if threshold is None:
+        threshold = NORM_THRESHOLD if index.normalized else DEFAULT_THRESHOLD
 
-    if not file.filename:
-        raise HTTPException(400, "No file provided")
+    embedding = await _embed_upload(file)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        ext = file.filename.rsplit(".", 1)[-1] if "." in file.filename else "ogg"
-        input_path = os.path.join(tmpdir, f"input.{ext}")
-        with open(input_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-
-        try:
-            wav_path = _convert_to_wav(input_path)
-        except subprocess.CalledProcessError as e:
-            raise HTTPException(400, f"ffmpeg conversion failed: {e.stderr.decode()}")
-
-        embedding = _extract_embedding(wav_path)
-
-    # Compare against all enrolled speakers
-    best_name = None
-    best_score = -1.0
-    scores = {}
-    for name, vp in voiceprints.items():
-        score = _cosine_similarity(embedding, vp)
-        scores[name] = round(score, 4)
-        if score > best_score:
-            best_name = name
-            best_score = score
+    # Score against every enrolled centroid at once
+    matches = index.search(embedding, max(1, top_k))
+    best_name, best_score, best_raw = matches[0]
 
     verified = best_score >= threshold
-    return {
+    result = {
         "verified": verified,
         "speaker": best_name if verified else "unknown",
-        "confidence": round(best_score, 4),
+        "confidence": round(best_raw, 4),
         "threshold": threshold,
-        "scores": scores,
+        "scores": {name: round(raw, 4) for name, _, raw in matches},
     }
+    if index.normalized:
+        result["normalized_score"] = round(best_score, 4)
+    return result
+
+
+async def _score_window(waveform) -> tuple[str, float, float]:
+    """Best (speaker, score, raw cosine) for a 16 kHz window."""
+    embedding = await worker.embed(waveform)
+    return index.search(embedding, 1)[0]
+
+
+@app.websocket("/verify/stream")
+async def verify_stream(
+    websocket: WebSocket,
+    threshold: Optional[float] = None,
+    margin: Optional[float] = None,
+    sample_rate: int = 16000,
+    encoding: str = "s16le",
+):
+    """Verify a live voice stream, deciding as early as the score allows.
+
+    The client sends mono PCM (`encoding` s16le or f32le at `sample_rate`)
+    as binary messages, and the text message {"type": "end"} when the
+    utterance is over; other text that is not a JSON object closes the
+    socket with 1003. After STREAM_MIN_SPEECH seconds of speech, and then
+    every STREAM_HOP seconds of new audio, the speech so far is embedded
+    and scored, and a {"type": "score"} message is sent. Once a score is
+    `margin` above or below the threshold, or at the end of the stream or
+    after STREAM_MAX_SECONDS, a {"type": "decision"} message with the
+    /verify fields follows and the socket is closed.
+    """
+    await websocket.accept()
+    if not len(index):
+        await websocket.close(code=1008, reason="No speakers enrolled. Use /enroll first.")
+        return
+    try:
+        stream = VoiceStream(sample_rate, encoding, vad_rms=STREAM_VAD_RMS)
+    except ValueError as e:
+        await websocket.close(code=1003, reason=str(e))
+        return
+    if threshold is None:
+        threshold = NORM_THRESHOLD if index.normalized else DEFAULT_THRESHOLD
+    if margin is None:
+        margin = STREAM_NORM_MARGIN if index.normalized else STREAM_MARGIN
+
+    started = time.perf_counter()
+    receiving = asyncio.ensure_future(websocket.receive())
+    scoring = None
+    ended = False
+    scored_at = scored_speech = 0.0  # stream and speech seconds covered by the score in flight
+    final = False  # whether that score is the last chance to decide
+
+    async def send_decision(verified: bool, name: str, score: Optional[float], raw: Optional[float]):
+        result = {
+            "type": "decision",
+            "verified": verified,
+            "speaker": name if verified else "unknown",
+            "confidence": None if raw is None else round(raw, 4),
+            "threshold": threshold,
+            "seconds": round(scored_at, 2),
+            "early": not final,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+        }
+        if index.normalized and score is not None:
+            result["normalized_score"] = round(score, 4)
+        await websocket.send_json(result)
+        await websocket.close()
+
+    try:
+        while True:
+            last = ended or stream.seconds >= STREAM_MAX_SECONDS  # no more audio is coming
+            if scoring is None and last and stream.onset is None:
+                scored_at, final = stream.seconds, True
+                await send_decision(False, "unknown", None, None)  # nothing but silence
+                return
+            due = stream.speech_seconds >= STREAM_MIN_SPEECH and stream.seconds - scored_at >= STREAM_HOP
+            if scoring is None and stream.onset is not None and (due or last):
+                scored_at, scored_speech, final = stream.seconds, stream.speech_seconds, last
+                scoring = asyncio.ensure_future(_score_window(stream.window(STREAM_MAX_SECONDS)))
+
+            done, _ = await asyncio.wait(
+                {task for task in (receiving, scoring) if task is not None}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if scoring in done:
+                name, score, raw = scoring.result()
+                scoring = None
+                await websocket.send_json({
+                    "type": "score",
+                    "seconds": round(scored_at, 2),
+                    "speech_seconds": round(scored_speech, 2),
+                    "speaker": name,
+                    "score": round(score, 4),
+                })
+                verified = decide(score, threshold, margin, final)
+                if verified is not None:
+                    await send_decision(verified, name, score, raw)
+                    return
+            if receiving in done:
+                message = receiving.result()
+                receiving = None
+                if message["type"] == "websocket.disconnect":
+                    return
+                if message.get("bytes"):
+                    stream.feed(message["bytes"])
+                elif message.get("text"):
+                    try:
+                        ended = json.loads(message["text"]).get("type") == "end"
+                    except (ValueError, AttributeError):  # not JSON, or not an object
+                        await websocket.close(code=1003, reason='Text messages must be JSON like {"type": "end"}')
+                        return
+                if not ended and stream.seconds < STREAM_MAX_SECONDS:
+                    receiving = asyncio.ensure_future(websocket.receive())
+    except QueueFullError as e:
+        await websocket.close(code=1013, reason=str(e))  # try again later
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in (receiving, scoring):
+            if task is not None:
+                task.cancel()
 
 
 @app.delete("/speakers/{name}")
 async def delete_speaker(name: str):
     """Remove a speaker's voiceprint and all samples."""
-    vp_path = VOICEPRINT_DIR / f"{name}.npz"
-    sample_dir = SAMPLES_DIR / name
-
-    if not vp_path.exists() and not sample_dir.exists():
-        raise HTTPException(404, f"Speaker '{name}' not found")
-
-    if vp_path.exists():
-        vp_path.unlink()
-    if sample_dir.exists():
-        shutil.rmtree(sample_dir)
-    voiceprints.pop(name, None)
+    async with store_lock:
+        if not store.delete(name):
+            raise HTTPException(404, f"Speaker '{name}' not found")
+        index.remove(name)
 
     return {"status": "deleted", "speaker": name}
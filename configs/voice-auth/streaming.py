@@ -0,0 +1,87 @@
+"""
+State of one streaming verification: raw PCM chunks in, 16 kHz windows out.
+
+Chunks may split samples, so a partial sample is carried over to the next
+chunk. Speech is found with an energy gate on 20 ms frames: the window
+to embed starts at the first frame louder than `vad_rms`, and only such
+frames count as speech, so leading silence neither dilutes the embedding
+nor counts towards the speech needed before the first score. Windows
+grow with the stream up to `max_seconds`, then slide. Audio is kept at
+the client's rate and each window is resampled as a whole, which avoids
+seams at chunk boundaries.
+"""
+
+from typing import Optional
+
+import numpy as np
+import torch
+
+from audio import SAMPLE_RATE, _resampler, _to_float
+
+ENCODINGS = {"s16le": np.dtype("<i2"), "f32le": np.dtype("<f4")}
+FRAME_SECONDS = 0.02
+
+
+def decide(score: float, threshold: float, margin: float, final: bool) -> Optional[bool]:
+    """Accept or reject once the score is `margin` past the threshold; at the threshold when `final`."""
+    if score >= threshold + margin:
+        return True
+    if score < threshold - margin:
+        return False
+    return score >= threshold if final else None
+
+
+class VoiceStream:
+    def __init__(self, sample_rate: int = SAMPLE_RATE, encoding: str = "s16le", vad_rms: float = 0.01):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding '{encoding}', use one of: {', '.join(ENCODINGS)}")
+        if not 8000 <= sample_rate <= 192000:
+            raise ValueError(f"Unsupported sample rate {sample_rate}")
+        self.sample_rate = sample_rate
+        self.dtype = ENCODINGS[encoding]
+        self.vad_rms = vad_rms
+        self.samples = 0  # received so far
+        self.speech_samples = 0  # in frames above the energy gate
+        self.onset: Optional[int] = None  # first sample of the first voiced frame
+        self._chunks: list[np.ndarray] = []
+        self._partial = b""  # bytes of a sample split across chunks
+        self._frame = int(sample_rate * FRAME_SECONDS)
+        self._unframed = np.zeros(0, dtype=np.float32)  # tail shorter than a frame
+
+    @property
+    def seconds(self) -> float:
+        return self.samples / self.sample_rate
+
+    @property
+    def speech_seconds(self) -> float:
+        return self.speech_samples / self.sample_rate
+
+    def feed(self, data: bytes):
+        data = self._partial + data
+        usable = len(data) - len(data) % self.dtype.itemsize
+        self._partial = data[usable:]
+        samples = _to_float(np.frombuffer(data[:usable], dtype=self.dtype))
+        if not len(samples):
+            return
+        frames = np.concatenate([self._unframed, samples])
+        count = len(frames) // self._frame
+        if count:
+            rms = np.sqrt(np.square(frames[: count * self._frame]).reshape(count, -1).mean(axis=1))
+            voiced = rms >= self.vad_rms
+            if self.onset is None and voiced.any():
+                self.onset = self.samples - len(self._unframed) + int(np.argmax(voiced)) * self._frame
+            self.speech_samples += int(voiced.sum()) * self._frame
+        self._unframed = frames[count * self._frame :]
+        self._chunks.append(samples)
+        self.samples += len(samples)
+
+    def window(self, max_seconds: float) -> torch.Tensor:
+        """(1, time) 16 kHz waveform from the speech onset, at most the last `max_seconds`."""
+        if len(self._chunks) > 1:
+            self._chunks = [np.concatenate(self._chunks)]
+        audio = self._chunks[0] if self._chunks else np.zeros(0, dtype=np.float32)
+        start = max(self.onset or 0, len(audio) - int(max_seconds * self.sample_rate))
+        waveform = torch.from_numpy(audio[start:].copy()).unsqueeze(0)
+        if self.sample_rate != SAMPLE_RATE:
+            waveform = _resampler(self.sample_rate)(waveform)
+        return waveform
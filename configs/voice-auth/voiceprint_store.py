@@ -0,0 +1,245 @@
+"""
+Per-speaker voiceprint store with O(1) enrollment.
+
+Each speaker has two files:
+
+    samples/<name>/embeddings.f32   every enrolled sample embedding, as raw
+                                    little-endian float32 rows of 192,
+                                    appended with one O_APPEND write
+    voiceprints/<name>.npz          per-centroid running sums and counts,
+                                    how many sample rows they cover, and
+                                    the derived centroids and averaged
+                                    embedding; replaced atomically
+
+Enrolling adds the new embedding to the nearest centroid's sum, so it
+costs the same with 5 samples or 5000, and appends never need a file name
+that a concurrent enrollment could also pick. If the service dies between
+the append and the voiceprint write, the rows the voiceprint does not
+cover yet are folded in at the next load; a torn last row is ignored.
+
+Re-estimation rebuilds a voiceprint from all its sample rows: samples far
+from the speaker's average (more than `outlier_mads` scaled median
+absolute deviations below the median similarity) are left out, and the
+rest are re-clustered into up to one centroid per 3 samples. It reads a
+fixed prefix of the append-only file, so it can run in a thread while
+enrollment goes on, and `apply` folds in whatever was enrolled meanwhile.
+
+Samples saved as one sample_NNN.npz file each (the old layout) are
+converted to embeddings.f32 at load.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from speaker_index import spherical_kmeans
+
+logger = logging.getLogger("voice-auth")
+
+SAMPLES_FILE = "embeddings.f32"
+MIN_OUTLIER_SAMPLES = 6  # too few samples to tell an outlier from natural variation
+
+
+@dataclass
+class Voiceprint:
+    sums: np.ndarray  # (k, dim) float64 running sum of each centroid's samples
+    counts: np.ndarray  # (k,) samples summed into each centroid
+    samples: int = 0  # sample rows covered, outliers included
+    outliers: int = 0  # rows left out by the last re-estimation
+    clusters: int = 1  # centroids asked for at the last re-estimation
+
+    @property
+    def centroids(self) -> np.ndarray:
+        norms = np.linalg.norm(self.sums, axis=1, keepdims=True)
+        return (self.sums / np.maximum(norms, 1e-12)).astype(np.float32)
+
+    @property
+    def embedding(self) -> np.ndarray:
+        total = self.sums.sum(axis=0)
+        return (total / max(np.linalg.norm(total), 1e-12)).astype(np.float32)
+
+    def fold(self, embeddings: np.ndarray):
+        """Add sample rows to their nearest centroids."""
+        for embedding in embeddings:
+            nearest = int(np.argmax(self.centroids @ embedding))
+            self.sums[nearest] += embedding
+            self.counts[nearest] += 1
+        self.samples += len(embeddings)
+
+
+def estimate(embeddings: np.ndarray, max_centroids: int, outlier_mads: float = 0.0) -> Voiceprint:
+    """A voiceprint built from scratch, without outliers, with up to one centroid per 3 samples."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    keep = np.ones(len(embeddings), dtype=bool)
+    if outlier_mads > 0 and len(embeddings) >= MIN_OUTLIER_SAMPLES:
+        average = embeddings.sum(axis=0)
+        similarity = embeddings @ (average / max(np.linalg.norm(average), 1e-12))
+        median = np.median(similarity)
+        mad = 1.4826 * np.median(np.abs(similarity - median))  # ~ std for normal data
+        keep = similarity >= median - outlier_mads * mad
+    inliers = embeddings[keep]
+    clusters = max(1, min(max_centroids, len(inliers) // 3))
+    centroids = spherical_kmeans(inliers, clusters)
+    assignment = np.argmax(inliers @ centroids.T, axis=1)
+    sums = np.zeros((len(centroids), embeddings.shape[1]))
+    np.add.at(sums, assignment, inliers)
+    counts = np.bincount(assignment, minlength=len(centroids))
+    used = counts > 0
+    return Voiceprint(sums[used], counts[used], len(embeddings), int((~keep).sum()), clusters)
+
+
+class VoiceprintStore:
+    def __init__(self, voiceprint_dir: Path, samples_dir: Path, max_centroids: int = 1, dim: int = 192):
+        self.voiceprint_dir = voiceprint_dir
+        self.samples_dir = samples_dir
+        self.max_centroids = max_centroids
+        self.dim = dim
+        self.voiceprints: dict[str, Voiceprint] = {}
+
+    def _voiceprint_path(self, name: str) -> Path:
+        return self.voiceprint_dir / f"{name}.npz"
+
+    def _samples_path(self, name: str) -> Path:
+        return self.samples_dir / name / SAMPLES_FILE
+
+    def read_samples(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Sample rows [start, stop) of a speaker, as (n, dim) float32; a torn last row is skipped."""
+        path = self._samples_path(name)
+        if not path.exists():
+            return np.zeros((0, self.dim), dtype=np.float32)
+        row_bytes = 4 * self.dim
+        rows = path.stat().st_size // row_bytes
+        stop = rows if stop is None else min(stop, rows)
+        if stop <= start:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        with open(path, "rb") as f:
+            f.seek(start * row_bytes)
+            data = f.read((stop - start) * row_bytes)
+        return np.frombuffer(data, dtype="<f4").reshape(-1, self.dim).astype(np.float32)
+
+    def _append_sample(self, name: str, embedding: np.ndarray):
+        path = self._samples_path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, np.asarray(embedding, dtype="<f4").tobytes())
+        finally:
+            os.close(fd)
+
+    def _save(self, name: str, vp: Voiceprint):
+        """Write the voiceprint to a temp file and rename it over the old one."""
+        with tempfile.NamedTemporaryFile(dir=self.voiceprint_dir, prefix=f".{name}.", suffix=".tmp", delete=False) as f:
+            try:
+                np.savez(
+                    f,
+                    embedding=vp.embedding,
+                    centroids=vp.centroids,
+                    sums=vp.sums,
+                    counts=vp.counts,
+                    samples=vp.samples,
+                    outliers=vp.outliers,
+                    clusters=vp.clusters,
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, self._voiceprint_path(name))
+
+    def _migrate_samples(self, name: str):
+        """Convert sample_NNN.npz files into one embeddings.f32; the old files are removed afterwards."""
+        sample_dir = self.samples_dir / name
+        old = sorted(sample_dir.glob("*.npz"))
+        if not old or self._samples_path(name).exists():
+            return
+        rows = np.stack([np.load(path)["embedding"] for path in old]).astype("<f4")
+        tmp = sample_dir / f".{SAMPLES_FILE}.tmp"
+        tmp.write_bytes(rows.tobytes())
+        os.replace(tmp, self._samples_path(name))
+        for path in old:
+            path.unlink()
+        logger.info("Converted %d sample file(s) of '%s' to %s.", len(old), name, SAMPLES_FILE)
+
+    def load(self) -> dict[str, Voiceprint]:
+        """Read every voiceprint, converting old layouts and catching up on unfolded samples."""
+        self.voiceprints.clear()
+        names = {path.stem for path in self.voiceprint_dir.glob("*.npz")}
+        names.update(path.name for path in self.samples_dir.glob("*") if path.is_dir())
+        for name in sorted(names):
+            self._migrate_samples(name)
+            path = self._voiceprint_path(name)
+            data = dict(np.load(path)) if path.exists() else {}
+            if "sums" in data:
+                vp = Voiceprint(
+                    data["sums"], data["counts"], int(data["samples"]), int(data["outliers"]), int(data["clusters"])
+                )
+                new = self.read_samples(name, vp.samples)
+                if len(new):
+                    vp.fold(new)
+            else:
+                samples = self.read_samples(name)
+                if len(samples):
+                    vp = estimate(samples, self.max_centroids)
+                elif data:  # a voiceprint without its samples: keep its centroids
+                    centroids = data["centroids"] if "centroids" in data else data["embedding"][None]
+                    vp = Voiceprint(centroids.astype(np.float64), np.ones(len(centroids), dtype=np.int64))
+                else:
+                    continue
+            if not path.exists() or "sums" not in data or vp.samples != int(data["samples"]):
+                self._save(name, vp)
+            self.voiceprints[name] = vp
+        return self.voiceprints
+
+    def add(self, name: str, embedding: np.ndarray) -> Voiceprint:
+        """Record one sample embedding and update the speaker's voiceprint, in O(1)."""
+        self._append_sample(name, embedding)
+        vp = self.voiceprints.get(name)
+        if vp is None:
+            sums = np.asarray(embedding, dtype=np.float64).reshape(1, self.dim)
+            vp = self.voiceprints[name] = Voiceprint(sums, np.ones(1, dtype=np.int64), samples=1)
+        else:
+            vp.fold(np.asarray(embedding, dtype=np.float32)[None])
+        self._save(name, vp)
+        return vp
+
+    def delete(self, name: str) -> bool:
+        """Remove a speaker's voiceprint and samples; False if there were none."""
+        path, sample_dir = self._voiceprint_path(name), self.samples_dir / name
+        found = self.voiceprints.pop(name, None) is not None or path.exists() or sample_dir.exists()
+        path.unlink(missing_ok=True)
+        if sample_dir.exists():
+            shutil.rmtree(sample_dir)
+        return found
+
+    def wants_clusters(self, name: str) -> bool:
+        """Whether the speaker now has samples for more centroids than it was clustered into."""
+        vp = self.voiceprints[name]
+        return min(self.max_centroids, vp.samples // 3) > vp.clusters
+
+    def reestimate(self, name: str, outlier_mads: float) -> tuple[Voiceprint, Voiceprint]:
+        """Rebuild a voiceprint from the samples enrolled so far; pass the result to `apply`.
+
+        Safe to run in a thread: it only reads sample rows, and returns the
+        voiceprint it started from so `apply` can tell whether the speaker
+        was deleted or re-created in the meantime.
+        """
+        base = self.voiceprints[name]
+        return base, estimate(self.read_samples(name, 0, base.samples), self.max_centroids, outlier_mads)
+
+    def apply(self, name: str, base: Voiceprint, vp: Voiceprint) -> Optional[Voiceprint]:
+        """Install a re-estimated voiceprint, folding in samples enrolled since; None if it is stale."""
+        if self.voiceprints.get(name) is not base:
+            return None
+        new = self.read_samples(name, vp.samples, base.samples)
+        if len(new):
+            vp.fold(new)
+        self.voiceprints[name] = vp
+        self._save(name, vp)
+        return vp
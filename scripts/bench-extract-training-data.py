@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for extract-training-data.py on synthetic sessions.
+
+Writes --files session logs shaped like OpenClaw's (a session header, model
+changes, Telegram-wrapped user messages, assistant replies with thinking
+and tool-call blocks, tool results, System: notices), then runs the
+extractor on them as a subprocess for every --jobs value, with orjson and
+with the standard json module, and reports:
+
+    seconds     wall time of the whole run
+    MB/s        session bytes read per second
+    pairs/s     training pairs written per second
+    rss MB      peak resident memory of the largest process
+
+Usage:
+    python3 scripts/bench-extract-training-data.py
+    python3 scripts/bench-extract-training-data.py --files 400 --pairs 2000 --jobs 1 4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SCRIPT = Path(__file__).parent / "extract-training-data.py"
+WORDS = (
+    "the a to and of note meeting kitchen lights garden coffee train report budget weather music "
+    "dentist invoice project deploy server backup laptop phone email calendar dinner gym"
+).split()
+PREFERENCES = ["I like", "I prefer", "every morning", "remind me", "good night", "my favorite"]
+# Runs the extractor with orjson hidden, so it falls back to the json module
+NO_ORJSON = "import runpy, sys; sys.modules['orjson'] = None; sys.argv = sys.argv[1:]; " \
+    "runpy.run_path(sys.argv[0], run_name='__main__')"
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def write_session(path: Path, rng: random.Random, pairs: int):
+    """One session log with `pairs` exchanges and the usual noise around them."""
+    def line(obj: dict):
+        f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    with open(path, "w") as f:
+        line({"type": "session", "version": 3, "id": path.stem, "timestamp": "2025-02-01T08:00:00Z"})
+        line({"type": "model_change", "provider": "anthropic", "modelId": "claude-sonnet-4-5"})
+        for i in range(pairs):
+            ts = f"2025-02-{i % 28 + 1:02d}T{i % 24:02d}:{i % 60:02d}:00Z"
+            text = sentence(rng, rng.randint(4, 20))
+            if rng.random() < 0.2:
+                text = f"{rng.choice(PREFERENCES)} {text}"
+            if rng.random() < 0.05:
+                text = "System: " + text
+            elif rng.random() < 0.7:
+                text = f"[Telegram Arnaldo id:42 2025-02-{i % 28 + 1:02d} 09:{i % 60:02d} GMT-3] {text}\n[message_id: {i}]"
+            line({"type": "message", "id": f"u{i}", "timestamp": ts,
+                  "message": {"role": "user", "content": [{"type": "text", "text": text}]}})
+            content = [{"type": "thinking", "thinking": sentence(rng, rng.randint(20, 80))}]
+            if rng.random() < 0.3:
+                content.append({"type": "toolCall", "id": f"t{i}", "name": "exec", "arguments": {"cmd": "ls"}})
+                line({"type": "message", "id": f"a{i}", "timestamp": ts, "message": {"role": "assistant",
+                      "content": content, "model": "claude-sonnet-4-5", "usage": {"input": 900, "output": 40}}})
+                line({"type": "message", "id": f"r{i}", "timestamp": ts, "message": {"role": "toolResult",
+                      "content": [{"type": "text", "text": sentence(rng, rng.randint(10, 200))}]}})
+                content = []
+            content.append({"type": "text", "text": sentence(rng, rng.randint(5, 120))})
+            line({"type": "message", "id": f"b{i}", "timestamp": ts, "message": {"role": "assistant",
+                  "content": content, "model": "claude-sonnet-4-5", "usage": {"input": 1200, "output": 200}}})
+            if rng.random() < 0.05:
+                line({"type": "custom", "customType": "heartbeat", "timestamp": ts})
+
+
+def run(home: Path, jobs: int, orjson: bool) -> tuple[float, int]:
+    """Run the extractor; return its wall time and the peak RSS (kB) of its largest process."""
+    args = [str(SCRIPT), "--output", str(home / "out.jsonl"), "--jobs", str(jobs)]
+    cmd = [sys.executable, *args] if orjson else [sys.executable, "-c", NO_ORJSON, *args]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env={**os.environ, "HOME": str(home)}, stdout=subprocess.DEVNULL)
+    # wait4: this child's own rusage, which also covers the pool workers it waited for
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"extractor exited with code {proc.returncode}")
+    return elapsed, usage.ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract-training-data.py throughput")
+    parser.add_argument("--files", type=int, default=200, help="Synthetic session files")
+    parser.add_argument("--pairs", type=int, default=1000, help="Exchanges per session file")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    home = Path(tempfile.mkdtemp(prefix="extract-bench-"))
+    session_dir = home / ".openclaw" / "agents" / "main" / "sessions"
+    session_dir.mkdir(parents=True)
+    rng = random.Random(args.seed)
+    for n in range(args.files):
+        write_session(session_dir / f"session-{n:04d}.jsonl", rng, args.pairs)
+    size = sum(p.stat().st_size for p in session_dir.iterdir()) / 2**20
+    print(f"{args.files} session files, {size:.0f} MB")
+
+    print(f"{'decoder':<8} {'jobs':>5} {'seconds':>8} {'MB/s':>7} {'pairs/s':>9} {'rss MB':>7}")
+    for orjson in (True, False):
+        for jobs in dict.fromkeys(args.jobs):
+            elapsed, rss = run(home, jobs, orjson)
+            with open(home / "out.jsonl") as f:
+                pairs = sum(1 for _ in f)
+            print(f"{'orjson' if orjson else 'json':<8} {jobs:>5} {elapsed:>8.2f} {size / elapsed:>7.1f} "
+                  f"{pairs / elapsed:>9.0f} {rss / 1024:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
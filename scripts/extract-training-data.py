@@ -8,15 +8,56 @@ Usage:
     python3 scripts/extract-training-data.py --include-memory
     python3 scripts/extract-training-data.py --stats-only
     python3 scripts/extract-training-data.py --output training_data.jsonl
+    python3 scripts/extract-training-data.py --jobs 4
+
+Session files are parsed in parallel by --jobs worker processes (default:
+one per CPU), and pairs are streamed to the output file by file, in order,
+so memory holds one file's pairs per worker rather than the whole history.
+orjson is used to decode and encode JSON when it is installed.
 """
 
 import argparse
+import functools
 import json
+import multiprocessing
+import os
 import re
+from collections import Counter
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 SESSION_DIR = Path.home() / ".openclaw" / "agents" / "main" / "sessions"
 MEMORY_DIR = Path.home() / ".openclaw" / "workspace" / "memory"
+PREFERENCE_KEYWORDS = (
+    "i like", "i prefer", "i want", "i need", "i usually",
+    "i always", "i never", "my favorite", "i enjoy", "i hate",
+    "my routine", "every morning", "every day", "every night",
+    "wake up", "go to bed", "schedule", "remind me",
+    "my name", "i live", "i work", "i'm from",
+    "call me", "don't call me", "i go by",
+    "set temperature", "turn on", "turn off",
+    "good morning", "good night", "bom dia", "boa noite",
+)
+SYSTEM_PROMPT = (
+    "You are Anakin, a personal AI assistant for Arnaldo. "
+    "You know his preferences, routines, and habits. "
+    "Be concise, friendly, and helpful. Skip filler words."
+)
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+else:
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode()
 
 
 def extract_text_from_content(content):
@@ -51,76 +92,101 @@ def strip_telegram_envelope(text):
 def is_preference_related(user_text, assistant_text):
     """Check if the exchange involves preferences, routines, or personal info."""
     combined = (user_text + " " + assistant_text).lower()
-    keywords = [
-        "i like", "i prefer", "i want", "i need", "i usually",
-        "i always", "i never", "my favorite", "i enjoy", "i hate",
-        "my routine", "every morning", "every day", "every night",
-        "wake up", "go to bed", "schedule", "remind me",
-        "my name", "i live", "i work", "i'm from",
-        "call me", "don't call me", "i go by",
-        "set temperature", "turn on", "turn off",
-        "good morning", "good night", "bom dia", "boa noite",
-    ]
-    return any(kw in combined for kw in keywords)
+    return any(kw in combined for kw in PREFERENCE_KEYWORDS)
 
 
-def extract_pairs_from_session(session_file):
-    """Extract user->assistant pairs from a session JSONL file."""
-    messages = []
-    with open(session_file) as f:
+def iter_messages(session_file):
+    """Yield the "message" records of a session JSONL file, skipping lines that are not JSON."""
+    with open(session_file, "rb") as f:
         for line in f:
+            # Every message record contains this token; most other records can be skipped undecoded
+            if b'"message"' not in line:
+                continue
             try:
-                obj = json.loads(line)
-                if obj.get("type") == "message":
-                    messages.append(obj)
-            except json.JSONDecodeError:
+                obj = loads(line)
+            except ValueError:
                 continue
+            if isinstance(obj, dict) and obj.get("type") == "message":
+                yield obj
 
-    pairs = []
-    i = 0
-    while i < len(messages) - 1:
-        msg = messages[i]
-        if msg.get("message", {}).get("role") != "user":
-            i += 1
-            continue
 
-        j = i + 1
-        assistant_text_parts = []
-        while j < len(messages):
-            next_msg = messages[j]
-            role = next_msg.get("message", {}).get("role", "")
-            if role == "assistant":
-                text = extract_text_from_content(next_msg["message"]["content"])
-                if text:
-                    assistant_text_parts.append(text)
-                j += 1
-                while j < len(messages) and messages[j].get("message", {}).get("role") != "user":
-                    if messages[j].get("message", {}).get("role") == "assistant":
-                        t = extract_text_from_content(messages[j]["message"]["content"])
-                        if t:
-                            assistant_text_parts.append(t)
-                    j += 1
-                break
-            elif role == "user":
-                break
-            j += 1
-
-        user_text = strip_telegram_envelope(extract_text_from_content(msg["message"]["content"]))
-        assistant_text = "\n".join(assistant_text_parts)
-
-        if user_text and assistant_text and len(user_text) > 2:
-            if not user_text.startswith("System:"):
-                pairs.append(
-                    {
-                        "user": user_text,
-                        "assistant": assistant_text,
-                        "timestamp": msg.get("timestamp", ""),
-                    }
-                )
-
-        i = j if j > i else i + 1
-
-    return pairs
+def extract_pairs_from_session(session_file):
+    """Yield user->assistant pairs from a session JSONL file.
+
+    A user message is paired with the text of every assistant message up to
+    the next user message; tool results and other roles in between are
+    skipped.
+    """
+    user = None
+    assistant_text_parts = []
+    for obj in iter_messages(session_file):
+        message = obj.get("message", {})
+        role = message.get("role")
+        if role == "user":
+            if user is not None:
+                yield from _make_pair(user, assistant_text_parts)
+            user, assistant_text_parts = obj, []
+        elif role == "assistant" and user is not None:
+            text = extract_text_from_content(message.get("content"))
+            if text:
+                assistant_text_parts.append(text)
+    if user is not None:
+        yield from _make_pair(user, assistant_text_parts)
+
+
+def _make_pair(msg, assistant_text_parts):
+    """The pair for one user message and its replies, if both have usable text."""
+    user_text = strip_telegram_envelope(extract_text_from_content(msg["message"].get("content")))
+    assistant_text = "\n".join(assistant_text_parts)
+    if user_text and assistant_text and len(user_text) > 2 and not user_text.startswith("System:"):
+        yield {
+            "user": user_text,
+            "assistant": assistant_text,
+            "timestamp": msg.get("timestamp", ""),
+        }
+
+
+def select_pairs(pairs, stats, filter_preferences=False, min_assistant_length=0):
+    """Yield the pairs worth keeping, counting them in `stats` as they go.
+
+    Statistics come from this single pass, so each pair is checked for
+    preference keywords once, whether or not it is filtered on them.
+    """
+    for pair in pairs:
+        if len(pair["assistant"]) < min_assistant_length:
+            continue
+        preference = is_preference_related(pair["user"], pair["assistant"])
+        if filter_preferences and not preference:
+            continue
+        stats["pairs"] += 1
+        stats["preference"] += preference
+        stats["user_chars"] += len(pair["user"])
+        stats["assistant_chars"] += len(pair["assistant"])
+        yield pair
+
+
+def process_session(session_file, filter_preferences=False, min_assistant_length=0, serialize=True):
+    """Extract, filter and serialize the pairs of one session file.
+
+    Runs in a worker process. Returns the file's training samples as JSONL
+    bytes (empty without `serialize`) and its statistics.
+    """
+    stats = Counter()
+    pairs = select_pairs(extract_pairs_from_session(session_file), stats, filter_preferences, min_assistant_length)
+    if not serialize:
+        for _ in pairs:
+            pass
+        return b"", stats
+    return b"".join(dumps(sample) + b"\n" for sample in format_for_training(pairs)), stats
+
+
+def map_sessions(process, session_files, jobs):
+    """Yield process(session_file) for every file, in order, using `jobs` worker processes."""
+    if jobs <= 1 or len(session_files) <= 1:
+        yield from map(process, session_files)
+        return
+    with multiprocessing.Pool(min(jobs, len(session_files))) as pool:
+        yield from pool.imap(process, session_files)
 
 
 def load_memory_as_context():
@@ -149,25 +215,15 @@ def load_memory_as_context():
     return context_pairs
 
 
-def format_for_training(pairs, system_prompt=None):
-    """Convert pairs to Unsloth/ChatML training format."""
-    if system_prompt is None:
-        system_prompt = (
-            "You are Anakin, a personal AI assistant for Arnaldo. "
-            "You know his preferences, routines, and habits. "
-            "Be concise, friendly, and helpful. Skip filler words."
-        )
-
-    training_data = []
+def format_for_training(pairs, system_prompt=SYSTEM_PROMPT):
+    """Convert pairs to Unsloth/ChatML training format, one sample at a time."""
     for pair in pairs:
         conversations = [
             {"from": "system", "value": system_prompt},
             {"from": "human", "value": pair["user"]},
             {"from": "gpt", "value": pair["assistant"]},
         ]
-        training_data.append({"conversations": conversations})
-
-    return training_data
+        yield {"conversations": conversations}
 
 
 def main():
@@ -177,42 +233,37 @@ def main():
     parser.add_argument("--include-memory", action="store_true", help="Include memory files as training context")
     parser.add_argument("--min-assistant-length", type=int, default=10, help="Min assistant response length")
     parser.add_argument("--stats-only", action="store_true", help="Only print statistics")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="Worker processes")
     args = parser.parse_args()
 
-    all_pairs = []
     session_files = list(SESSION_DIR.glob("*.jsonl")) + list(SESSION_DIR.glob("*.jsonl.old"))
-
-    for sf in session_files:
-        pairs = extract_pairs_from_session(sf)
-        all_pairs.extend(pairs)
-
-    if args.filter_preferences:
-        all_pairs = [p for p in all_pairs if is_preference_related(p["user"], p["assistant"])]
-
-    all_pairs = [p for p in all_pairs if len(p["assistant"]) >= args.min_assistant_length]
-
-    if args.include_memory:
-        all_pairs.extend(load_memory_as_context())
-
-    print(f"Total Q&A pairs extracted: {len(all_pairs)}")
-    pref_count = sum(1 for p in all_pairs if is_preference_related(p["user"], p["assistant"]))
-    print(f"Preference-related: {pref_count}")
-    if all_pairs:
-        avg_user = sum(len(p["user"]) for p in all_pairs) / len(all_pairs)
-        avg_asst = sum(len(p["assistant"]) for p in all_pairs) / len(all_pairs)
-        print(f"Average user message length: {avg_user:.0f} chars")
-        print(f"Average assistant response length: {avg_asst:.0f} chars")
+    process = functools.partial(
+        process_session,
+        filter_preferences=args.filter_preferences,
+        min_assistant_length=args.min_assistant_length,
+        serialize=not args.stats_only,
+    )
+    output_path = Path(args.output)
+    stats = Counter()
+    with open(os.devnull if args.stats_only else output_path, "wb") as out:
+        for lines, file_stats in map_sessions(process, session_files, args.jobs):
+            out.write(lines)
+            stats.update(file_stats)
+        if args.include_memory:
+            memory_pairs = select_pairs(load_memory_as_context(), stats)
+            for sample in format_for_training(memory_pairs):
+                out.write(dumps(sample) + b"\n")
+
+    print(f"Total Q&A pairs extracted: {stats['pairs']}")
+    print(f"Preference-related: {stats['preference']}")
+    if stats["pairs"]:
+        print(f"Average user message length: {stats['user_chars'] / stats['pairs']:.0f} chars")
+        print(f"Average assistant response length: {stats['assistant_chars'] / stats['pairs']:.0f} chars")
 
     if args.stats_only:
         return
 
-    training_data = format_for_training(all_pairs)
-    output_path = Path(args.output)
-    with open(output_path, "w") as f:
-        for item in training_data:
-            f.write(json.dumps(item, ensure_ascii=False) + "\n")
-
-    print(f"Written {len(training_data)} training samples to {output_path}")
+    print(f"Written {stats['pairs']} training samples to {output_path}")
     print(f"File size: {output_path.stat().st_size / 1024:.1f} KB")
 
 
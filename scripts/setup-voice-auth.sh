@@ -21,11 +21,11 @@ echo ""
 # 1. Check prerequisites
 echo "[1/7] Checking prerequisites..."
 command -v python3 >/dev/null 2>&1 || { echo "ERROR: python3 not found"; exit 1; }
-command -v ffmpeg >/dev/null 2>&1 || { echo "ERROR: ffmpeg not found. Install: sudo apt install ffmpeg"; exit 1; }
+command -v ffmpeg >/dev/null 2>&1 || echo "  WARNING: ffmpeg not found; only formats PyAV decodes will be accepted. Install: sudo apt install ffmpeg"
 
 PYTHON_VERSION=$(python3 -c 'import sys; print(f"{sys.version_info.major}.{sys.version_info.minor}")')
 echo "  Python: $PYTHON_VERSION"
-echo "  ffmpeg: $(ffmpeg -version 2>&1 | head -1)"
+command -v ffmpeg >/dev/null 2>&1 && echo "  ffmpeg: $(ffmpeg -version 2>&1 | head -1)"
 
 # 2. Create virtual environment
 echo ""